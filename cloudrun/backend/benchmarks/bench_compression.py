@@ -0,0 +1,174 @@
+"""
+Benchmarks for response compression levels.
+
+Compresses the payloads the app actually serves (the rendered rules list
+fragment and TSV/NDJSON downloads of synthetic rulesets) at several gzip
+levels, and brotli qualities when the brotli package is installed. For each
+it reports the compressed size, compression time and the resulting time to
+deliver the response over a slow and a fast link, which is what the levels in
+services/compression_service.py were chosen from. Run from cloudrun/backend:
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_tsv import make_rules  # noqa: E402
+from jinja2 import Environment, FileSystemLoader  # noqa: E402
+from services.compression_service import (  # noqa: E402
+    COMPRESSION_LEVELS,
+    brotli,
+)
+from services.format_service import iter_ruleset_ndjson  # noqa: E402
+from services.tsv_service import iter_ruleset_tsv  # noqa: E402
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "templates")
+
+GZIP_LEVELS = (1, 3, 5, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 8, 11)
+
+# Link speeds in bits per second: a congested site connection and an office
+LINKS = {"1.5Mbit": 1_500_000, "50Mbit": 50_000_000}
+
+
+def render_rules_fragment(count):
+    """Render the ruleset_rules.html partial the way add_rule returns it."""
+    env = Environment(loader=FileSystemLoader(TEMPLATES), autoescape=True)
+    rules = [rule | {"id": f"rule{i:05d}"} for i, rule in enumerate(make_rules(count))]
+    return env.get_template("partials/ruleset_rules.html").render(
+        request=None, ruleset={"id": "bench", "name": "bench"}, rules=rules
+    )
+
+
+def make_payloads():
+    """Return {name: (media type, bytes)} for the benchmarked responses."""
+    ruleset = {"id": "bench", "name": "bench"}
+    payloads = {}
+    for count in (50, 500):
+        payloads[f"rules fragment x{count}"] = (
+            "text/html",
+            render_rules_fragment(count).encode("utf-8"),
+        )
+    for count in (1_000, 10_000):
+        payloads[f"tsv x{count}"] = (
+            "text/tab-separated-values",
+            "".join(iter_ruleset_tsv(ruleset, make_rules(count))).encode("utf-8"),
+        )
+    payloads["ndjson x1000"] = (
+        "application/x-ndjson",
+        "".join(iter_ruleset_ndjson(ruleset, make_rules(1_000))).encode("utf-8"),
+    )
+    return payloads
+
+
+# Stop repeating a measurement once it has used this much time
+TIME_BUDGET = 1.0
+
+
+def time_compress(compress, data, repeat):
+    """Return (best seconds, compressed size), within TIME_BUDGET."""
+    best = float("inf")
+    spent = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = compress(data)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent > TIME_BUDGET:
+            break
+    return best, len(out)
+
+
+def gzip_compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def candidates():
+    """Yield (encoding, level, compress function)."""
+    for level in GZIP_LEVELS:
+        yield "gzip", level, lambda data, level=level: gzip_compress(data, level)
+    if brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            yield "br", quality, lambda data, quality=quality: brotli.compress(
+                data, quality=quality
+            )
+
+
+def run_benchmarks():
+    results = {}
+    for name, (media_type, data) in make_payloads().items():
+        repeat = max(3, min(50, 20_000_000 // max(len(data), 1)))
+        rows = [
+            {
+                "encoding": "identity",
+                "level": 0,
+                "bytes": len(data),
+                "compress_ms": 0.0,
+            }
+        ]
+        for encoding, level, compress in candidates():
+            seconds, size = time_compress(compress, data, repeat)
+            rows.append(
+                {
+                    "encoding": encoding,
+                    "level": level,
+                    "bytes": size,
+                    "compress_ms": round(seconds * 1000, 3),
+                }
+            )
+        for row in rows:
+            row["ratio"] = round(len(data) / row["bytes"], 2)
+            for link, bits_per_sec in LINKS.items():
+                row[f"deliver_ms_{link}"] = round(
+                    row["compress_ms"] + row["bytes"] * 8 / bits_per_sec * 1000, 1
+                )
+        results[name] = {
+            "media_type": media_type,
+            "configured": COMPRESSION_LEVELS.get(media_type),
+            "rows": rows,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks()
+
+    links = list(LINKS)
+    for name, result in results.items():
+        print(f"\n{name} ({result['media_type']}, configured {result['configured']})")
+        print(
+            f"{'encoding':>10} {'bytes':>10} {'ratio':>6} {'cpu ms':>8} "
+            + " ".join(f"{'@' + link:>10}" for link in links)
+        )
+        for row in result["rows"]:
+            label = row["encoding"] + (f"-{row['level']}" if row["level"] else "")
+            print(
+                f"{label:>10} {row['bytes']:>10} {row['ratio']:>6} "
+                f"{row['compress_ms']:>8} "
+                + " ".join(f"{row['deliver_ms_' + link]:>10}" for link in links)
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Benchmarks for the ruleset TSV serializer.
+
+Serializes synthetic rulesets of 10 to 100k rules, recording rows/sec and
+peak traced allocations for services.tsv_service and for the original
+csv.writer implementation it replaced. Run from cloudrun/backend:
+
+    python benchmarks/bench_tsv.py
+    python benchmarks/bench_tsv.py --output results.json
+    python benchmarks/bench_tsv.py --check benchmarks/baseline.json
+
+Each size is timed over at least MIN_REPEATS rounds, running the two
+implementations back to back in alternating order, and the speedup is the
+median of the per-round ratios. Machine noise then hits both sides of a ratio
+alike instead of deciding a best-of time.
+
+--check exits non-zero when peak memory grows or the speedup over the legacy
+implementation drops beyond the tolerances below, which keeps the numbers
+comparable across CI machines of different speeds.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.tsv_service import iter_ruleset_tsv  # noqa: E402
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+
+# Timing rounds per size: at least MIN_REPEATS, more for small rulesets
+MIN_REPEATS = 5
+MAX_REPEATS = 20
+ROWS_PER_SIZE = 200_000
+
+# Allowed regression before --check fails
+MEMORY_TOLERANCE = 1.25
+MEMORY_SLACK_KIB = 64
+SPEEDUP_TOLERANCE = 0.75
+
+PROPERTIES = [
+    "category",
+    "speckle_type",
+    "family",
+    "type",
+    "level.name",
+    "properties.parameters.dimensions.Height",
+    "properties.parameters.dimensions.Width",
+    "properties.parameters.identity.Mark",
+    "properties.parameters.constraints.Base Offset",
+    "Fire Rating",
+]
+PREDICATES = [
+    "exists",
+    "greater than",
+    "less than",
+    "in range",
+    "in list",
+    "equal to",
+    "not equal to",
+    "is like",
+    "contains",
+]
+VALUES = ["Walls", "Floors", "100", "0,3000", "EI 30, EI 60", 'Type "A"', "^W-\\d+$"]
+
+
+def make_rules(count, seed=0):
+    """Build a deterministic synthetic ruleset with 2-4 conditions per rule."""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        conditions = []
+        condition_count = rng.randint(2, 4)
+        for c in range(condition_count):
+            if c == 0:
+                logic = "WHERE"
+            elif c == condition_count - 1:
+                logic = "CHECK"
+            else:
+                logic = "AND"
+            conditions.append(
+                {
+                    "logic": logic,
+                    "propertyName": rng.choice(PROPERTIES),
+                    "predicate": rng.choice(PREDICATES),
+                    "value": rng.choice(VALUES),
+                }
+            )
+        rules.append(
+            {
+                "severity": rng.choice(["Error", "Warning", "Info"]),
+                "message": f"Rule {i} failed\tsee standard",
+                "conditions": conditions,
+            }
+        )
+    return rules
+
+
+def legacy_iter_ruleset_tsv(ruleset, rules):
+    """The pre-consolidation csv.writer implementation, for comparison."""
+    output = StringIO()
+    writer = csv.writer(output, delimiter="\t")
+    writer.writerow(
+        [
+            "Rule Number",
+            "Logic",
+            "Property Name",
+            "Predicate",
+            "Value",
+            "Report Severity",
+            "Message",
+        ]
+    )
+    rule_number = 1
+    for rule in rules:
+        conditions = rule.get("conditions", [])
+        if not conditions:
+            continue
+        for i, condition in enumerate(conditions[:-1]):
+            row = []
+            row.append(str(rule_number) if i == 0 else "")
+            row.append(condition.get("logic", ""))
+            row.append(condition.get("propertyName", ""))
+            row.append(condition.get("predicate", ""))
+            row.append(condition.get("value", ""))
+            row.append("")
+            row.append("")
+            writer.writerow(row)
+        last_condition = conditions[-1]
+        row = []
+        row.append(str(rule_number) if len(conditions) == 1 else "")
+        row.append(last_condition.get("logic", ""))
+        row.append(last_condition.get("propertyName", ""))
+        row.append(last_condition.get("predicate", ""))
+        row.append(last_condition.get("value", ""))
+        row.append(rule.get("severity", "Error"))
+        row.append(rule.get("message", ""))
+        writer.writerow(row)
+        rule_number += 1
+    yield output.getvalue()
+
+
+def run_serializer(serializer, rules):
+    """Consume a serializer the way a streaming response would."""
+    size = 0
+    for chunk in serializer({"name": "bench"}, rules):
+        size += len(chunk)
+    return size
+
+
+def time_serializer(serializer, rules):
+    """Return the seconds one serializer takes over the rules."""
+    start = time.perf_counter()
+    run_serializer(serializer, rules)
+    return time.perf_counter() - start
+
+
+def peak_kib(serializer, rules):
+    """Return the peak traced allocation of one serializer run, in KiB."""
+    tracemalloc.start()
+    run_serializer(serializer, rules)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(rules, repeat):
+    """
+    Time the current and legacy serializers in interleaved rounds.
+
+    Returns:
+        tuple: (median seconds, median legacy seconds, median speedup)
+    """
+    times, legacy_times, ratios = [], [], []
+    for round_number in range(repeat):
+        # Alternate which runs first so warm caches favour neither
+        if round_number % 2:
+            legacy_seconds = time_serializer(legacy_iter_ruleset_tsv, rules)
+            seconds = time_serializer(iter_ruleset_tsv, rules)
+        else:
+            seconds = time_serializer(iter_ruleset_tsv, rules)
+            legacy_seconds = time_serializer(legacy_iter_ruleset_tsv, rules)
+        times.append(seconds)
+        legacy_times.append(legacy_seconds)
+        ratios.append(legacy_seconds / seconds)
+    return (
+        statistics.median(times),
+        statistics.median(legacy_times),
+        statistics.median(ratios),
+    )
+
+
+def run_benchmarks(sizes):
+    results = {}
+    for size in sizes:
+        rules = make_rules(size)
+        rows = sum(len(rule["conditions"]) for rule in rules)
+        repeat = max(MIN_REPEATS, min(MAX_REPEATS, ROWS_PER_SIZE // max(rows, 1)))
+
+        seconds, legacy_seconds, speedup = measure(rules, repeat)
+
+        results[str(size)] = {
+            "rules": size,
+            "rows": rows,
+            "rows_per_sec": round(rows / seconds),
+            "peak_kib": round(peak_kib(iter_ruleset_tsv, rules), 1),
+            "legacy_rows_per_sec": round(rows / legacy_seconds),
+            "legacy_peak_kib": round(peak_kib(legacy_iter_ruleset_tsv, rules), 1),
+            "speedup": round(speedup, 2),
+        }
+    return results
+
+
+def check_against_baseline(results, baseline):
+    """Return a list of regressions relative to a stored baseline."""
+    failures = []
+    for size, expected in baseline.items():
+        actual = results.get(size)
+        if actual is None:
+            continue
+
+        memory_limit = expected["peak_kib"] * MEMORY_TOLERANCE + MEMORY_SLACK_KIB
+        if actual["peak_kib"] > memory_limit:
+            failures.append(
+                f"{size} rules: peak {actual['peak_kib']} KiB exceeds {memory_limit:.1f} KiB"
+            )
+
+        speedup_floor = expected["speedup"] * SPEEDUP_TOLERANCE
+        if actual["speedup"] < speedup_floor:
+            failures.append(
+                f"{size} rules: speedup {actual['speedup']}x below {speedup_floor:.2f}x"
+            )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES))
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--check", help="Baseline JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes)
+
+    print(
+        f"{'rules':>8} {'rows':>8} {'rows/s':>12} {'peak KiB':>10} "
+        f"{'legacy rows/s':>14} {'legacy KiB':>11} {'speedup':>8}"
+    )
+    for r in results.values():
+        print(
+            f"{r['rules']:>8} {r['rows']:>8} {r['rows_per_sec']:>12} {r['peak_kib']:>10} "
+            f"{r['legacy_rows_per_sec']:>14} {r['legacy_peak_kib']:>11} {r['speedup']:>7}x"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.check:
+        with open(args.check) as f:
+            failures = check_against_baseline(results, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,12 +10,36 @@ from urllib.parse import urljoin
 import httpx
 from auth import exchange_token, get_current_user, init_auth
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from firebase_admin import firestore
-from services.tsv_service import generate_ruleset_tsv
+from services.compression_middleware import CompressionMiddleware
+from services.format_service import RULESET_FORMATS, ruleset_format_filename
+from services.mapping import CANONICAL_PREDICATES
+from services.tsv_service import (
+    MAX_IMPORT_ERRORS,
+    TsvImportError,
+    iter_ruleset_tsv,
+    iter_tsv_lines,
+    parse_ruleset_tsv,
+    ruleset_tsv_filename,
+)
 from starlette.middleware.sessions import SessionMiddleware
 
 # Load environment variables
@@ -26,6 +50,9 @@ SPECKLE_SERVER_URL = os.getenv("SPECKLE_SERVER_URL", "https://app.speckle.system
 PROJECTS_PER_PAGE = 5
 MODELS_PER_PROJECT = 20
 VERSIONS_PER_MODEL = 1
+RULES_PAGE_SIZE = 500
+# Firestore allows at most 500 writes in one batch
+WRITE_BATCH_SIZE = 500
 
 # GraphQL queries
 PROJECTS_QUERY = """
@@ -97,6 +124,9 @@ app.add_middleware(
     SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "your-secret-key")
 )
 
+# Compress HTML fragments and downloads (gzip, or brotli when available)
+app.add_middleware(CompressionMiddleware)
+
 # Templates
 templates = Jinja2Templates(directory="./frontend/templates")
 
@@ -920,6 +950,111 @@ async def add_rule(request: Request, ruleset_id: str):
     )
 
 
+def commit_in_batches(operations, batch_size: int = WRITE_BATCH_SIZE) -> int:
+    """Apply (method, args) batch operations, committing every batch_size."""
+    batch = db.batch()
+    pending = 0
+    total = 0
+    for method, args in operations:
+        getattr(batch, method)(*args)
+        pending += 1
+        total += 1
+        if pending == batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return total
+
+
+@app.post("/rulesets/{ruleset_id}/rules/import")
+async def import_rules(
+    request: Request,
+    ruleset_id: str,
+    file: UploadFile = File(...),
+    mode: str = Form("append"),
+):
+    """Import a TSV in the export layout, writing the rules in batches."""
+    user = await get_current_user(request)
+    if not user:
+        return HTMLResponse(status_code=401)
+
+    # Get the ruleset
+    ruleset_ref = db.collection("rulesets").document(ruleset_id)
+    ruleset = ruleset_ref.get()
+    if not ruleset.exists:
+        raise HTTPException(status_code=404, detail="Ruleset not found")
+    ruleset_data = ruleset.to_dict()
+    if ruleset_data.get("user_id") != user["id"]:
+        raise HTTPException(
+            status_code=403, detail="Not authorized to edit this ruleset"
+        )
+
+    ruleset_data["id"] = ruleset_id
+    rules_ref = ruleset_ref.collection("rules")
+
+    # Parse everything before writing so a bad row imports nothing
+    import_errors = []
+    try:
+        rules = list(
+            parse_ruleset_tsv(iter_tsv_lines(file.file), CANONICAL_PREDICATES)
+        )
+    except TsvImportError as e:
+        rules = []
+        import_errors = e.errors[:MAX_IMPORT_ERRORS]
+        if len(e.errors) > MAX_IMPORT_ERRORS:
+            import_errors.append(f"... and {len(e.errors) - MAX_IMPORT_ERRORS} more")
+    else:
+        if not rules:
+            import_errors = ["No rules found in file"]
+
+    if rules:
+        if mode == "replace":
+            commit_in_batches(
+                ("delete", (doc_ref,))
+                for doc_ref in rules_ref.list_documents(page_size=WRITE_BATCH_SIZE)
+            )
+            next_order = 1
+        else:
+            # Count without reading the existing rules
+            next_order = rules_ref.count().get()[0][0].value + 1
+
+        commit_in_batches(
+            (
+                "set",
+                (
+                    rules_ref.document(),
+                    {
+                        "conditions": rule["conditions"],
+                        "message": rule["message"],
+                        "severity": rule["severity"],
+                        "order": next_order + i,
+                        "createdAt": firestore.SERVER_TIMESTAMP,
+                        "updatedAt": firestore.SERVER_TIMESTAMP,
+                    },
+                ),
+            )
+            for i, rule in enumerate(rules)
+        )
+        ruleset_ref.update({"updatedAt": firestore.SERVER_TIMESTAMP})
+
+    # Fetch all rules from the subcollection
+    rules_query = rules_ref.order_by("order").stream()
+    all_rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
+
+    # Return the updated rules.html partial
+    return templates.TemplateResponse(
+        "partials/ruleset_rules.html",
+        {
+            "request": request,
+            "ruleset": ruleset_data,
+            "rules": all_rules,
+            "import_errors": import_errors,
+        },
+    )
+
+
 def generate_ruleset_hash(project_id: str, ruleset_id: str) -> str:
     """Generate a unique hash for a ruleset that combines project and ruleset IDs."""
     combined = f"{project_id}:{ruleset_id}"
@@ -928,9 +1063,40 @@ def generate_ruleset_hash(project_id: str, ruleset_id: str) -> str:
     return base64.urlsafe_b64encode(hash_bytes).decode().rstrip("=")
 
 
+def stream_rules(rules_ref, page_size: int = RULES_PAGE_SIZE):
+    """Yield a ruleset's rules in order, reading one page at a time."""
+    query = rules_ref.order_by("order").limit(page_size)
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        page = page_query.get()
+
+        for doc in page:
+            yield doc.to_dict() | {"id": doc.id}
+
+        if len(page) < page_size:
+            return
+
+        last_doc = page[-1]
+
+
 @app.get("/r/{ruleset_hash}/tsv")
-async def get_ruleset_tsv(request: Request, ruleset_hash: str):
-    """Get TSV content for a ruleset using its hash. No authentication required."""
+async def get_ruleset_tsv(
+    request: Request, ruleset_hash: str, format_name: str = Query("tsv", alias="format")
+):
+    """Get TSV content for a ruleset using its hash. No authentication required.
+
+    ``?format=json|ndjson|msgpack`` returns the same rules one record per rule
+    with typed values instead.
+    """
+    format_name = format_name.lower()
+    if format_name != "tsv" and format_name not in RULESET_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format_name}', expected one of: "
+            + ", ".join(["tsv", *RULESET_FORMATS]),
+        )
+
     # Get all rulesets
     rulesets = db.collection("rulesets").stream()
 
@@ -951,23 +1117,23 @@ async def get_ruleset_tsv(request: Request, ruleset_hash: str):
     ruleset_data = matching_ruleset.to_dict()
     ruleset_data["id"] = matching_ruleset.id
 
-    # Get all rules for this ruleset
-    rules_query = (
-        db.collection("rulesets")
-        .document(matching_ruleset.id)
-        .collection("rules")
-        .order_by("order")
-        .stream()
+    # Stream the rules page by page straight into the response body
+    rules = stream_rules(
+        db.collection("rulesets").document(matching_ruleset.id).collection("rules")
     )
-    rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
 
-    # Generate TSV content
-    tsv_content, filename = generate_ruleset_tsv(ruleset_data, rules)
+    if format_name == "tsv":
+        body = iter_ruleset_tsv(ruleset_data, rules)
+        media_type = "text/tab-separated-values"
+        filename = ruleset_tsv_filename(ruleset_data)
+    else:
+        generate, media_type, extension = RULESET_FORMATS[format_name]
+        body = generate(ruleset_data, rules)
+        filename = ruleset_format_filename(ruleset_data, extension)
 
-    # Return the TSV content with appropriate headers
-    return Response(
-        content=tsv_content,
-        media_type="text/tab-separated-values",
+    return StreamingResponse(
+        body,
+        media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
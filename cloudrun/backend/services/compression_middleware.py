@@ -0,0 +1,105 @@
+"""
+ASGI middleware that compresses responses with compression_service.
+
+Like Starlette's GZipMiddleware, but negotiates brotli as well as gzip and
+picks the level per content type. Only the media types listed in
+COMPRESSION_LEVELS are touched, so images, ZIPs and MessagePack go out as-is.
+"""
+
+from services.compression_service import (
+    MIN_COMPRESS_SIZE,
+    StreamCompressor,
+    add_vary,
+    is_compressible,
+    negotiate_encoding,
+)
+from starlette.datastructures import Headers, MutableHeaders
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Wraps send() for one response, deciding on the first body message."""
+
+    def __init__(self, send, encoding, minimum_size):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = (
+                "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # Small complete bodies are not worth compressing
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            content_type = Headers(raw=self.start_message["headers"]).get(
+                "content-type"
+            )
+            self.compressor = StreamCompressor(self.encoding, content_type)
+
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers["Vary"] = add_vary(headers.get("vary"))
+            del headers["Content-Length"]
+
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            await self._send(self.start_message)
+
+        if more_body:
+            body = self.compressor.compress(body, flush=True)
+        else:
+            body = self.compressor.compress(body) + self.compressor.finish()
+
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -0,0 +1,170 @@
+"""
+HTTP response compression shared by both backends.
+
+This file is kept byte-identical in
+cloudrun/backend/services/compression_service.py and
+firebase/functions/src/utils/compression_utils.py (cloudrun/backend/tests
+enforce it). It only negotiates an encoding and compresses bytes; each backend
+wires it into its own response type.
+
+Brotli is used when the client accepts it and the brotli package is installed,
+otherwise gzip. Levels were picked with benchmarks/bench_compression.py, by
+time to deliver over a 1.5 Mbit/s link: gzip 6 everywhere, since 9 doubles
+the CPU for a few percent; brotli 5 for HTML fragments, which are on the
+interactive path; brotli 8 for downloads, where the smaller body outweighs the
+extra CPU. Brotli 11 is never worth it for dynamic responses.
+"""
+
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deploy image
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# Bodies smaller than this go out as-is; the framing overhead and CPU are not
+# worth it below about one packet
+MIN_COMPRESS_SIZE = 1024
+
+# Used for compressible types without their own entry below
+DEFAULT_LEVELS = (6, 5)
+
+# media type -> (gzip level, brotli quality)
+COMPRESSION_LEVELS = {
+    "text/html": DEFAULT_LEVELS,
+    "text/plain": DEFAULT_LEVELS,
+    "text/css": DEFAULT_LEVELS,
+    "text/javascript": DEFAULT_LEVELS,
+    "application/javascript": DEFAULT_LEVELS,
+    "image/svg+xml": DEFAULT_LEVELS,
+    "text/tab-separated-values": (6, 8),
+    "application/json": (6, 8),
+    "application/x-ndjson": (6, 8),
+}
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """Return the bare media type of a Content-Type header value."""
+    if not content_type:
+        return ""
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Return whether responses of this Content-Type should be compressed."""
+    return media_type(content_type) in COMPRESSION_LEVELS
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        BROTLI, GZIP, or None when the client accepts neither
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = [BROTLI, GZIP] if brotli is not None else [GZIP]
+    best = None
+    best_quality = 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StreamCompressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, content_type: Optional[str] = None):
+        gzip_level, brotli_quality = COMPRESSION_LEVELS.get(
+            media_type(content_type), DEFAULT_LEVELS
+        )
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16 + MAX_WBITS writes the gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress a chunk; flush pushes out everything buffered so far."""
+        if self.encoding == BROTLI:
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        """End the stream and return the remaining bytes."""
+        if self.encoding == BROTLI:
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_bytes(
+    data: bytes, encoding: str, content_type: Optional[str] = None
+) -> bytes:
+    """Compress a whole body at the level tuned for its content type."""
+    compressor = StreamCompressor(encoding, content_type)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_chunks(
+    chunks: Iterable, encoding: str, content_type: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Compress a streamed body, flushing after every chunk.
+
+    Flushing keeps streamed downloads progressing at the pace they are
+    produced; the chunks are large enough that the cost in ratio is small.
+
+    Args:
+        chunks: Iterable of str (encoded as UTF-8) or bytes
+        encoding: BROTLI or GZIP
+        content_type: Content-Type of the response, selects the level
+
+    Yields:
+        Compressed pieces of the body
+    """
+    compressor = StreamCompressor(encoding, content_type)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        if chunk:
+            data = compressor.compress(chunk, flush=True)
+            if data:
+                yield data
+    yield compressor.finish()
+
+
+def add_vary(vary: Optional[str]) -> str:
+    """Return a Vary header value that includes Accept-Encoding."""
+    if not vary:
+        return "Accept-Encoding"
+    if "accept-encoding" in vary.lower() or vary.strip() == "*":
+        return vary
+    return f"{vary}, Accept-Encoding"
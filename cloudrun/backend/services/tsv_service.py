@@ -1,86 +1,360 @@
+"""
+Ruleset TSV serialization shared by both backends.
+
+This file is kept byte-identical in cloudrun/backend/services/tsv_service.py
+and firebase/functions/src/utils/tsv_utils.py (cloudrun/backend/tests enforce
+it). The output matches csv.writer(delimiter="\\t") exactly: CRLF line endings,
+and a field is quoted, with quotes doubled, only when it contains a tab, a
+quote or a line break. parse_ruleset_tsv is the inverse.
+"""
+
+import codecs
 import csv
-from io import StringIO
-from typing import Dict, List, Tuple
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from .mapping import get_canonical_predicate
+
+# Rows are grouped into chunks of roughly this many characters before being
+# handed to the response, so large rulesets stream without one write per row
+CHUNK_SIZE = 64 * 1024
+
+TSV_HEADER = (
+    "Rule Number",
+    "Logic",
+    "Property Name",
+    "Predicate",
+    "Value",
+    "Report Severity",
+    "Message",
+)
+
+DEFAULT_SEVERITY = "Error"
+
+LINE_END = "\r\n"
+
+# Continuation rows leave severity and message empty
+EMPTY_TAIL = "\t\t" + LINE_END
+
+# Upper bound on distinct values remembered while escaping one file
+ESCAPE_CACHE_SIZE = 4096
+
+_NEEDS_QUOTING = re.compile(r'[\t"\r\n]')
 
-def generate_ruleset_tsv(ruleset: Dict, rules: List[Dict]) -> Tuple[str, str]:
-    """Generate TSV content for a ruleset.
+
+def escape_cell(value) -> str:
+    """Render one value the way csv.writer would, quoting only when needed."""
+    if value is None:
+        return ""
+    if value.__class__ is not str:
+        value = str(value)
+    if _NEEDS_QUOTING.search(value) is None:
+        return value
+    return '"' + value.replace('"', '""') + '"'
+
+
+def ruleset_tsv_filename(ruleset: Dict) -> str:
+    """Return the download filename for a ruleset's TSV."""
+    return f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
+
+
+def iter_ruleset_tsv(
+    ruleset: Dict,
+    rules: Optional[Iterable[Dict]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Generate TSV content for a ruleset incrementally.
+
+    Rules are consumed lazily, so passing a Firestore stream keeps memory flat
+    regardless of ruleset size and lets the first bytes go out immediately.
+    Severity and message go on the last row of each rule and the rule number
+    on the first; rules without conditions are skipped.
 
     Args:
         ruleset: Dictionary containing ruleset data
-        rules: List of rule dictionaries
+        rules: Iterable of rule dictionaries, defaults to ruleset["rules"]
+        chunk_size: Approximate number of characters per yielded chunk
 
-    Returns:
-        Tuple of (tsv_content, filename)
+    Yields:
+        Consecutive pieces of the TSV file
     """
-    # Generate TSV
-    output = StringIO()
-    writer = csv.writer(output, delimiter="\t")
-
-    # Write header
-    writer.writerow(
-        [
-            "Rule Number",
-            "Logic",
-            "Property Name",
-            "Predicate",
-            "Value",
-            "Report Severity",
-            "Message",
-        ]
-    )
+    if rules is None:
+        rules = ruleset.get("rules", [])
+
+    # Property names, predicates and logic keywords repeat constantly, so each
+    # distinct value is escaped once; the cache is capped because values can
+    # be unique per rule
+    escaped = {}
+    cached = escaped.get
+
+    def cell(value):
+        # Only strings are cached; other values (numbers, lists from a
+        # malformed rule) may not be hashable
+        if value.__class__ is not str:
+            return escape_cell(value)
+        text = cached(value)
+        if text is None:
+            if len(escaped) >= ESCAPE_CACHE_SIZE:
+                escaped.clear()
+            text = escaped[value] = escape_cell(value)
+        return text
+
+    join = "\t".join
+    chunk = [join(TSV_HEADER) + LINE_END]
+    size = len(chunk[0])
+    rule_number = 0
 
-    # Write rules
-    rule_number = 1
     for rule in rules:
-        conditions = rule.get("conditions", [])
+        conditions = rule.get("conditions")
 
         # Skip empty rules
         if not conditions:
             continue
 
-        # For each condition except the last one
-        for i, condition in enumerate(conditions[:-1]):
-            row = []
+        rule_number += 1
+        prefix = str(rule_number)
 
-            # Only include rule number on first row
-            if i == 0:
-                row.append(str(rule_number))
-            else:
-                row.append("")
+        for condition in conditions[:-1]:
+            get = condition.get
+            logic = get("logic", "")
+            property_name = get("propertyName", "")
+            predicate = get("predicate", "")
+            value = get("value", "")
+            line = (
+                join(
+                    (
+                        prefix,
+                        cell(logic),
+                        cell(property_name),
+                        cell(predicate),
+                        cell(value),
+                    )
+                )
+                + EMPTY_TAIL
+            )
+            chunk.append(line)
+            size += len(line)
+            prefix = ""
 
-            row.append(condition.get("logic", ""))
-            row.append(condition.get("propertyName", ""))
-            row.append(condition.get("predicate", ""))
-            row.append(condition.get("value", ""))
-            row.append("")  # Empty severity
-            row.append("")  # Empty message
+        get = conditions[-1].get
+        logic = get("logic", "")
+        property_name = get("propertyName", "")
+        predicate = get("predicate", "")
+        value = get("value", "")
+        severity = rule.get("severity", DEFAULT_SEVERITY)
+        line = (
+            join(
+                (
+                    prefix,
+                    cell(logic),
+                    cell(property_name),
+                    cell(predicate),
+                    cell(value),
+                    cell(severity),
+                    escape_cell(rule.get("message", "")),
+                )
+            )
+            + LINE_END
+        )
+        chunk.append(line)
+        size += len(line)
 
-            writer.writerow(row)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
 
-        # For the last condition, include severity and message
-        if conditions:
-            last_condition = conditions[-1]
-            row = []
+    if chunk:
+        yield "".join(chunk)
 
-            # Only include rule number on first row if there was only one condition
-            if len(conditions) == 1:
-                row.append(str(rule_number))
-            else:
-                row.append("")
 
-            row.append(last_condition.get("logic", ""))
-            row.append(last_condition.get("propertyName", ""))
-            row.append(last_condition.get("predicate", ""))
-            row.append(last_condition.get("value", ""))
-            row.append(rule.get("severity", "Error"))
-            row.append(rule.get("message", ""))
+def generate_ruleset_tsv(
+    ruleset: Dict, rules: Optional[List[Dict]] = None
+) -> Tuple[str, str]:
+    """Generate TSV content for a ruleset.
+
+    Args:
+        ruleset: Dictionary containing ruleset data
+        rules: List of rule dictionaries, defaults to ruleset["rules"]
+
+    Returns:
+        Tuple of (tsv_content, filename)
+    """
+    return "".join(iter_ruleset_tsv(ruleset, rules)), ruleset_tsv_filename(ruleset)
 
-            writer.writerow(row)
 
-        rule_number += 1
+# Errors reported back from a failed import before the rest are summarised
+MAX_IMPORT_ERRORS = 20
+
+# Bytes read from an upload at a time while decoding it
+READ_SIZE = 64 * 1024
+
+# Tab-delimited text saved from Excel is either UTF-16 with a BOM ("Unicode
+# Text") or the Windows code page ("Text (Tab delimited)")
+FALLBACK_ENCODING = "cp1252"
+
+
+class TsvImportError(ValueError):
+    """Raised when an uploaded TSV cannot be turned into rules."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        shown = errors[:MAX_IMPORT_ERRORS]
+        if len(errors) > len(shown):
+            shown = shown + [f"... and {len(errors) - len(shown)} more"]
+        super().__init__("\n".join(shown))
+
+
+def iter_tsv_lines(stream) -> Iterator[str]:
+    """Decode an uploaded TSV file into lines, one read at a time.
+
+    A UTF-8 or UTF-16 byte order mark selects that encoding. Without one each
+    line is decoded as UTF-8, falling back to cp1252 for lines that are not,
+    which covers files exported from Excel.
+
+    Args:
+        stream: Binary file object, e.g. an upload's stream
+
+    Yields:
+        Lines with their line endings kept, as csv.reader expects
+    """
+    head = stream.read(READ_SIZE)
+
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        decoder = codecs.getincrementaldecoder("utf-16")()
+        pending = ""
+        while head:
+            pending += decoder.decode(head)
+            lines = pending.split("\n")
+            # The last piece is an incomplete line
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+            head = stream.read(READ_SIZE)
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+        return
+
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8) :]
+
+    pending = b""
+    while head:
+        pending += head
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield _decode_line(line + b"\n")
+        head = stream.read(READ_SIZE)
+    if pending:
+        yield _decode_line(pending)
+
+
+def _decode_line(line: bytes) -> str:
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode(FALLBACK_ENCODING, errors="replace")
+
+
+def parse_ruleset_tsv(
+    lines: Iterable[str], predicates: Optional[Iterable[str]] = None
+) -> Iterator[Dict]:
+    """Parse TSV produced by iter_ruleset_tsv back into rules.
+
+    A row with a rule number starts a new rule and every following row without
+    one adds a condition to it; severity and message are taken from whichever
+    of the rule's rows carries them (the last, as written). The header row,
+    blank rows and missing trailing cells are tolerated. Rules are yielded as
+    they complete, but every row is checked: if any are invalid a
+    TsvImportError listing all of them is raised once the input is exhausted,
+    so callers that collect the rules before writing never import half a file.
+
+    Args:
+        lines: Lines of text, e.g. from iter_tsv_lines
+        predicates: Allowed predicate names; matched case-insensitively and
+            stored in this spelling, after legacy symbolic predicates ("==",
+            ">") are mapped to their canonical names as everywhere else. Any
+            predicate is accepted when omitted.
+
+    Yields:
+        Rule dictionaries with severity, message and conditions
+    """
+    allowed = None
+    if predicates is not None:
+        allowed = {predicate.lower(): predicate for predicate in predicates}
+
+    errors = []
+    rule = None
+    reader = csv.reader(lines, delimiter="\t")
+    width = len(TSV_HEADER)
+    first_row = True
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            errors.append(f"Line {reader.line_num}: {e}")
+            break
+        line = reader.line_num
+
+        if not any(cell.strip() for cell in row):
+            continue
+
+        if first_row:
+            first_row = False
+            if row[0].strip().lower() == TSV_HEADER[0].lower():
+                continue
+
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+        elif len(row) > width and any(cell.strip() for cell in row[width:]):
+            errors.append(f"Line {line}: expected {width} columns, got {len(row)}")
+            continue
+
+        number, logic, property_name, predicate, value, severity, message = row[
+            :width
+        ]
+
+        if number.strip():
+            if rule is not None:
+                yield rule
+            rule = {"severity": DEFAULT_SEVERITY, "message": "", "conditions": []}
+        elif rule is None:
+            errors.append(f"Line {line}: condition has no rule number before it")
+            continue
+
+        if not property_name.strip():
+            errors.append(f"Line {line}: property name is empty")
+
+        if allowed is not None:
+            name = predicate.strip()
+            canonical = None
+            if name:
+                canonical = allowed.get(get_canonical_predicate(name).lower())
+            if canonical is None:
+                errors.append(f"Line {line}: unknown predicate '{predicate}'")
+            else:
+                predicate = canonical
+
+        rule["conditions"].append(
+            {
+                "logic": logic.strip().upper(),
+                "propertyName": property_name,
+                "predicate": predicate,
+                "value": value,
+            }
+        )
+        if severity.strip():
+            rule["severity"] = severity.strip()
+        if message:
+            rule["message"] = message
 
-    # Create filename
-    filename = f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
+    if rule is not None:
+        yield rule
 
-    return output.getvalue(), filename
+    if errors:
+        raise TsvImportError(errors)
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from services import compression_service
+from services.compression_middleware import CompressionMiddleware
+from services.compression_service import GZIP, negotiate_encoding
+
+FUNCTIONS_COPY = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "..",
+    "firebase",
+    "functions",
+    "src",
+    "utils",
+    "compression_utils.py",
+)
+SERVICE_MODULE = os.path.join(
+    os.path.dirname(__file__), "..", "services", "compression_service.py"
+)
+
+BIG_HTML = "<tr><td>Walls</td><td>exists</td></tr>" * 200
+TSV_CHUNKS = ["1\tWHERE\tcategory\tequal to\tWalls\t\t\r\n" * 100] * 5
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return HTMLResponse(BIG_HTML)
+
+    @app.get("/small")
+    def small():
+        return HTMLResponse("<p>ok</p>")
+
+    @app.get("/tsv")
+    def tsv():
+        return StreamingResponse(
+            iter(TSV_CHUNKS), media_type="text/tab-separated-values"
+        )
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\x00" * 4096, media_type="application/msgpack")
+
+    return CompressionMiddleware(app)
+
+
+def get(path, accept_encoding="gzip"):
+    """Run one GET through the middleware, returning (headers, body messages)."""
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    sent = []
+    requested = []
+
+    async def receive():
+        # Deliver the empty request body once, then wait like an open connection
+        if requested:
+            await asyncio.Event().wait()
+        requested.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(make_app()(scope, receive, send))
+
+    headers = {key.decode(): value.decode() for key, value in sent[0]["headers"]}
+    return headers, [message.get("body", b"") for message in sent[1:]]
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate", GZIP),
+        ("gzip;q=0", None),
+        ("*", "br" if compression_service.brotli else GZIP),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    """Test Accept-Encoding negotiation honours q-values and wildcards"""
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_html_is_gzipped():
+    """Test HTML fragments above the threshold are compressed"""
+    headers, bodies = get("/big")
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(b"".join(bodies))
+    assert gzip.decompress(b"".join(bodies)).decode() == BIG_HTML
+
+
+def test_small_and_binary_responses_pass_through():
+    """Test small bodies and incompressible types are left alone"""
+    small_headers, _ = get("/small")
+    binary_headers, binary_bodies = get("/binary")
+
+    assert "content-encoding" not in small_headers
+    assert "content-encoding" not in binary_headers
+    assert b"".join(binary_bodies) == b"\x00" * 4096
+
+
+def test_streamed_tsv_is_compressed_incrementally():
+    """Test streaming downloads stay streamed and decode to the same bytes"""
+    headers, bodies = get("/tsv")
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    # Each chunk is flushed as it arrives rather than buffered to the end
+    assert sum(1 for body in bodies if body) > len(TSV_CHUNKS) // 2
+    assert gzip.decompress(b"".join(bodies)).decode() == "".join(TSV_CHUNKS)
+
+
+def test_functions_copy_is_identical():
+    """Test the Functions backend ships the same compression module"""
+    if not os.path.exists(FUNCTIONS_COPY):
+        pytest.skip("Functions source not available")
+
+    with open(SERVICE_MODULE, "rb") as ours, open(FUNCTIONS_COPY, "rb") as theirs:
+        assert ours.read() == theirs.read()
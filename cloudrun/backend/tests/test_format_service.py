@@ -0,0 +1,155 @@
+import json
+import os
+
+import msgpack
+import pytest
+from services.format_service import (
+    iter_ruleset_json,
+    iter_ruleset_msgpack,
+    iter_ruleset_ndjson,
+    parse_condition_value,
+)
+
+FUNCTIONS_COPY = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "..",
+    "firebase",
+    "functions",
+    "src",
+    "utils",
+    "format_utils.py",
+)
+SERVICE_MODULE = os.path.join(
+    os.path.dirname(__file__), "..", "services", "format_service.py"
+)
+
+# Sample test data
+SAMPLE_RULESET = {"id": "abc123", "name": "Fire Safety Checks", "description": ""}
+SAMPLE_RULES = [
+    {
+        "severity": "Error",
+        "message": "Walls must be rated",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "AND",
+                "propertyName": "Width",
+                "predicate": "in range",
+                "value": "100, 250.5",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "in list",
+                "value": "EI 60, EI 90, 120",
+            },
+        ],
+    },
+    {"severity": "Warning", "message": "Empty rules are skipped", "conditions": []},
+    {
+        "message": "Needs a mark",
+        "conditions": [
+            {"logic": "WHERE", "propertyName": "Mark", "predicate": "exists"},
+        ],
+    },
+]
+
+EXPECTED_RULES = [
+    {
+        "number": 1,
+        "severity": "Error",
+        "message": "Walls must be rated",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "property": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "AND",
+                "property": "Width",
+                "predicate": "in range",
+                "value": {"min": 100, "max": 250.5},
+            },
+            {
+                "logic": "CHECK",
+                "property": "Fire Rating",
+                "predicate": "in list",
+                "value": ["EI 60", "EI 90", 120],
+            },
+        ],
+    },
+    {
+        "number": 2,
+        "severity": "Error",
+        "message": "Needs a mark",
+        "conditions": [
+            {"logic": "WHERE", "property": "Mark", "predicate": "exists", "value": None}
+        ],
+    },
+]
+
+
+@pytest.mark.parametrize(
+    "predicate,value,expected",
+    [
+        ("greater than", "10", 10),
+        ("less than", " 2.5 ", 2.5),
+        ("greater than", "inf", "inf"),
+        (">", "200", 200),
+        ("equal to", "Walls", "Walls"),
+        ("equal to", "007", "007"),
+        ("not equal to", "0.50", "0.50"),
+        ("!=", "12", "12"),
+        ("in range", "1,5", {"min": 1, "max": 5}),
+        ("in range", "a,b", "a,b"),
+        ("in list", "a, ,b", ["a", "b"]),
+        ("in list", "007, 010", ["007", "010"]),
+        ("in list", "7, -2.5, 2.50, 1e3, None", [7, -2.5, "2.50", "1e3", "None"]),
+        ("is true", "anything", None),
+        ("contains", "12", "12"),
+    ],
+)
+def test_parse_condition_value(predicate, value, expected):
+    """Test values are typed according to their predicate"""
+    assert parse_condition_value(predicate, value) == expected
+
+
+def test_json_and_ndjson_carry_the_same_records():
+    """Test both JSON variants decode to the typed rule model"""
+    document = json.loads("".join(iter_ruleset_json(SAMPLE_RULESET, SAMPLE_RULES)))
+    lines = "".join(iter_ruleset_ndjson(SAMPLE_RULESET, SAMPLE_RULES)).splitlines()
+
+    assert document["ruleset"] == SAMPLE_RULESET
+    assert document["rules"] == EXPECTED_RULES
+    assert json.loads(lines[0]) == SAMPLE_RULESET
+    assert [json.loads(line) for line in lines[1:]] == EXPECTED_RULES
+
+
+def test_msgpack_is_a_stream_of_objects():
+    """Test the MessagePack stream unpacks to the header and then each rule"""
+    unpacker = msgpack.Unpacker()
+    for chunk in iter_ruleset_msgpack(SAMPLE_RULESET, SAMPLE_RULES, chunk_size=16):
+        unpacker.feed(chunk)
+
+    header, *rules = list(unpacker)
+
+    assert header == SAMPLE_RULESET
+    assert rules == EXPECTED_RULES
+
+
+def test_functions_copy_is_identical():
+    """Test the Functions backend ships the same formats module"""
+    if not os.path.exists(FUNCTIONS_COPY):
+        pytest.skip("Functions source not available")
+
+    with open(SERVICE_MODULE, "rb") as ours, open(FUNCTIONS_COPY, "rb") as theirs:
+        assert ours.read() == theirs.read()
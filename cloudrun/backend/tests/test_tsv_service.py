@@ -0,0 +1,283 @@
+import csv
+import os
+import random
+from io import BytesIO, StringIO
+
+import pytest
+from services.mapping import CANONICAL_PREDICATES
+from services.tsv_service import (
+    TsvImportError,
+    generate_ruleset_tsv,
+    iter_ruleset_tsv,
+    iter_tsv_lines,
+    parse_ruleset_tsv,
+)
+
+FUNCTIONS_UTILS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "firebase", "functions", "src", "utils"
+)
+SERVICES = os.path.join(os.path.dirname(__file__), "..", "services")
+
+# Modules both backends ship, as (cloudrun name, functions name)
+SHARED_MODULES = [("tsv_service.py", "tsv_utils.py"), ("mapping.py", "mapping.py")]
+
+# Sample test data
+SAMPLE_RULESET = {"id": "abc123", "name": "Fire Safety Checks"}
+SAMPLE_RULES = [
+    {
+        "severity": "Error",
+        "message": "Walls must be rated",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "AND",
+                "propertyName": "properties.parameters.Width",
+                "predicate": "greater than",
+                "value": "100",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "in list",
+                "value": "EI 60, EI 90",
+            },
+        ],
+    },
+    {"severity": "Warning", "message": "Empty rules are skipped", "conditions": []},
+    {
+        "message": 'Quote "this"\tand tab',
+        "conditions": [
+            {"logic": "WHERE", "propertyName": "Mark", "predicate": "exists"},
+        ],
+    },
+]
+
+
+def legacy_generate_ruleset_tsv(ruleset, rules):
+    """The original csv.writer-into-StringIO implementation, kept as an oracle."""
+    output = StringIO()
+    writer = csv.writer(output, delimiter="\t")
+    writer.writerow(
+        [
+            "Rule Number",
+            "Logic",
+            "Property Name",
+            "Predicate",
+            "Value",
+            "Report Severity",
+            "Message",
+        ]
+    )
+    rule_number = 1
+    for rule in rules:
+        conditions = rule.get("conditions", [])
+        if not conditions:
+            continue
+        for i, condition in enumerate(conditions[:-1]):
+            writer.writerow(
+                [
+                    str(rule_number) if i == 0 else "",
+                    condition.get("logic", ""),
+                    condition.get("propertyName", ""),
+                    condition.get("predicate", ""),
+                    condition.get("value", ""),
+                    "",
+                    "",
+                ]
+            )
+        last_condition = conditions[-1]
+        writer.writerow(
+            [
+                str(rule_number) if len(conditions) == 1 else "",
+                last_condition.get("logic", ""),
+                last_condition.get("propertyName", ""),
+                last_condition.get("predicate", ""),
+                last_condition.get("value", ""),
+                rule.get("severity", "Error"),
+                rule.get("message", ""),
+            ]
+        )
+        rule_number += 1
+    return output.getvalue()
+
+
+def test_generate_matches_legacy_output():
+    """Test the TSV is identical to what the original generator produced"""
+    tsv_content, filename = generate_ruleset_tsv(SAMPLE_RULESET, SAMPLE_RULES)
+
+    assert tsv_content == legacy_generate_ruleset_tsv(SAMPLE_RULESET, SAMPLE_RULES)
+    assert filename == "fire_safety_checks.tsv"
+
+
+def test_iter_ruleset_tsv_streams_in_chunks():
+    """Test streaming yields several chunks that join to the full file"""
+    rules = (SAMPLE_RULES[0] for _ in range(200))
+
+    chunks = list(iter_ruleset_tsv(SAMPLE_RULESET, rules, chunk_size=1024))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == legacy_generate_ruleset_tsv(
+        SAMPLE_RULESET, [SAMPLE_RULES[0]] * 200
+    )
+
+
+def test_iter_ruleset_tsv_consumes_rules_lazily():
+    """Test the first chunk is produced before the rule source is exhausted"""
+    consumed = []
+
+    def rule_source():
+        for i in range(1000):
+            consumed.append(i)
+            yield SAMPLE_RULES[0]
+
+    chunks = iter_ruleset_tsv(SAMPLE_RULESET, rule_source(), chunk_size=512)
+    next(chunks)
+
+    assert len(consumed) < 1000
+
+
+def test_awkward_values_match_legacy_output():
+    """Test quoting, non-string values and missing keys match csv.writer"""
+    rng = random.Random(42)
+    pieces = ["", "a", '"', "\t", "\r", "\n", " ", "x y", "ü", "''"]
+    # Including unhashable values, which must not reach the escape cache
+    scalars = [None, 0, 1, True, False, 1.5, float("inf"), ["a", "b"], {"a": 1}]
+    rules = []
+    for _ in range(300):
+        conditions = []
+        for _ in range(rng.randint(0, 4)):
+            condition = {}
+            for key in ("logic", "propertyName", "predicate", "value"):
+                roll = rng.random()
+                if roll < 0.1:
+                    continue
+                elif roll < 0.3:
+                    condition[key] = rng.choice(scalars)
+                else:
+                    condition[key] = "".join(rng.choices(pieces, k=3))
+            conditions.append(condition)
+        rule = {"conditions": conditions}
+        if rng.random() < 0.8:
+            rule["severity"] = rng.choice(["Error", "Warning", None, 1])
+        if rng.random() < 0.8:
+            rule["message"] = "".join(rng.choices(pieces, k=4))
+        rules.append(rule)
+
+    tsv_content, _ = generate_ruleset_tsv(SAMPLE_RULESET, rules)
+
+    assert tsv_content == legacy_generate_ruleset_tsv(SAMPLE_RULESET, rules)
+
+
+def parse(text, encoding="utf-8"):
+    return list(
+        parse_ruleset_tsv(
+            iter_tsv_lines(BytesIO(text.encode(encoding))), CANONICAL_PREDICATES
+        )
+    )
+
+
+def test_parse_is_inverse_of_generate():
+    """Test parsing the generated TSV gives back the non-empty rules"""
+    tsv_content, _ = generate_ruleset_tsv(SAMPLE_RULESET, SAMPLE_RULES)
+
+    rules = parse(tsv_content)
+
+    expected = [rule for rule in SAMPLE_RULES if rule["conditions"]]
+    assert [rule["message"] for rule in rules] == [r["message"] for r in expected]
+    assert [rule["severity"] for rule in rules] == ["Error", "Error"]
+    assert rules[0]["conditions"] == expected[0]["conditions"]
+    assert rules[1]["conditions"] == [
+        {"logic": "WHERE", "propertyName": "Mark", "predicate": "exists", "value": ""}
+    ]
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16", "cp1252"])
+def test_parse_spreadsheet_exports(encoding):
+    """Test Excel-style files: BOMs, code pages, no header, short rows"""
+    text = (
+        "1\tWHERE\tcategory\tEqual To\tMurs\r\n"
+        "\tCHECK\tWidth\tgreater than\t100\tWarning\tTrop étroit\r\n"
+        "\t\t\t\t\t\t\r\n"
+        "2\tWHERE\tMark\texists\r\n"
+    )
+
+    rules = parse(text, encoding)
+
+    assert len(rules) == 2
+    assert rules[0]["conditions"][0]["predicate"] == "equal to"
+    assert rules[0]["severity"] == "Warning"
+    assert rules[0]["message"] == "Trop étroit"
+    assert rules[1]["conditions"][0]["value"] == ""
+
+
+def test_parse_maps_legacy_predicates():
+    """Test rulesets stored with symbolic predicates import as they export"""
+    legacy = {
+        "severity": "Warning",
+        "message": "Doors are wide enough",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "==",
+                "value": "Doors",
+            },
+            {
+                "logic": "AND",
+                "propertyName": "Width",
+                "predicate": " > ",
+                "value": "800",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Mark",
+                "predicate": "in",
+                "value": "D1,D2",
+            },
+        ],
+    }
+    tsv_content, _ = generate_ruleset_tsv(SAMPLE_RULESET, [legacy])
+
+    rules = parse(tsv_content)
+
+    assert [c["predicate"] for c in rules[0]["conditions"]] == [
+        "equal to",
+        "greater than",
+        "in list",
+    ]
+
+
+def test_parse_reports_every_invalid_row():
+    """Test all bad rows are reported together"""
+    text = (
+        "\tAND\tOrphan\texists\r\n"
+        "1\tWHERE\tcategory\tsounds like\tWalls\r\n"
+        "2\tWHERE\t\texists\r\n"
+    )
+
+    with pytest.raises(TsvImportError) as excinfo:
+        parse(text)
+
+    assert [error.split(":")[0] for error in excinfo.value.errors] == [
+        "Line 1",
+        "Line 2",
+        "Line 3",
+    ]
+
+
+@pytest.mark.parametrize("service_name,functions_name", SHARED_MODULES)
+def test_functions_copy_is_identical(service_name, functions_name):
+    """Test the Functions backend ships the same module"""
+    functions_copy = os.path.join(FUNCTIONS_UTILS, functions_name)
+    if not os.path.exists(functions_copy):
+        pytest.skip("Functions source not available")
+
+    with open(os.path.join(SERVICES, service_name), "rb") as ours, open(
+        functions_copy, "rb"
+    ) as theirs:
+        assert ours.read() == theirs.read()
@@ -0,0 +1,71 @@
+"""
+Benchmarks for property path suggestions.
+
+Builds a catalog with a large number of distinct parameter paths, as models
+with many families and shared parameters have, and times building its prefix
+index and answering the prefixes a user types on the way to a property. Run
+from firebase/functions:
+
+    python benchmarks/bench_catalog.py
+    python benchmarks/bench_catalog.py --paths 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.evaluation.catalog import PropertyCatalog  # noqa: E402
+
+GROUPS = ["parameters", "type", "instance", "properties.Parameters"]
+WORDS = ["Width", "Height", "Fire", "Rating", "Mark", "Level", "Area", "Phase"]
+
+
+def make_catalog(count, seed=0):
+    """Return a catalog of count distinct paths with skewed element counts."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        entries.append(
+            {
+                "path": f"{rng.choice(GROUPS)}.{name}",
+                "kind": "string",
+                "count": int(rng.paretovariate(1.2)),
+                "samples": [],
+            }
+        )
+    entries.sort(key=lambda entry: entry["path"])
+    return PropertyCatalog(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paths", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    catalog = make_catalog(args.paths)
+    start = time.perf_counter()
+    catalog.suggest("")
+    indexed = time.perf_counter()
+
+    typed = "parameters.Fire Rating"
+    prefixes = [typed[:n] for n in range(len(typed) + 1)] + ["fi", "rat", "wid"]
+    timings = []
+    for prefix in prefixes:
+        begin = time.perf_counter()
+        catalog.suggest(prefix)
+        timings.append((time.perf_counter() - begin) * 1000)
+
+    print(f"{len(catalog)} paths")
+    print(f"build index: {(indexed - start) * 1000:.0f} ms")
+    median = sorted(timings)[len(timings) // 2]
+    print(f"suggest:     {max(timings):.2f} ms worst, {median:.2f} ms median")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Benchmarks for the rule evaluation engine.
+
+Builds a synthetic model of Revit-like elements, flattens it into a column
+table, saves and reloads it memory-mapped, and evaluates a ruleset that
+exercises every predicate, timing each stage separately. Run from
+firebase/functions:
+
+    python benchmarks/bench_evaluation.py
+    python benchmarks/bench_evaluation.py --elements 1000000 --rules 200
+    python benchmarks/bench_evaluation.py --elements 2000000 --workers 4
+    python benchmarks/bench_evaluation.py --changed 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.evaluation.columns import ColumnTable  # noqa: E402
+from src.evaluation import parallel  # noqa: E402
+from src.evaluation.engine import build_table, evaluate_ruleset  # noqa: E402
+from src.evaluation.incremental import VersionDiff  # noqa: E402
+from src.utils.mapping import CANONICAL_PREDICATES  # noqa: E402
+
+CATEGORIES = ["Walls", "Doors", "Windows", "Floors", "Columns", "Rooms", "Pipes"]
+FIRE_RATINGS = ["EI 30", "EI 60", "EI 90", "EI 120", ""]
+
+# A value that makes sense for each predicate
+PREDICATE_VALUES = {
+    "greater than": "150",
+    "less than": "300",
+    "in range": "100,400",
+    "in list": "EI 60, EI 90",
+    "equal to": "EI 60",
+    "not equal to": "EI 30",
+    "is like": r"^EI \d{2}$",
+    "identical to": "EI 120",
+    "contains": "12",
+    "does not contain": "3",
+}
+NUMERIC_PREDICATES = {"greater than", "less than", "in range"}
+
+
+def make_model(count, seed=0):
+    """Return a root collection holding count elements."""
+    rng = random.Random(seed)
+    elements = []
+    for i in range(count):
+        parameters = {
+            "WIDTH": {"name": "Width", "value": rng.choice((100, 150, 200, 250, 400))},
+            "FIRE_RATING": {"name": "Fire Rating", "value": rng.choice(FIRE_RATINGS)},
+            "MARK": {"name": "Mark", "value": f"M{i}" if i % 3 else None},
+            "IS_EXTERNAL": {"name": "Is External", "value": bool(i % 2)},
+        }
+        elements.append(
+            {
+                "id": f"element{i}",
+                "speckle_type": "Objects.BuiltElements.Revit.FamilyInstance",
+                "category": rng.choice(CATEGORIES),
+                "level": f"Level {rng.randint(0, 20)}",
+                "parameters": parameters,
+            }
+        )
+    return {
+        "id": "root",
+        "speckle_type": "Speckle.Core.Models.Collection",
+        "elements": elements,
+    }
+
+
+def make_rules(count, seed=0):
+    """Return count rules cycling through every predicate."""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        predicate = CANONICAL_PREDICATES[i % len(CANONICAL_PREDICATES)]
+        if predicate in NUMERIC_PREDICATES:
+            prop = "Width"
+        elif predicate in ("is true", "is false"):
+            prop = "Is External"
+        elif predicate == "exists":
+            prop = "Mark"
+        else:
+            prop = "Fire Rating"
+        rules.append(
+            {
+                "id": f"rule{i}",
+                "conditions": [
+                    {
+                        "logic": "WHERE",
+                        "propertyName": "category",
+                        "predicate": "equal to",
+                        "value": rng.choice(CATEGORIES),
+                    },
+                    {
+                        "logic": "CHECK",
+                        "propertyName": prop,
+                        "predicate": predicate,
+                        "value": PREDICATE_VALUES.get(predicate, ""),
+                    },
+                ],
+            }
+        )
+    return rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--elements", type=int, default=200_000)
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="also time sharded evaluation"
+    )
+    parser.add_argument(
+        "--changed",
+        type=int,
+        default=0,
+        help="also time patching results after editing this many elements",
+    )
+    args = parser.parse_args(argv)
+
+    model = make_model(args.elements)
+    rules = make_rules(args.rules)
+
+    start = time.perf_counter()
+    table = build_table(model)
+    built = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        table.save(directory)
+        saved = time.perf_counter()
+        table = ColumnTable.load(directory)
+        loaded = time.perf_counter()
+        results = evaluate_ruleset(table, rules)
+        evaluated = time.perf_counter()
+        if args.workers > 1:
+            # Compare against a second, warm in-process run
+            warm_start = time.perf_counter()
+            evaluate_ruleset(table, rules)
+            warm_seconds = time.perf_counter() - warm_start
+            parallel.PARALLEL_MIN_ROWS = 0
+            # The first call starts the workers and maps the table
+            parallel.evaluate_ruleset_parallel(table, rules, args.workers)
+            sharded_start = time.perf_counter()
+            parallel.evaluate_ruleset_parallel(table, rules, args.workers)
+            sharded_seconds = time.perf_counter() - sharded_start
+        if args.changed:
+            elements = model["elements"]
+            step = max(len(elements) // args.changed, 1)
+            for i in range(0, len(elements), step)[: args.changed]:
+                elements[i] = dict(elements[i], id=f"changed{i}", level="Level 99")
+            edited = build_table(model)
+            before = [(result.selected, result.passed) for result in results]
+            diff_start = time.perf_counter()
+            diff = VersionDiff(table, edited)
+            matched = time.perf_counter()
+            for rule, previous in zip(rules, before):
+                diff.patch(rule, previous)
+            patched = time.perf_counter()
+            evaluate_ruleset(edited, rules)
+            full_seconds = time.perf_counter() - patched
+
+    failed = sum(result.to_dict()["failed"] for result in results)
+    evaluate_seconds = evaluated - loaded
+    print(f"{len(table)} elements, {len(table.columns)} columns, {len(results)} rules")
+    print(f"build table: {(built - start) * 1000:.0f} ms")
+    print(f"save:        {(saved - built) * 1000:.0f} ms")
+    print(f"load (mmap): {(loaded - saved) * 1000:.0f} ms")
+    print(
+        f"evaluate:    {evaluate_seconds * 1000:.0f} ms "
+        f"({len(table) * len(results) / evaluate_seconds / 1e6:.1f}M element-rules/s, "
+        f"{failed} failures)"
+    )
+    if args.workers > 1:
+        print(
+            f"sharded:     {sharded_seconds * 1000:.0f} ms with {args.workers} "
+            f"workers, {warm_seconds * 1000:.0f} ms in-process when warm "
+            f"({warm_seconds / sharded_seconds:.1f}x)"
+        )
+    if args.changed:
+        print(
+            f"incremental: {(patched - matched) * 1000:.0f} ms to patch "
+            f"{len(diff.added)} changed elements, after "
+            f"{(matched - diff_start) * 1000:.0f} ms matching rows, "
+            f"{full_seconds * 1000:.0f} ms in full"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
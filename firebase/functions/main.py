@@ -8,6 +8,14 @@ from google.api_core.exceptions import GoogleAPICallError
 from google.cloud import secretmanager
 
 from src.auth.auth_routes import exchange_token, get_user, init_speckle_auth
+from src.evaluation.evaluation_routes import (
+    get_rule_impact,
+    get_ruleset_conflicts,
+    preview_ruleset,
+    suggest_properties,
+    suggest_values,
+)
+from src.projects.project_export import export_project_as_zip
 from src.projects.project_routes import (
     get_new_ruleset_form,
     get_project_with_rulesets,
@@ -20,6 +28,7 @@ from src.rules.rule_routes import (
     get_edit_rule_form,
     get_new_rule_form,
     get_rules,
+    import_rules_handler,
     update_rule_handler,
 )
 from src.rulesets.ruleset_export import export_ruleset_as_tsv
@@ -33,6 +42,8 @@ from src.rulesets.ruleset_sharing import (
     get_shared_ruleset_view,
     toggle_ruleset_sharing_handler,
 )
+from src.rulesets.ruleset_snapshots import get_snapshot_view
+from src.utils.response_utils import compressed
 
 
 def load_firebase_cred_with_fallback():
@@ -73,43 +84,61 @@ cors_config = options.CorsOptions(
 
 # Register Firebase Functions with CORS
 @https_fn.on_request(cors=cors_config)
+@compressed
 def init_auth_fn(req: https_fn.Request) -> https_fn.Response:
     return init_speckle_auth(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def token_exchange_fn(req: https_fn.Request) -> https_fn.Response:
     return exchange_token(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_users_fn(req: https_fn.Request) -> https_fn.Response:
     return get_user(req)
 
 
 # Project Functions
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_projects_fn(req: https_fn.Request) -> https_fn.Response:
     return get_user_projects_view(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_user_projects_fn(req: https_fn.Request) -> https_fn.Response:
     return get_user_projects_view(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_project_details_fn(req: https_fn.Request) -> https_fn.Response:
     return get_project_with_rulesets(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
+def export_project_fn(req: https_fn.Request) -> https_fn.Response:
+    # Extract project_id from path like /api/projects/{project_id}/export.zip
+    project_id = (
+        req.args.get("projectId") or req.path.split("/export.zip")[0].split("/")[-1]
+    )
+    return export_project_as_zip(req, project_id)
+
+
+@https_fn.on_request(cors=cors_config)
+@compressed
 def get_new_ruleset_form_fn(req: https_fn.Request) -> https_fn.Response:
     return get_new_ruleset_form(req)
 
 
 # Ruleset Functions
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
@@ -118,11 +147,13 @@ def get_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def create_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     return create_new_ruleset(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def update_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
@@ -131,6 +162,7 @@ def update_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def delete_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
@@ -139,6 +171,7 @@ def delete_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def toggle_sharing_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/share")[0].split("/")[-1]
@@ -161,6 +194,7 @@ def toggle_sharing_fn(req: https_fn.Request) -> https_fn.Response:
 #     print(f"Ruleset ID: {ruleset_id}")
 #     return get_shared_ruleset_view(req, ruleset_id)
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_shared_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     """Directly serve TSV for shared rulesets to support automation"""
     try:
@@ -199,8 +233,72 @@ def get_shared_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
         )
 
 
+# Ruleset Snapshot Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def get_snapshot_fn(req: https_fn.Request) -> https_fn.Response:
+    # Extract the hash from path like /api/snapshots/{hash}
+    content_hash = (
+        req.path.split("/snapshots/")[1].split("/")[0]
+        if "/snapshots/" in req.path
+        else req.args.get("hash")
+    )
+    return get_snapshot_view(req, content_hash)
+
+
+# Ruleset Preview Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def preview_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/preview")[-2].split("/")[-1]
+    )
+    return preview_ruleset(req, ruleset_id)
+
+
+# Rule Impact Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def rule_impact_fn(req: https_fn.Request) -> https_fn.Response:
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/impact")[-2].split("/")[-1]
+    )
+    return get_rule_impact(req, ruleset_id)
+
+
+# Rule Conflicts Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def ruleset_conflicts_fn(req: https_fn.Request) -> https_fn.Response:
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/conflicts")[-2].split("/")[-1]
+    )
+    return get_ruleset_conflicts(req, ruleset_id)
+
+
+# Property Suggestion Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def suggest_properties_fn(req: https_fn.Request) -> https_fn.Response:
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/properties")[-2].split("/")[-1]
+    )
+    return suggest_properties(req, ruleset_id)
+
+
+# Value Suggestion Function
+@https_fn.on_request(cors=cors_config)
+@compressed
+def suggest_values_fn(req: https_fn.Request) -> https_fn.Response:
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/values")[-2].split("/")[-1]
+    )
+    return suggest_values(req, ruleset_id)
+
+
 # Ruleset Export Function
 @https_fn.on_request(cors=cors_config)
+@compressed
 def export_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/export")[-2].split("/")[-1]
@@ -210,6 +308,7 @@ def export_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 # Rule Functions
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_rules_fn(req: https_fn.Request) -> https_fn.Response:
     # Extract ruleset_id from path like /api/rulesets/{ruleset_id}/rules
     ruleset_id = (
@@ -231,6 +330,23 @@ def get_rules_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
+def import_rules_fn(req: https_fn.Request) -> https_fn.Response:
+    # Extract ruleset_id from path like /api/rulesets/{ruleset_id}/import
+    ruleset_id = (
+        req.args.get("ruleset_id") or req.path.split("/import")[0].split("/")[-1]
+    )
+    if req.method != "POST":
+        return https_fn.Response(
+            json.dumps({"error": f"Method {req.method} not allowed"}),
+            mimetype="application/json",
+            status=405,
+        )
+    return import_rules_handler(req, ruleset_id)
+
+
+@https_fn.on_request(cors=cors_config)
+@compressed
 def update_rule_fn(req: https_fn.Request) -> https_fn.Response:
     parts = req.path.split("/")
     ruleset_id = req.args.get("ruleset_id") or parts[-3]
@@ -250,6 +366,7 @@ def update_rule_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_new_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rules/new")[0].split("/")[-1]
@@ -258,6 +375,7 @@ def get_new_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_condition_row_fn(req: https_fn.Request) -> https_fn.Response:
     index = req.args.get("index")
 
@@ -272,6 +390,7 @@ def get_condition_row_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@compressed
 def get_edit_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
     parts = req.path.split("/")
 
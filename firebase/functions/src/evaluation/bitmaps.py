@@ -0,0 +1,315 @@
+"""
+Compressed bitmaps of element rows, in the style of Roaring bitmaps.
+
+Rule results are sets of rows of a version's table, and row numbers are
+stable for a version since its table never changes. Rows are split into
+chunks of 65,536 by their high 16 bits, and each chunk is stored the
+cheaper of two ways:
+
+- array: the sorted low 16 bits of its rows (uint16), for up to 4,096 rows
+- bitmap: 65,536 bits (1,024 uint64 words), for more
+
+So a rule failing on a handful of elements of a million-element model costs
+a few bytes rather than the 125 KB of a plain bitmap, and a rule selecting
+most of the model never costs more than the plain bitmap. AND, OR and
+ANDNOT work chunk by chunk on the compressed form.
+
+Serialized (little-endian): the magic ``MCRB``, the number of chunks
+(uint32), each chunk's key (uint16) and row count (uint32), then each
+chunk's payload; chunks of more than 4,096 rows are bitmaps. Serialized
+bitmaps are self-delimiting, so several can be stored back to back.
+"""
+
+import base64
+import struct
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+# Largest chunk kept as an array; an array this size takes as much space as
+# a bitmap
+ARRAY_MAX = 4096
+BITMAP_WORDS = CHUNK_SIZE // 64
+
+MAGIC = b"MCRB"
+_HEADER = struct.Struct("<4sI")
+
+
+def _bits(chunk: np.ndarray) -> np.ndarray:
+    """Return a bitmap chunk as one bool per row."""
+    return np.unpackbits(chunk.view(np.uint8), bitorder="little").view(bool)
+
+
+def _pack(mask: np.ndarray) -> np.ndarray:
+    """Return up to 65,536 bools as a bitmap chunk."""
+    if len(mask) < CHUNK_SIZE:
+        mask = np.concatenate([mask, np.zeros(CHUNK_SIZE - len(mask), dtype=bool)])
+    return np.packbits(mask, bitorder="little").view("<u8")
+
+
+def _to_bitmap(rows: np.ndarray) -> np.ndarray:
+    mask = np.zeros(CHUNK_SIZE, dtype=bool)
+    mask[rows] = True
+    return _pack(mask)
+
+
+def _is_bitmap(chunk: np.ndarray) -> bool:
+    return chunk.dtype.itemsize == 8
+
+
+def _cardinality(chunk: np.ndarray) -> int:
+    if _is_bitmap(chunk):
+        return int(np.bitwise_count(chunk).sum())
+    return len(chunk)
+
+
+def _contains(bitmap: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Return whether each of an array chunk's rows is set in a bitmap chunk."""
+    words = bitmap[rows >> 6]
+    return ((words >> (rows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def _normalize(chunk: np.ndarray):
+    """Store a chunk the cheaper way, or return None if it is empty."""
+    if _is_bitmap(chunk):
+        count = _cardinality(chunk)
+        if count == 0:
+            return None
+        if count <= ARRAY_MAX:
+            return np.flatnonzero(_bits(chunk)).astype("<u2")
+        return chunk
+    if not len(chunk):
+        return None
+    if len(chunk) > ARRAY_MAX:
+        return _to_bitmap(chunk)
+    return chunk
+
+
+def _and(a: np.ndarray, b: np.ndarray):
+    if _is_bitmap(a) and _is_bitmap(b):
+        return a & b
+    if _is_bitmap(a):
+        a, b = b, a
+    if _is_bitmap(b):
+        return a[_contains(b, a)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def _or(a: np.ndarray, b: np.ndarray):
+    if _is_bitmap(a) and _is_bitmap(b):
+        return a | b
+    if _is_bitmap(a):
+        a, b = b, a
+    if _is_bitmap(b):
+        return b | _to_bitmap(a)
+    return np.union1d(a, b).astype("<u2")
+
+
+def _andnot(a: np.ndarray, b: np.ndarray):
+    if _is_bitmap(a) and _is_bitmap(b):
+        return a & ~b
+    if _is_bitmap(a):
+        return a & ~_to_bitmap(b)
+    if _is_bitmap(b):
+        return a[~_contains(b, a)]
+    return np.setdiff1d(a, b, assume_unique=True).astype("<u2")
+
+
+class RowBitmap:
+    """A compressed set of row numbers."""
+
+    def __init__(self, chunks: Dict[int, np.ndarray] = None):
+        # High 16 bits of the rows -> array or bitmap chunk, never empty
+        self.chunks = chunks or {}
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "RowBitmap":
+        """Build a bitmap of the rows where a boolean mask is set."""
+        chunks = {}
+        for key, start in enumerate(range(0, len(mask), CHUNK_SIZE)):
+            part = mask[start : start + CHUNK_SIZE]
+            count = int(np.count_nonzero(part))
+            if count > ARRAY_MAX:
+                chunks[key] = _pack(part)
+            elif count:
+                chunks[key] = np.flatnonzero(part).astype("<u2")
+        return cls(chunks)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[int]) -> "RowBitmap":
+        """Build a bitmap of some row numbers."""
+        if not isinstance(rows, np.ndarray):
+            rows = np.fromiter(rows, dtype=np.int64)
+        rows = np.unique(rows.astype(np.int64))
+        keys = rows >> CHUNK_BITS
+        boundaries = np.flatnonzero(np.diff(keys)) + 1
+        chunks = {}
+        for part in np.split(rows, boundaries):
+            if len(part):
+                low = (part & (CHUNK_SIZE - 1)).astype("<u2")
+                chunks[int(part[0] >> CHUNK_BITS)] = _normalize(low)
+        return cls(chunks)
+
+    def to_mask(self, length: int) -> np.ndarray:
+        """Return the bitmap as a boolean mask over a number of rows."""
+        mask = np.zeros(length, dtype=bool)
+        for key, chunk in self.chunks.items():
+            start = key * CHUNK_SIZE
+            if start >= length:
+                continue
+            if _is_bitmap(chunk):
+                bits = _bits(chunk)[: length - start]
+                mask[start : start + len(bits)] = bits
+            else:
+                rows = chunk.astype(np.int64) + start
+                mask[rows[rows < length]] = True
+        return mask
+
+    def to_rows(self) -> np.ndarray:
+        """Return the row numbers in the bitmap, in order."""
+        parts = []
+        for key in sorted(self.chunks):
+            chunk = self.chunks[key]
+            low = np.flatnonzero(_bits(chunk)) if _is_bitmap(chunk) else chunk
+            parts.append(low.astype(np.int64) + key * CHUNK_SIZE)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return sum(_cardinality(chunk) for chunk in self.chunks.values())
+
+    def __contains__(self, row: int) -> bool:
+        chunk = self.chunks.get(row >> CHUNK_BITS)
+        if chunk is None:
+            return False
+        low = row & (CHUNK_SIZE - 1)
+        if _is_bitmap(chunk):
+            return bool(_contains(chunk, np.array([low]))[0])
+        index = np.searchsorted(chunk, low)
+        return index < len(chunk) and chunk[index] == low
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RowBitmap):
+            return False
+        if self.chunks.keys() != other.chunks.keys():
+            return False
+        return all(
+            np.array_equal(chunk, other.chunks[key])
+            for key, chunk in self.chunks.items()
+        )
+
+    def _combine(self, other: "RowBitmap", operation, keys) -> "RowBitmap":
+        chunks = {}
+        for key in keys:
+            a = self.chunks.get(key)
+            b = other.chunks.get(key)
+            if a is None or b is None:
+                chunk = a if b is None else b
+            else:
+                chunk = _normalize(operation(a, b))
+            if chunk is not None:
+                chunks[key] = chunk
+        return RowBitmap(chunks)
+
+    def __and__(self, other: "RowBitmap") -> "RowBitmap":
+        keys = self.chunks.keys() & other.chunks.keys()
+        return self._combine(other, _and, keys)
+
+    def __or__(self, other: "RowBitmap") -> "RowBitmap":
+        keys = self.chunks.keys() | other.chunks.keys()
+        return self._combine(other, _or, keys)
+
+    def __sub__(self, other: "RowBitmap") -> "RowBitmap":
+        """Rows in this bitmap and not in the other (ANDNOT)."""
+        chunks = {}
+        for key, chunk in self.chunks.items():
+            if key in other.chunks:
+                chunk = _normalize(_andnot(chunk, other.chunks[key]))
+            if chunk is not None:
+                chunks[key] = chunk
+        return RowBitmap(chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the chunks."""
+        return sum(chunk.nbytes for chunk in self.chunks.values())
+
+    def serialize(self) -> bytes:
+        """Return the bitmap in its compact serialized form."""
+        keys = sorted(self.chunks)
+        parts = [
+            _HEADER.pack(MAGIC, len(keys)),
+            np.array(keys, dtype="<u2").tobytes(),
+            np.array(
+                [_cardinality(self.chunks[key]) for key in keys], dtype="<u4"
+            ).tobytes(),
+        ]
+        parts.extend(self.chunks[key].tobytes() for key in keys)
+        return b"".join(parts)
+
+    @classmethod
+    def deserialize(cls, data: bytes, offset: int = 0) -> Tuple["RowBitmap", int]:
+        """
+        Read a serialized bitmap.
+
+        Args:
+            data: Serialized bytes
+            offset: Where the bitmap starts in data
+
+        Returns:
+            tuple: The bitmap, and the offset just past it
+
+        Raises:
+            ValueError: If data does not hold a serialized bitmap
+        """
+        if len(data) < offset + _HEADER.size:
+            raise ValueError("Truncated row bitmap")
+        magic, count = _HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError("Not a row bitmap")
+        offset += _HEADER.size
+        try:
+            keys = np.frombuffer(data, dtype="<u2", count=count, offset=offset)
+            offset += 2 * count
+            counts = np.frombuffer(data, dtype="<u4", count=count, offset=offset)
+            offset += 4 * count
+            chunks = {}
+            for key, rows in zip(keys.tolist(), counts.tolist()):
+                if rows > ARRAY_MAX:
+                    chunk = np.frombuffer(
+                        data, dtype="<u8", count=BITMAP_WORDS, offset=offset
+                    )
+                else:
+                    chunk = np.frombuffer(data, dtype="<u2", count=rows, offset=offset)
+                offset += chunk.nbytes
+                chunks[key] = chunk
+        except ValueError as e:
+            raise ValueError(f"Truncated row bitmap: {str(e)}")
+        return cls(chunks), offset
+
+
+def dumps(bitmaps: List[RowBitmap]) -> bytes:
+    """Serialize bitmaps back to back."""
+    return b"".join(bitmap.serialize() for bitmap in bitmaps)
+
+
+def loads(data: bytes) -> List[RowBitmap]:
+    """Read bitmaps serialized back to back by dumps."""
+    bitmaps = []
+    offset = 0
+    while offset < len(data):
+        bitmap, offset = RowBitmap.deserialize(data, offset)
+        bitmaps.append(bitmap)
+    return bitmaps
+
+
+def to_base64(bitmap: RowBitmap) -> str:
+    """Return a serialized bitmap as base64 text, for JSON responses."""
+    return base64.b64encode(bitmap.serialize()).decode("ascii")
+
+
+def from_base64(text: str) -> RowBitmap:
+    """Read a bitmap returned by to_base64."""
+    bitmap, _ = RowBitmap.deserialize(base64.b64decode(text))
+    return bitmap
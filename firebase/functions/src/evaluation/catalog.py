@@ -0,0 +1,161 @@
+"""
+Property catalog of a model, for autocompleting rule property names.
+
+The catalog lists every flattened property path of a version's elements with
+how many elements have it, the kind of its values and its most common values.
+It is drawn from the version's value histograms and saved next to its table
+as compact JSON.
+
+Suggestions come from a prefix index: the lowercased path and each of its
+dotted suffixes (``parameters.width`` is also found as ``width``), sorted in
+one array. The keys starting with a prefix form one contiguous run of that
+array, the same set a trie node would hold, found with two binary searches.
+Each key carries its entry's precomputed rank, so the best matches are a
+partial partition of small integers rather than a sort of the run.
+"""
+
+import json
+import os
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .columns import ColumnTable
+from .flatten import PATH_SEPARATOR
+from .histograms import ValueHistograms
+
+CATALOG_FILE = "catalog.json"
+CATALOG_FORMAT_VERSION = 1
+
+# Most common values kept per path
+SAMPLE_COUNT = 5
+
+DEFAULT_LIMIT = 20
+
+# Sorts after any character a property path contains
+PREFIX_END = "\U0010ffff"
+
+
+class PropertyCatalog:
+    """Property paths of a model with their counts, kinds and sample values."""
+
+    def __init__(self, entries: List[Dict], row_count: int = 0):
+        self.entries = entries
+        self.row_count = row_count
+        self._keys = None
+        self._key_ranks = None
+        self._ranked = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_table(
+        cls, table: ColumnTable, histograms: Optional[ValueHistograms] = None
+    ) -> "PropertyCatalog":
+        """
+        Build the catalog of a table.
+
+        Args:
+            table: Elements of a version
+            histograms: The table's value histograms, if already built
+
+        Returns:
+            PropertyCatalog: One entry per column, sorted by path
+        """
+        if histograms is None:
+            histograms = ValueHistograms.from_table(table, SAMPLE_COUNT)
+        entries = []
+        for path in sorted(histograms.histograms):
+            histogram = histograms.histograms[path]
+            entry = {
+                "path": path,
+                "kind": histogram["kind"],
+                "count": histogram["count"],
+                "samples": [value for value, _ in histogram["top"][:SAMPLE_COUNT]],
+            }
+            if "min" in histogram:
+                entry["min"] = histogram["min"]
+                entry["max"] = histogram["max"]
+            entries.append(entry)
+        return cls(entries, table.row_count)
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": CATALOG_FORMAT_VERSION,
+            "rowCount": self.row_count,
+            "entries": self.entries,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PropertyCatalog":
+        if data.get("version") != CATALOG_FORMAT_VERSION:
+            raise ValueError("Unsupported property catalog version")
+        return cls(data["entries"], data.get("rowCount", 0))
+
+    def save(self, path: str):
+        """Write the catalog as compact JSON, replacing any existing file."""
+        staging = f"{path}.{os.getpid()}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(staging, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PropertyCatalog":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def _index(self):
+        if self._keys is None:
+            # Entries in suggestion order: most common first, then shortest
+            self._ranked = sorted(
+                range(len(self.entries)),
+                key=lambda i: (-self.entries[i]["count"], len(self.entries[i]["path"])),
+            )
+            pairs = []
+            for rank, i in enumerate(self._ranked):
+                key = self.entries[i]["path"].lower()
+                pairs.append((key, rank))
+                start = key.find(PATH_SEPARATOR)
+                while start != -1:
+                    pairs.append((key[start + 1 :], rank))
+                    start = key.find(PATH_SEPARATOR, start + 1)
+            pairs.sort()
+            self._keys = [key for key, _ in pairs]
+            self._key_ranks = np.array([rank for _, rank in pairs], dtype=np.int32)
+        return self._keys, self._key_ranks
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """
+        Return the entries whose path, or a dotted suffix of it, starts with
+        a prefix.
+
+        Args:
+            prefix: Text typed so far, matched case-insensitively
+            limit: Maximum number of suggestions
+
+        Returns:
+            list: Entries ordered by how many elements have the property,
+            then by path length
+        """
+        keys, key_ranks = self._index()
+        prefix = (prefix or "").strip().lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, lo=start)
+        if start == end or limit <= 0:
+            return []
+
+        ranks = key_ranks[start:end]
+        # An entry appears once per matching suffix, so take the best few
+        # keys and widen until they hold enough distinct entries
+        take = limit
+        while True:
+            if take >= len(ranks):
+                best = np.unique(ranks)
+                break
+            best = np.unique(np.partition(ranks, take)[:take])
+            if len(best) >= limit:
+                break
+            take *= 2
+        return [self.entries[self._ranked[rank]] for rank in best[:limit].tolist()]
@@ -0,0 +1,399 @@
+"""
+Offline ruleset checks, for gating model exports in CI.
+
+``model-checker`` checks local Speckle object dumps against a ruleset
+exported as TSV (the format of generate_ruleset_tsv) without the hosted
+app, and writes a machine-readable report:
+
+    model-checker ruleset.tsv model.json
+    model-checker ruleset.tsv exports/ --output report.json --fail-on warning
+
+A model is one file: the root object with its children inline, a JSON array
+of the root and its closure, or objects one per line, either bare JSON or
+Speckle's ``{id}\\t{json}`` lines as the objects endpoint serves them. Files
+may be gzipped. Line-delimited dumps are read a chunk at a time and each
+object is dropped once flattened, so memory follows the size of the element
+table rather than of the dump. A directory is checked as one model per file.
+
+Several models are checked in parallel, one per worker process; a single
+large model is saved to a temporary table and sharded over the workers (see
+parallel.py). The report is streamed, each model written as soon as it is
+checked, as one JSON document or as JSON lines (a ruleset header, one line
+per model, then the summary).
+
+The exit code gives the most severe failure at or above ``--fail-on``:
+0 when there is none, 1 for Error, 3 for Warning and 4 for Info. Invalid
+input (an unreadable ruleset or model, a model with no elements, a rule that
+does not compile) exits with 2, as do usage errors. Whatever goes wrong with
+one model is reported against that model and the others are still checked.
+"""
+
+import argparse
+import contextlib
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from ..utils.mapping import get_canonical_predicate
+from ..utils.speckle_api import iter_object_lines
+from ..utils.tsv_utils import TsvImportError, iter_tsv_lines, parse_ruleset_tsv
+from .columns import ColumnTable
+from .engine import build_table, evaluate_ruleset
+from .incremental import ID_PATH, row_strings
+from .parallel import PARALLEL_MIN_ROWS, available_cpus, evaluate_ruleset_parallel
+
+EXIT_OK = 0
+EXIT_INVALID = 2
+# Most severe first
+SEVERITY_EXIT_CODES = {"Error": 1, "Warning": 3, "Info": 4}
+FAIL_ON = {"error": "Error", "warning": "Warning", "info": "Info", "never": None}
+
+MODEL_SUFFIXES = (".json", ".jsonl", ".ndjson", ".txt")
+
+# Bytes read from a dump at a time
+READ_SIZE = 1024 * 1024
+
+# Failing element IDs listed per rule by default
+DEFAULT_MAX_FAILURES = 100
+
+
+def open_dump(path: str):
+    """Open a model dump for binary reading, decompressing .gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_dump_objects(path: str) -> Iterator[Dict]:
+    """
+    Yield the objects of a model dump, streaming line-delimited dumps.
+
+    A dump starting with ``[``, or with a ``{`` line that does not close on
+    the same line, is one JSON document and is read whole.
+
+    Raises:
+        ValueError: If the dump is not valid JSON
+    """
+    with open_dump(path) as f:
+        head = f.read(READ_SIZE)
+        start = head.lstrip()
+        first_line = start.split(b"\n", 1)[0].strip()
+        if start.startswith(b"[") or (
+            start.startswith(b"{") and not first_line.endswith(b"}")
+        ):
+            document = json.loads(head + f.read())
+            if isinstance(document, dict):
+                yield document
+            else:
+                yield from document
+            return
+
+        chunks = iter(lambda: f.read(READ_SIZE), b"")
+        yield from iter_object_lines(_prepend(head, chunks))
+
+
+def _prepend(head: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    yield head
+    yield from chunks
+
+
+def model_paths(paths: Iterable[str]) -> List[str]:
+    """Return the model dumps named by files and directories, in order."""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            stem = name[:-3] if name.endswith(".gz") else name
+            full = os.path.join(path, name)
+            if stem.endswith(MODEL_SUFFIXES) and os.path.isfile(full):
+                found.append(full)
+    return found
+
+
+def read_rules(path: str) -> List[Dict]:
+    """
+    Read a ruleset TSV as exported by the app.
+
+    Predicates are mapped to their canonical names here, once, rather than
+    by every worker compiling the rules.
+
+    Raises:
+        TsvImportError: If any row is invalid
+    """
+    with open(path, "rb") as f:
+        rules = list(parse_ruleset_tsv(iter_tsv_lines(f)))
+    for rule in rules:
+        for condition in rule["conditions"]:
+            condition["predicate"] = get_canonical_predicate(condition["predicate"])
+    return rules
+
+
+def _evaluate(table: ColumnTable, rules: List[Dict], workers: int):
+    """Evaluate in-process, or sharded over workers for large tables."""
+    if workers <= 1 or len(table) < PARALLEL_MIN_ROWS:
+        return evaluate_ruleset(table, rules)
+    with tempfile.TemporaryDirectory(prefix="model-checker-") as directory:
+        table.save(directory)
+        stored = ColumnTable.load(directory)
+        return evaluate_ruleset_parallel(stored, rules, workers)
+
+
+def check_model(
+    path: str, rules: List[Dict], workers: int = 1, max_failures: int = 0
+) -> Dict:
+    """
+    Check one model dump against a ruleset.
+
+    Args:
+        path: Model dump
+        rules: Rule dictionaries
+        workers: Processes a large model is sharded over
+        max_failures: Failing element IDs to list per rule
+
+    Returns:
+        dict: The model's report: path, element count, timings and per-rule
+        results, or an error if the dump could not be read or checked
+    """
+    started = time.perf_counter()
+    try:
+        table = build_table(iter_dump_objects(path))
+    except Exception as e:
+        # Any dump that does not flatten is invalid input, not a crash
+        return {"path": path, "error": f"Could not read model: {str(e)}"}
+    if not len(table):
+        return {"path": path, "error": "Could not read model: no elements found"}
+    loaded = time.perf_counter()
+    try:
+        results = _evaluate(table, rules, workers)
+    except Exception as e:
+        return {"path": path, "error": f"Could not check model: {str(e)}"}
+    evaluated = time.perf_counter()
+
+    rule_reports = []
+    for result in results:
+        report = result.to_dict()
+        if max_failures and not result.error and report["failed"]:
+            rows = np.flatnonzero(result.failed)[:max_failures]
+            ids = row_strings(table, ID_PATH, rows)
+            report["failures"] = [] if ids is None else ids.tolist()
+        rule_reports.append(report)
+
+    seconds = evaluated - started
+    return {
+        "path": path,
+        "elements": len(table),
+        "loadMs": round((loaded - started) * 1000, 1),
+        "evaluateMs": round((evaluated - loaded) * 1000, 1),
+        "elementsPerSecond": round(len(table) / seconds) if seconds else None,
+        "rules": rule_reports,
+    }
+
+
+def _check_models(
+    paths: List[str], rules: List[Dict], workers: int, max_failures: int
+) -> Iterator[Dict]:
+    """Yield model reports in order, checking several models in parallel."""
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield check_model(path, rules, workers, max_failures)
+        return
+
+    # Spawned, as in parallel.py; each worker checks whole models in-process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(paths)), mp_context=context
+    ) as executor:
+        yield from executor.map(
+            check_model,
+            paths,
+            [rules] * len(paths),
+            [1] * len(paths),
+            [max_failures] * len(paths),
+        )
+
+
+def exit_code(reports: Iterable[Dict], fail_on: Optional[str]) -> int:
+    """
+    Return the exit code for a set of model reports.
+
+    Args:
+        reports: Model reports from check_model
+        fail_on: Least severe severity that fails the run, or None
+
+    Returns:
+        int: 2 if any model or rule is invalid, else the code of the most
+        severe failing severity at or above fail_on, else 0
+    """
+    failing = set()
+    for report in reports:
+        if "error" in report:
+            return EXIT_INVALID
+        for rule in report["rules"]:
+            if "error" in rule:
+                return EXIT_INVALID
+            if rule["failed"]:
+                failing.add(rule["severity"])
+
+    if fail_on is None:
+        return EXIT_OK
+    for severity, code in SEVERITY_EXIT_CODES.items():
+        if severity in failing:
+            return code
+        if severity == fail_on:
+            break
+    return EXIT_OK
+
+
+class ReportWriter:
+    """Writes a report as models are checked, as JSON or JSON lines."""
+
+    def __init__(self, out, lines: bool):
+        self.out = out
+        self.lines = lines
+        self.models = 0
+
+    def start(self, header: Dict):
+        if self.lines:
+            self.out.write(json.dumps({"ruleset": header}) + "\n")
+        else:
+            self.out.write('{"ruleset": ' + json.dumps(header) + ', "models": [')
+
+    def model(self, report: Dict):
+        if self.lines:
+            self.out.write(json.dumps({"model": report}) + "\n")
+        else:
+            self.out.write(("" if not self.models else ", ") + json.dumps(report))
+        self.models += 1
+        self.out.flush()
+
+    def finish(self, summary: Dict):
+        if self.lines:
+            self.out.write(json.dumps({"summary": summary}) + "\n")
+        else:
+            self.out.write('], "summary": ' + json.dumps(summary) + "}\n")
+        self.out.flush()
+
+
+def _summarize(totals: Dict, report: Dict):
+    totals["models"] += 1
+    totals["elements"] += report.get("elements", 0)
+    for rule in report.get("rules", []):
+        if rule["failed"]:
+            failed = totals["failedRules"]
+            failed[rule["severity"]] = failed.get(rule["severity"], 0) + 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="model-checker",
+        description="Check local Speckle model dumps against a ruleset TSV.",
+        epilog="Exit codes: 0 no failures at or above --fail-on, 1 Error, "
+        "3 Warning, 4 Info, 2 invalid input.",
+    )
+    parser.add_argument("ruleset", help="Ruleset TSV exported by the app")
+    parser.add_argument(
+        "models",
+        nargs="+",
+        help="Model dumps (.json, .jsonl, .ndjson, optionally .gz) or "
+        "directories of them",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="Report file, default standard output"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "jsonl"),
+        default="json",
+        help="One JSON document, or JSON lines",
+    )
+    parser.add_argument(
+        "--fail-on",
+        choices=tuple(FAIL_ON),
+        default="error",
+        help="Least severe failing severity that fails the run",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=available_cpus(),
+        help="Worker processes, default one per CPU",
+    )
+    parser.add_argument(
+        "--max-failures",
+        type=int,
+        default=DEFAULT_MAX_FAILURES,
+        help="Failing element IDs listed per rule",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the model-checker command and return its exit code."""
+    args = build_parser().parse_args(argv)
+    stdout = sys.stdout
+    # Standard output may carry the report, so the engine's logging goes to
+    # standard error
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            rules = read_rules(args.ruleset)
+        except (OSError, TsvImportError) as e:
+            print(f"Could not read ruleset {args.ruleset}: {str(e)}")
+            return EXIT_INVALID
+        paths = model_paths(args.models)
+        if not paths:
+            print("No model dumps found")
+            return EXIT_INVALID
+
+        if args.output == "-":
+            return _run(args, rules, paths, stdout)
+        with open(args.output, "w", encoding="utf-8") as out:
+            return _run(args, rules, paths, out)
+
+
+def _run(args, rules: List[Dict], paths: List[str], out) -> int:
+    """Check the models, streaming the report to out."""
+    writer = ReportWriter(out, args.format == "jsonl")
+    writer.start({"path": args.ruleset, "rules": len(rules)})
+    totals = {"models": 0, "elements": 0, "failedRules": {}}
+    reports = []
+    started = time.perf_counter()
+    for report in _check_models(
+        paths, rules, max(args.workers, 1), max(args.max_failures, 0)
+    ):
+        writer.model(report)
+        _summarize(totals, report)
+        # Only what the exit code needs is kept
+        reports.append(
+            {key: report[key] for key in ("error", "rules") if key in report}
+        )
+        if "error" in report:
+            print(f"{report['path']}: {report['error']}")
+        else:
+            print(
+                f"{report['path']}: {report['elements']} elements, "
+                f"{report['elementsPerSecond']} elements/s"
+            )
+
+    seconds = time.perf_counter() - started
+    code = exit_code(reports, FAIL_ON[args.fail_on])
+    totals.update(
+        seconds=round(seconds, 3),
+        elementsPerSecond=round(totals["elements"] / seconds) if seconds else None,
+        exitCode=code,
+    )
+    writer.finish(totals)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,606 @@
+"""
+Columnar tables of flattened model elements.
+
+Each property path becomes one typed column with a validity (null) bitmap:
+
+- number: float64 values, for paths whose values are all ints or floats
+- bool: uint8 values, for paths whose values are all booleans
+- string: int32 codes into the column's distinct values, for everything else
+  (mixed columns are stored as strings; predicates still parse numbers)
+
+Predicates see every column through the same interface: ``present``,
+``numbers`` and dictionary codes/categories. String predicates are evaluated
+once per distinct value and broadcast through the codes, so they cost
+O(distinct values) in Python plus one NumPy gather; numeric predicates are
+plain array comparisons.
+
+A table saves to a directory of ``.npy`` files plus a JSON manifest and loads
+back memory-mapped, so a model decoded once can be reused by later requests
+and by other processes without walking its JSON again. The manifest also
+carries each column's statistics (null fraction, distinct count, numeric
+range), which the planner uses to order conditions without scanning columns.
+"""
+
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..utils.format_utils import parse_number
+from .flatten import PATH_SEPARATOR
+
+MISSING = -1
+
+NUMBER = "number"
+BOOL = "bool"
+STRING = "string"
+
+MANIFEST_FILE = "manifest.json"
+STORE_FORMAT_VERSION = 1
+
+
+def value_key(value) -> str:
+    """
+    Return the string a value is stored as in a column's categories.
+
+    Whole floats lose their ".0" so 200 and 200.0 are the same category.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    if isinstance(value, float) and math.isfinite(value) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def pack_validity(present: np.ndarray) -> np.ndarray:
+    """Pack a boolean mask into an Arrow-style little-endian bitmap."""
+    return np.packbits(present, bitorder="little")
+
+
+def unpack_validity(bitmap: np.ndarray, length: int) -> np.ndarray:
+    """Unpack a validity bitmap into a boolean mask of the given length."""
+    return np.unpackbits(bitmap, count=length, bitorder="little").view(bool)
+
+
+class Column:
+    """One typed property column with a validity bitmap."""
+
+    def __init__(
+        self,
+        path: str,
+        kind: str,
+        values: np.ndarray,
+        present: Optional[np.ndarray],
+        categories: Optional[List[str]] = None,
+        bitmap: Optional[np.ndarray] = None,
+        stats: Optional[Dict] = None,
+    ):
+        self.path = path
+        self.kind = kind
+        self.values = values
+        # Loaded columns keep the packed bitmap until present is needed
+        self._present = present
+        self._bitmap = bitmap
+        self._codes = values if kind == STRING else None
+        self._categories = categories
+        self._numbers = None
+        self._category_numbers = None
+        self._lower = None
+        self._stats = stats
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Summary statistics of the column, computed once.
+
+        Returns:
+            dict: nulls (fraction of elements without a value), distinct
+            (number of distinct values), and min and max (numbers only,
+            None otherwise)
+        """
+        if self._stats is None:
+            present = self.present
+            count = int(np.count_nonzero(present))
+            stats = {
+                "nulls": 1 - count / len(self) if len(self) else 1.0,
+                "distinct": 0,
+                "min": None,
+                "max": None,
+            }
+            if self.kind == STRING:
+                stats["distinct"] = len(self.categories)
+            elif count:
+                values = self.values[present]
+                stats["distinct"] = int(len(np.unique(values)))
+                if self.kind == NUMBER:
+                    stats["min"] = float(values.min())
+                    stats["max"] = float(values.max())
+            self._stats = stats
+        return self._stats
+
+    @property
+    def present(self) -> np.ndarray:
+        """Whether each element has a value."""
+        if self._present is None:
+            self._present = unpack_validity(self._bitmap, len(self))
+        return self._present
+
+    @property
+    def validity(self) -> np.ndarray:
+        """The null bitmap, one bit per element."""
+        if self._present is None:
+            return self._bitmap
+        return pack_validity(self._present)
+
+    def _encode(self):
+        if self.kind == BOOL:
+            self._categories = ["False", "True"]
+            codes = self.values.astype(np.int32)
+        else:
+            uniques, inverse = np.unique(
+                self.values[self.present], return_inverse=True
+            )
+            self._categories = [value_key(float(v)) for v in uniques]
+            codes = np.full(len(self), MISSING, dtype=np.int32)
+            codes[self.present] = inverse
+        codes[~self.present] = MISSING
+        self._codes = codes
+
+    @property
+    def codes(self) -> np.ndarray:
+        """Index of each element's value in categories, MISSING if null."""
+        if self._codes is None:
+            self._encode()
+        return self._codes
+
+    @property
+    def categories(self) -> List[str]:
+        """Distinct values of the column as strings."""
+        if self._categories is None:
+            self._encode()
+        return self._categories
+
+    @property
+    def category_numbers(self) -> np.ndarray:
+        """Each category parsed as a number, NaN where it is not one."""
+        if self._category_numbers is None:
+            numbers = [parse_number(category) for category in self.categories]
+            self._category_numbers = np.array(
+                [np.nan if n is None else n for n in numbers], dtype=np.float64
+            )
+        return self._category_numbers
+
+    @property
+    def numbers(self) -> np.ndarray:
+        """Numeric value per element, NaN where missing or not a number."""
+        if self._numbers is None:
+            if self.kind == NUMBER:
+                self._numbers = np.where(self.present, self.values, np.nan)
+            elif self.kind == BOOL:
+                self._numbers = np.full(len(self), np.nan)
+            else:
+                self._numbers = self.take(self.category_numbers, np.nan)
+        return self._numbers
+
+    @property
+    def lower_categories(self) -> List[str]:
+        """Categories lowercased, for case-insensitive predicates."""
+        if self._lower is None:
+            self._lower = [category.lower() for category in self.categories]
+        return self._lower
+
+    def take(self, per_category: np.ndarray, fill) -> np.ndarray:
+        """Broadcast one value per category to every element."""
+        # The extra slot at the end is what MISSING (-1) indexes
+        extended = np.append(per_category, np.array([fill], dtype=per_category.dtype))
+        return extended[self.codes]
+
+    def category_mask(self, matches: Iterable[bool]) -> np.ndarray:
+        """Broadcast a per-category boolean to a per-element mask."""
+        return self.take(np.fromiter(matches, dtype=bool, count=-1), False)
+
+    def slice(self, start: int, stop: int) -> "Column":
+        """
+        Return the column for a range of elements, sharing its buffers.
+
+        A range starting on a multiple of 8 slices a loaded column's packed
+        bitmap instead of unpacking all of it. The range keeps the column's
+        statistics, which are close enough for planning.
+        """
+        categories = self._categories if self.kind == STRING else None
+        values = self.values[start:stop]
+        if self._present is None and start % 8 == 0:
+            bitmap = self._bitmap[start // 8 : (start + len(values) + 7) // 8]
+            return Column(
+                self.path, self.kind, values, None, categories, bitmap, self._stats
+            )
+        return Column(
+            self.path,
+            self.kind,
+            values,
+            self.present[start:stop],
+            categories,
+            stats=self._stats,
+        )
+
+    def select(self, rows: np.ndarray) -> "Column":
+        """
+        Return the column for some elements, by their row numbers.
+
+        String columns keep only the categories those elements use, so
+        predicates over a few rows do not walk every distinct value.
+        """
+        present = self.present[rows]
+        if self.kind != STRING:
+            return Column(
+                self.path, self.kind, self.values[rows], present, stats=self._stats
+            )
+        codes = self.codes[rows]
+        used, remapped = np.unique(codes[present], return_inverse=True)
+        values = np.full(len(codes), MISSING, dtype=np.int32)
+        values[present] = remapped
+        categories = [self.categories[code] for code in used]
+        return Column(
+            self.path, STRING, values, present, categories, stats=self._stats
+        )
+
+    def coalesce(self, other: "Column") -> "Column":
+        """Return a column with this column's values, filled in from another."""
+        fill = ~self.present & other.present
+        present = self.present | other.present
+
+        if self.kind == other.kind and self.kind != STRING:
+            values = np.where(fill, other.values, self.values)
+            return Column(self.path, self.kind, values, present)
+
+        mapping = {category: i for i, category in enumerate(self.categories)}
+        categories = list(self.categories)
+        remap = np.empty(len(other.categories), dtype=np.int32)
+        for i, category in enumerate(other.categories):
+            code = mapping.get(category)
+            if code is None:
+                code = mapping[category] = len(categories)
+                categories.append(category)
+            remap[i] = code
+
+        codes = self.codes.copy()
+        codes[fill] = remap[other.codes[fill]]
+        return Column(self.path, STRING, codes, present, categories)
+
+
+def build_column(path: str, row_count: int, rows: List[int], values: List) -> Column:
+    """
+    Build a typed column from the non-null values of one path.
+
+    Args:
+        path: Dotted property path
+        row_count: Number of elements in the table
+        rows: Element index of each value
+        values: Scalar values, in the same order as rows
+
+    Returns:
+        Column: Number, bool or string column depending on the values
+    """
+    index = np.array(rows, dtype=np.int64)
+    present = np.zeros(row_count, dtype=bool)
+    present[index] = True
+
+    if all(type(v) is bool for v in values):
+        column_values = np.zeros(row_count, dtype=np.uint8)
+        column_values[index] = values
+        return Column(path, BOOL, column_values, present)
+
+    if all(type(v) in (int, float) for v in values):
+        try:
+            numbers = np.array(values, dtype=np.float64)
+        except OverflowError:
+            numbers = None
+        if numbers is not None:
+            column_values = np.full(row_count, np.nan)
+            column_values[index] = numbers
+            return Column(path, NUMBER, column_values, present)
+
+    lookup = {}
+    categories = []
+    codes = np.full(row_count, MISSING, dtype=np.int32)
+    value_codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        key = value_key(value)
+        code = lookup.get(key)
+        if code is None:
+            code = lookup[key] = len(categories)
+            categories.append(key)
+        value_codes[i] = code
+    codes[index] = value_codes
+    return Column(path, STRING, codes, present, categories)
+
+
+class TableBuilder:
+    """Accumulates flat element records and turns them into a ColumnTable."""
+
+    def __init__(self):
+        # path -> ([rows], [values])
+        self._paths = {}
+        self.row_count = 0
+
+    def add(self, record: Dict):
+        """Add one element's {path: value} record; None values are nulls."""
+        row = self.row_count
+        self.row_count += 1
+        for path, value in record.items():
+            if value is None:
+                continue
+            entry = self._paths.get(path)
+            if entry is None:
+                entry = self._paths[path] = ([], [])
+            entry[0].append(row)
+            entry[1].append(value)
+
+    def finish(self) -> "ColumnTable":
+        """Build the table; the builder should not be used afterwards."""
+        columns = {}
+        for path, (rows, values) in self._paths.items():
+            columns[path] = build_column(path, self.row_count, rows, values)
+        self._paths = {}
+        return ColumnTable(self.row_count, columns)
+
+
+class ColumnTable:
+    """Flattened elements stored column by column."""
+
+    def __init__(self, row_count: int, columns: Dict[str, Column]):
+        self.row_count = row_count
+        self.columns = columns
+        # Where the table is stored, if it has been saved or loaded
+        self.directory = None
+        self._by_lower = None
+        self._by_leaf = None
+        self._resolved = {}
+
+    def __len__(self):
+        return self.row_count
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "ColumnTable":
+        """
+        Build a table from flat {path: value} records, one per element.
+
+        None values count as missing.
+        """
+        builder = TableBuilder()
+        for record in records:
+            builder.add(record)
+        return builder.finish()
+
+    def save(self, directory: str):
+        """
+        Write the table to a directory as .npy files and a JSON manifest.
+
+        Each column is stored as ``{n}.values.npy`` and ``{n}.valid.npy`` (the
+        packed null bitmap), plus ``{n}.categories.json`` for strings. The
+        manifest is written last, so a directory with a manifest is complete.
+        """
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for n, (path, column) in enumerate(sorted(self.columns.items())):
+            np.save(os.path.join(directory, f"{n}.values.npy"), column.values)
+            np.save(os.path.join(directory, f"{n}.valid.npy"), column.validity)
+            if column.kind == STRING:
+                with open(
+                    os.path.join(directory, f"{n}.categories.json"),
+                    "w",
+                    encoding="utf-8",
+                ) as f:
+                    json.dump(column.categories, f, ensure_ascii=False)
+            entries.append(
+                {"path": path, "kind": column.kind, "file": n, "stats": column.stats}
+            )
+
+        manifest = {
+            "version": STORE_FORMAT_VERSION,
+            "rowCount": self.row_count,
+            "columns": entries,
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "ColumnTable":
+        """
+        Load a table written by save.
+
+        Args:
+            directory: Directory the table was saved to
+            mmap: Memory-map the value arrays and bitmaps instead of reading
+                them
+
+        Returns:
+            ColumnTable
+
+        Raises:
+            ValueError: If the directory holds an incompatible store version
+        """
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported table store version in {directory}")
+
+        row_count = manifest["rowCount"]
+        mmap_mode = "r" if mmap else None
+        columns = {}
+        for entry in manifest["columns"]:
+            n = entry["file"]
+            values = np.load(
+                os.path.join(directory, f"{n}.values.npy"), mmap_mode=mmap_mode
+            )
+            bitmap = np.load(
+                os.path.join(directory, f"{n}.valid.npy"), mmap_mode=mmap_mode
+            )
+            categories = None
+            if entry["kind"] == STRING:
+                with open(
+                    os.path.join(directory, f"{n}.categories.json"), encoding="utf-8"
+                ) as f:
+                    categories = json.load(f)
+            columns[entry["path"]] = Column(
+                entry["path"],
+                entry["kind"],
+                values,
+                None,
+                categories,
+                bitmap,
+                # Tables stored before statistics were kept compute them
+                entry.get("stats"),
+            )
+
+        table = cls(row_count, columns)
+        table.directory = directory
+        return table
+
+    def slice(self, start: int, stop: int) -> "TableSlice":
+        """
+        Return the table of a range of elements.
+
+        Value arrays are views of this table's, so slicing a memory-mapped
+        table reads only the rows of the range.
+        """
+        return TableSlice(self, start, min(stop, self.row_count))
+
+    def rows(self, rows: np.ndarray) -> "TableRows":
+        """Return the table of some elements, by their row numbers."""
+        return TableRows(self, rows)
+
+    def _indexes(self):
+        if self._by_lower is None:
+            self._by_lower = {}
+            self._by_leaf = {}
+            # Shortest paths first, so they win when coalescing
+            paths = sorted(self.columns, key=lambda p: (p.count(PATH_SEPARATOR), p))
+            for path in paths:
+                lower = path.lower()
+                self._by_lower.setdefault(lower, path)
+                leaf = lower.rsplit(PATH_SEPARATOR, 1)[-1]
+                self._by_leaf.setdefault(leaf, []).append(path)
+        return self._by_lower, self._by_leaf
+
+    def resolve(self, property_name: str) -> Optional[Column]:
+        """
+        Find the column a rule's property name refers to.
+
+        The exact dotted path wins, then a case-insensitive match of the whole
+        path. Failing both, every column whose last segment matches the last
+        segment of the property name is merged, shortest path first, so
+        ``Width`` finds ``parameters.Width`` wherever the connector put it.
+
+        Args:
+            property_name: Property name as typed in the rule
+
+        Returns:
+            Column, or None if no element has the property
+        """
+        if property_name in self.columns:
+            return self.columns[property_name]
+        if property_name in self._resolved:
+            return self._resolved[property_name]
+
+        how, target = self.resolution(property_name)
+        if how == "path":
+            column = self.columns[target]
+        else:
+            column = None
+            for path in self._indexes()[1].get(target, []):
+                other = self.columns[path]
+                column = other if column is None else column.coalesce(other)
+
+        self._resolved[property_name] = column
+        return column
+
+    def resolution(self, property_name: str) -> tuple:
+        """
+        Return how resolve finds a property name in this table.
+
+        Returns:
+            tuple: ("path", column path) when it names a column, exactly or
+            ignoring case, else ("leaf", last segment) for merged columns
+        """
+        if property_name in self.columns:
+            return "path", property_name
+        by_lower, _ = self._indexes()
+        lower = property_name.strip().lower()
+        if lower in by_lower:
+            return "path", by_lower[lower]
+        return "leaf", lower.rsplit(PATH_SEPARATOR, 1)[-1]
+
+
+class TableSlice(ColumnTable):
+    """A range of a table's elements, resolving properties through the table."""
+
+    def __init__(self, table: ColumnTable, start: int, stop: int):
+        columns = {
+            path: column.slice(start, stop) for path, column in table.columns.items()
+        }
+        super().__init__(max(stop - start, 0), columns)
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def resolve(self, property_name: str) -> Optional[Column]:
+        """
+        Resolve a property name as the whole table does, sliced to the range.
+
+        Merged columns are built, and cached, once on the whole table rather
+        than once per slice.
+        """
+        if property_name in self.columns:
+            return self.columns[property_name]
+        if property_name not in self._resolved:
+            column = self.table.resolve(property_name)
+            if column is not None:
+                column = column.slice(self.start, self.stop)
+            self._resolved[property_name] = column
+        return self._resolved[property_name]
+
+
+class TableRows(ColumnTable):
+    """Some of a table's elements, resolving properties through the table."""
+
+    def __init__(self, table: ColumnTable, rows: np.ndarray):
+        # Columns are taken as rules ask for them, not all up front
+        super().__init__(len(rows), {})
+        self.table = table
+        self.selected_rows = rows
+
+    def resolve(self, property_name: str) -> Optional[Column]:
+        """
+        Resolve a property name as the whole table does, for these rows.
+
+        Merged columns the whole table has not built are merged for these
+        rows alone, so a few rows cost a few rows' work.
+        """
+        if property_name not in self._resolved:
+            table = self.table
+            rows = self.selected_rows
+            if property_name in table.columns or property_name in table._resolved:
+                column = table.resolve(property_name)
+                column = None if column is None else column.select(rows)
+            else:
+                how, target = table.resolution(property_name)
+                if how == "path":
+                    column = table.columns[target].select(rows)
+                else:
+                    column = None
+                    for path in table._indexes()[1].get(target, []):
+                        other = table.columns[path].select(rows)
+                        column = other if column is None else column.coalesce(other)
+            self._resolved[property_name] = column
+        return self._resolved[property_name]
+
+    def resolution(self, property_name: str) -> tuple:
+        return self.table.resolution(property_name)
@@ -0,0 +1,406 @@
+"""
+Conflicts and redundancy between the rules of a ruleset.
+
+Three kinds of finding are reported:
+
+- conflict: two rules with the same scope (filter) check the same property
+  in ways no element can satisfy both, e.g. ``Width greater than 300`` and
+  ``Width less than 200``; every element of the scope with that property
+  fails one of them
+- unsatisfiable: a rule whose own checks exclude each other, so it fails
+  every element it selects that has the property
+- duplicate: rules with the same scope and the same checks
+
+Rules are never compared pairwise. Scopes and checks are reduced to
+canonical signatures (property names and values case-folded, AND-joined
+conditions in any order), and rules are grouped by (scope, property, kind
+of constraint) through dictionaries. A check on a property becomes either a
+numeric interval (greater than, less than, in range, numeric equal to) or a
+set of values (in list, equal to, is true, is false). Within a group,
+intervals go into an IntervalIndex of sorted endpoints, which finds the
+intervals disjoint from any other in O(log n); sets go into an inverted
+index from value to the sorted positions of the rules allowing it, and a
+rule conflicts with the first rule its values never reach: the first gap in
+the union of its values' positions, found by skipping whole runs of
+consecutive positions, once per distinct set. A ruleset is analysed in
+O(n log n) plus the size of its value lists, plus a binary search per run a
+gap search skips; runs are few unless rules sharing a value alternate with
+rules that do not. Each rule is reported with the nearest rule it conflicts
+with rather than every one.
+
+Other predicates (exists, contains, is like, not equal to, ...) and checks
+joined by OR take no part in conflicts, only in duplicates.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from ..utils.format_utils import parse_number
+from .engine import AND_LOGIC, CompiledCondition, chain_steps, compile_rule
+from .predicates import FALSE_VALUES, TRUE_VALUES
+
+CONFLICT = "conflict"
+UNSATISFIABLE = "unsatisfiable"
+DUPLICATE = "duplicate"
+
+INTERVAL = "interval"
+VALUES = "values"
+
+# Interval endpoints are (number, side) so that open and closed ends at the
+# same number order correctly: an open low end sits just above its number
+# and an open high end just below it. An interval is empty, and two are
+# disjoint, when a high end orders before a low end.
+_CLOSED = 0
+_OPEN_LOW = 1
+_OPEN_HIGH = -1
+_UNBOUNDED_LOW = (-math.inf, _CLOSED)
+_UNBOUNDED_HIGH = (math.inf, _CLOSED)
+
+
+def _item(text: str) -> tuple:
+    """Return a listed value as it is matched: numbers by value, text folded."""
+    number = parse_number(text)
+    if number is not None:
+        return ("number", float(number))
+    return ("text", text.strip().lower())
+
+
+_TRUE_ITEMS = frozenset(_item(value) for value in TRUE_VALUES)
+_FALSE_ITEMS = frozenset(_item(value) for value in FALSE_VALUES)
+
+
+def constraint(condition: CompiledCondition) -> Optional[tuple]:
+    """
+    Return what a condition requires of its property's value.
+
+    Returns:
+        tuple: (INTERVAL, (low end, high end)) or (VALUES, frozenset of
+        items), or None for predicates that are not compared
+    """
+    operand = condition.operand
+    predicate = condition.predicate
+    if predicate == "greater than" and operand.number is not None:
+        return INTERVAL, ((operand.number, _OPEN_LOW), _UNBOUNDED_HIGH)
+    if predicate == "less than" and operand.number is not None:
+        return INTERVAL, (_UNBOUNDED_LOW, (operand.number, _OPEN_HIGH))
+    if predicate == "in range":
+        if operand.low is None or operand.high is None:
+            return None
+        return INTERVAL, ((operand.low, _CLOSED), (operand.high, _CLOSED))
+    if predicate == "equal to":
+        if operand.number is not None:
+            point = (operand.number, _CLOSED)
+            return INTERVAL, (point, point)
+        return VALUES, frozenset([_item(operand.lower)])
+    if predicate == "in list" and operand.members:
+        return VALUES, frozenset(_item(member) for member in operand.members)
+    if predicate == "is true":
+        return VALUES, _TRUE_ITEMS
+    if predicate == "is false":
+        return VALUES, _FALSE_ITEMS
+    return None
+
+
+def _intersect(kind: str, a, b):
+    if kind == INTERVAL:
+        return max(a[0], b[0]), min(a[1], b[1])
+    return a & b
+
+
+def _empty(kind: str, bound) -> bool:
+    if kind == INTERVAL:
+        return bound[1] < bound[0]
+    return not bound
+
+
+class IntervalIndex:
+    """
+    Static index of intervals by their sorted low and high ends.
+
+    Answers which intervals are disjoint from a given one: those ending
+    before it starts and those starting after it ends, two binary searches.
+    """
+
+    def __init__(self, intervals: List[tuple]):
+        self.lows = sorted((low, i) for i, (low, _) in enumerate(intervals))
+        self.highs = sorted((high, i) for i, (_, high) in enumerate(intervals))
+
+    def disjoint(self, interval: tuple) -> tuple:
+        """
+        Count the intervals disjoint from one and find the nearest of them.
+
+        Returns:
+            tuple: (count, position of the nearest disjoint interval or None)
+        """
+        low, high = interval
+        # Intervals whose high end orders before this low end
+        below = bisect_left(self.highs, (low,))
+        # Intervals whose low end orders after this high end
+        first_above = bisect_right(self.lows, (high, len(self.lows)))
+        above = len(self.lows) - first_above
+        if below:
+            nearest = self.highs[below - 1][1]
+        elif above:
+            nearest = self.lows[first_above][1]
+        else:
+            nearest = None
+        return below + above, nearest
+
+
+def _value_key(condition: CompiledCondition):
+    """Return a condition's value in the form its predicate compares it."""
+    operand = condition.operand
+    predicate = condition.predicate
+    if predicate == "identical to":
+        return operand.text
+    if predicate == "in list":
+        return frozenset(_item(member) for member in operand.members)
+    if predicate == "in range":
+        return (operand.low, operand.high)
+    if operand.number is not None:
+        return operand.number
+    return operand.lower
+
+
+def signature(conditions: List[CompiledCondition]) -> tuple:
+    """
+    Return a canonical form of a chain of conditions.
+
+    Chains that select the same elements for the same reasons get the same
+    signature, whatever the case of their property names and values or the
+    order of their AND-joined conditions.
+    """
+    steps = [
+        (
+            logic,
+            (
+                condition.property_name.lower(),
+                condition.predicate,
+                _value_key(condition),
+            ),
+        )
+        for logic, condition in chain_steps(conditions)
+    ]
+    if all(logic in ("", AND_LOGIC) for logic, _ in steps):
+        return (AND_LOGIC, frozenset(key for _, key in steps))
+    return tuple(steps)
+
+
+def _describe(conditions: List[CompiledCondition]) -> str:
+    return " and ".join(
+        f"{c.property_name} {c.predicate} {c.operand.text}".rstrip()
+        for c in conditions
+    )
+
+
+def _finding(kind: str, entries: List[dict], prop: str, message: str) -> Dict:
+    return {
+        "type": kind,
+        "rules": [entry["id"] for entry in entries],
+        "numbers": [entry["number"] for entry in entries],
+        "property": prop,
+        "message": message,
+    }
+
+
+def _numbered(numbers: List[int]) -> str:
+    if len(numbers) == 2:
+        return f"{numbers[0]} and {numbers[1]}"
+    return ", ".join(str(n) for n in numbers[:-1]) + f" and {numbers[-1]}"
+
+
+def analyze_rules(rules: Iterable[Dict]) -> List[Dict]:
+    """
+    Find conflicting, unsatisfiable and duplicated rules in a ruleset.
+
+    Args:
+        rules: Rule dictionaries, in the order they are listed
+
+    Returns:
+        list: Findings ordered by the first rule involved, each with its type,
+        the IDs and list numbers (1-based) of the rules involved, the property
+        for conflicts, and a message
+    """
+    findings = []
+    duplicates = defaultdict(list)
+    # (scope, property, kind) -> rule entries with their combined bound
+    groups = defaultdict(list)
+
+    for number, rule in enumerate(rules, 1):
+        if not rule.get("conditions"):
+            continue
+        try:
+            compiled = compile_rule(rule)
+        except ValueError:
+            continue
+        entry = {"id": rule.get("id"), "number": number}
+        scope = signature(compiled.filters)
+        checks = signature(compiled.checks)
+        duplicates[(scope, checks)].append(entry)
+        if checks[0] != AND_LOGIC:
+            # An OR in the check leaves no single bound per property
+            continue
+
+        # Every check must hold, so a rule's bounds on a property intersect
+        checked = {}
+        for condition in compiled.checks:
+            required = constraint(condition)
+            if required is None:
+                continue
+            kind, bound = required
+            key = (condition.property_name.lower(), kind)
+            if key in checked:
+                conditions, previous = checked[key]
+                bound = _intersect(kind, previous, bound)
+                checked[key] = (conditions + [condition], bound)
+            else:
+                checked[key] = ([condition], bound)
+
+        for (prop, kind), (conditions, bound) in checked.items():
+            name = conditions[0].property_name
+            if _empty(kind, bound):
+                findings.append(
+                    _finding(
+                        UNSATISFIABLE,
+                        [entry],
+                        name,
+                        f"Rule {number} checks {_describe(conditions)}; "
+                        "no element can pass",
+                    )
+                )
+            else:
+                groups[(scope, prop, kind)].append(
+                    {**entry, "conditions": conditions, "bound": bound}
+                )
+
+    reported = set()
+    for (_, _, kind), entries in groups.items():
+        if len(entries) < 2:
+            continue
+        nearest = _nearest_conflicts(kind, entries)
+        for entry, other in zip(entries, nearest):
+            if other is None:
+                continue
+            pair = tuple(sorted((entry["number"], other["number"])))
+            if pair in reported:
+                continue
+            reported.add(pair)
+            first, second = sorted((entry, other), key=lambda e: e["number"])
+            findings.append(
+                _finding(
+                    CONFLICT,
+                    [first, second],
+                    first["conditions"][0].property_name,
+                    f"Rule {first['number']} ({_describe(first['conditions'])}) "
+                    f"and rule {second['number']} "
+                    f"({_describe(second['conditions'])}) check the same "
+                    "elements; none can pass both",
+                )
+            )
+
+    for entries in duplicates.values():
+        if len(entries) > 1:
+            findings.append(
+                _finding(
+                    DUPLICATE,
+                    entries,
+                    None,
+                    f"Rules {_numbered([e['number'] for e in entries])} "
+                    "have the same conditions",
+                )
+            )
+
+    findings.sort(key=lambda finding: (finding["numbers"], finding["type"]))
+    return findings
+
+
+def _nearest_conflicts(kind: str, entries: List[dict]) -> List[Optional[dict]]:
+    """Return, per entry of a group, an entry whose bound is disjoint from it."""
+    if kind == INTERVAL:
+        index = IntervalIndex([entry["bound"] for entry in entries])
+        nearest = []
+        for entry in entries:
+            _, position = index.disjoint(entry["bound"])
+            nearest.append(None if position is None else entries[position])
+        return nearest
+
+    # Value -> positions of the entries allowing it, in order, with the last
+    # position of the run of consecutive positions each one is part of
+    allowing = defaultdict(list)
+    for position, entry in enumerate(entries):
+        for item in entry["bound"]:
+            allowing[item].append(position)
+    runs = {
+        item: (positions, _run_ends(positions))
+        for item, positions in allowing.items()
+    }
+
+    # Entries overlapping a set are those in the union of its values' lists,
+    # so the first entry disjoint from it is the first gap in that union,
+    # found by jumping over runs. Entries with the same set share the answer.
+    first_disjoint = {}
+    nearest = []
+    for entry in entries:
+        bound = entry["bound"]
+        position = first_disjoint.get(bound)
+        if position is None:
+            position = first_disjoint[bound] = _first_gap(
+                [runs[item] for item in bound]
+            )
+        nearest.append(entries[position] if position < len(entries) else None)
+    return nearest
+
+
+def _run_ends(positions: List[int]) -> List[int]:
+    """Return, per sorted position, the last position of its consecutive run."""
+    ends = positions[:]
+    for j in range(len(positions) - 2, -1, -1):
+        if positions[j + 1] == positions[j] + 1:
+            ends[j] = ends[j + 1]
+    return ends
+
+
+def _first_gap(lists: List[tuple]) -> int:
+    """
+    Return the smallest position in none of some sorted position lists.
+
+    Args:
+        lists: (positions, run ends) per list, as from _run_ends
+
+    Returns:
+        int: The first position not covered; each step skips a whole run
+    """
+    expected = 0
+    moved = True
+    while moved:
+        moved = False
+        for positions, ends in lists:
+            j = bisect_left(positions, expected)
+            if j < len(positions) and positions[j] == expected:
+                expected = ends[j] + 1
+                moved = True
+    return expected
+
+
+def findings_by_rule(findings: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Return the findings involving each rule, by rule ID."""
+    by_rule = defaultdict(list)
+    for finding in findings:
+        for rule_id in finding["rules"]:
+            by_rule[rule_id].append(finding)
+    return dict(by_rule)
+
+
+def rule_conflicts(rules: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Return the findings of each rule for the rules list badges.
+
+    Analysis is extra information; a failure leaves the list without badges.
+    """
+    try:
+        return findings_by_rule(analyze_rules(rules))
+    except Exception as e:
+        print(f"Could not analyse rule conflicts: {str(e)}")
+        return {}
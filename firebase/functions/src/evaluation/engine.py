@@ -0,0 +1,413 @@
+"""
+Rule evaluation over columnar model tables.
+
+A rule's conditions split into a filter and a check. Everything before the
+first CHECK condition is the filter, combined left to right with its AND/OR
+logic, and selects the elements the rule applies to. The CHECK condition and
+any that follow it form the check, combined the same way; a rule without a
+CHECK uses its last condition as the check. An element passes when it is
+selected and satisfies the check, and fails when it is selected and does not.
+
+Rulesets repeat the same scoping filters across many rules, so conditions
+are reduced to a canonical key (property name, canonical predicate, value)
+and every chain of conditions to the tuple of its keys and joining logic.
+Chains sharing a prefix share the masks of that prefix: together they form
+a trie of prefixes, each node evaluated once per table and extended by one
+condition to reach its children. The masks live in a MaskCache per loaded
+table, so a filter is computed once per model version whatever the number
+of rules, requests or edits that use it.
+
+Within a chain, conditions joined by AND are evaluated most selective and
+cheapest first (see planner.py), and the rest of such a run is skipped once
+nothing is left selected.
+"""
+
+import hashlib
+import json
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..utils.mapping import get_canonical_predicate
+from .columns import ColumnTable
+from .flatten import flatten_elements, iter_version_elements
+from .planner import order
+from .predicates import PREDICATES, prepare
+
+CHECK_LOGIC = "CHECK"
+OR_LOGIC = "OR"
+AND_LOGIC = "AND"
+
+# Memory the cached masks of one table may take, one byte per element each
+MASK_CACHE_BYTES = 256 * 1024 * 1024
+MIN_CACHED_MASKS = 64
+
+# Compiled rules kept per process
+MAX_COMPILED_RULES = 10_000
+
+
+class CompiledCondition:
+    """A condition with its predicate resolved and its value parsed."""
+
+    __slots__ = (
+        "logic",
+        "property_name",
+        "predicate",
+        "value",
+        "operand",
+        "evaluate_column",
+        "key",
+    )
+
+    def __init__(self, logic, property_name, predicate, value):
+        if predicate not in PREDICATES:
+            raise ValueError(f"Unknown predicate '{predicate}'")
+        self.logic = (logic or "").upper()
+        self.property_name = (property_name or "").strip()
+        self.predicate = predicate
+        self.value = value
+        self.operand = prepare(predicate, value)
+        self.evaluate_column = PREDICATES[predicate]
+        # What the condition's mask depends on; the logic only joins masks
+        self.key = (
+            self.property_name,
+            predicate,
+            "" if value is None else str(value),
+        )
+
+    def evaluate(self, table: ColumnTable) -> np.ndarray:
+        """Return the mask of elements satisfying this condition."""
+        column = table.resolve(self.property_name)
+        if column is None:
+            return np.zeros(len(table), dtype=bool)
+        return self.evaluate_column(column, self.operand)
+
+
+class CompiledRule:
+    """A rule split into filter and check conditions."""
+
+    __slots__ = ("filters", "checks")
+
+    def __init__(self, rule: Dict):
+        conditions = [
+            CompiledCondition(
+                condition.get("logic"),
+                condition.get("propertyName"),
+                get_canonical_predicate(condition.get("predicate")),
+                condition.get("value"),
+            )
+            for condition in rule.get("conditions", [])
+        ]
+        if not conditions:
+            raise ValueError("Rule has no conditions")
+
+        split = next(
+            (i for i, c in enumerate(conditions) if c.logic == CHECK_LOGIC),
+            len(conditions) - 1,
+        )
+        self.filters = conditions[:split]
+        self.checks = conditions[split:]
+
+
+def rule_key(rule: Dict) -> str:
+    """Return a hash of what a rule's results depend on: its conditions."""
+    conditions = [
+        [
+            condition.get("logic"),
+            condition.get("propertyName"),
+            get_canonical_predicate(condition.get("predicate")),
+            condition.get("value"),
+        ]
+        for condition in rule.get("conditions", [])
+    ]
+    content = json.dumps(
+        conditions, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# Compiled rules by content hash; a rule that does not compile keeps its error
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_rule(rule: Dict) -> CompiledRule:
+    """
+    Return the compiled form of a rule, compiling it once per content.
+
+    Rules are shared by content rather than ID, so a preview of an unchanged
+    ruleset, or the same rule in another ruleset, skips parsing entirely.
+
+    Raises:
+        ValueError: If the rule has no conditions or an unknown predicate
+    """
+    key = rule_key(rule)
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+    if compiled is None:
+        try:
+            compiled = CompiledRule(rule)
+        except ValueError as e:
+            compiled = e
+        with _compiled_lock:
+            _compiled[key] = compiled
+            while len(_compiled) > MAX_COMPILED_RULES:
+                _compiled.popitem(last=False)
+    if isinstance(compiled, ValueError):
+        raise ValueError(str(compiled))
+    return compiled
+
+
+def chain_steps(conditions: List[CompiledCondition]) -> List[tuple]:
+    """
+    Return a chain of conditions as (join, condition) steps.
+
+    The first condition's join is empty; later ones are OR or AND, whatever
+    else they were typed as.
+    """
+    steps = []
+    for i, condition in enumerate(conditions):
+        if i == 0:
+            logic = ""
+        else:
+            logic = OR_LOGIC if condition.logic == OR_LOGIC else AND_LOGIC
+        steps.append((logic, condition))
+    return steps
+
+
+def plan(conditions: List[CompiledCondition], table: ColumnTable) -> List[tuple]:
+    """
+    Return the steps to evaluate a chain of conditions in, cheapest first.
+
+    Conditions are combined left to right, so ``(a AND b) OR c AND d`` is
+    ``((a & b) | c) & d``: every run of AND steps (with the first condition
+    leading the first run) can be reordered, while OR steps stay in place.
+    """
+    planned = []
+    run = []
+
+    def flush():
+        for condition in order(run, table):
+            planned.append(("" if not planned else AND_LOGIC, condition))
+        run.clear()
+
+    for logic, condition in chain_steps(conditions):
+        if logic == OR_LOGIC:
+            flush()
+            planned.append((logic, condition))
+        else:
+            run.append(condition)
+    flush()
+    return planned
+
+
+def chain_keys(steps: List[tuple]) -> List[tuple]:
+    """
+    Return the key of every prefix of a chain of steps.
+
+    A prefix is identified by its conditions' keys and the logic joining
+    each to the ones before it, so identical chains in different rules, and
+    the shared start of chains that differ later, get the same keys.
+    """
+    keys = []
+    prefix = ()
+    for logic, condition in steps:
+        prefix = prefix + ((logic, condition.key),)
+        keys.append(prefix)
+    return keys
+
+
+class MaskCache:
+    """Masks of condition chains over one table, shared by every rule."""
+
+    def __init__(self, row_count: int, max_bytes: int = MASK_CACHE_BYTES):
+        self.row_count = row_count
+        self.max_masks = max(MIN_CACHED_MASKS, max_bytes // max(row_count, 1))
+        self.hits = 0
+        self.misses = 0
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._masks)
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+            return mask
+
+    def put(self, key, mask: np.ndarray) -> np.ndarray:
+        # Shared between rules, so nobody may change it in place
+        mask.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+            self._masks[key] = mask
+            while len(self._masks) > self.max_masks:
+                self._masks.popitem(last=False)
+        return mask
+
+    def condition_mask(self, condition: CompiledCondition, table) -> np.ndarray:
+        """Return the mask of a single condition, evaluating it at most once."""
+        key = ("", condition.key)
+        mask = self.get(key)
+        if mask is None:
+            # Copied: a predicate may hand back an array its column keeps
+            mask = self.put(key, np.array(condition.evaluate(table), dtype=bool))
+        return mask
+
+    def combine(self, steps: List[tuple], table) -> np.ndarray:
+        """
+        Evaluate a chain of steps left to right, joined by their logic.
+
+        Starts from the longest prefix of the chain already cached and caches
+        each longer prefix on the way. Once the mask is empty, AND steps are
+        skipped up to the next OR step, since they cannot select anything.
+        """
+        if not steps:
+            return np.ones(len(table), dtype=bool)
+
+        keys = chain_keys(steps)
+        mask = None
+        start = 0
+        for i in range(len(keys) - 1, -1, -1):
+            mask = self.get(keys[i])
+            if mask is not None:
+                start = i + 1
+                break
+
+        empty = mask is not None and not mask.any()
+        for i in range(start, len(steps)):
+            logic, condition = steps[i]
+            if logic == AND_LOGIC and empty:
+                continue
+            result = self.condition_mask(condition, table)
+            if mask is None:
+                mask = result
+            else:
+                if logic == OR_LOGIC:
+                    mask = mask | result
+                else:
+                    mask = mask & result
+                mask = self.put(keys[i], mask)
+            empty = not mask.any()
+        return mask
+
+
+# Mask caches of loaded tables, dropped with their table
+_mask_caches = weakref.WeakKeyDictionary()
+_mask_caches_lock = threading.Lock()
+
+
+def masks_for(table: ColumnTable) -> MaskCache:
+    """Return the mask cache of a table, creating it on first use."""
+    with _mask_caches_lock:
+        cache = _mask_caches.get(table)
+        if cache is None:
+            cache = _mask_caches[table] = MaskCache(len(table))
+        return cache
+
+
+def combine(conditions: List[CompiledCondition], table: ColumnTable) -> np.ndarray:
+    """Evaluate conditions left to right, joining them with their logic."""
+    return masks_for(table).combine(plan(conditions, table), table)
+
+
+class RuleResult:
+    """Outcome of one rule over a table."""
+
+    def __init__(self, number, rule, selected=None, passed=None, error=None):
+        self.number = number
+        self.rule_id = rule.get("id")
+        self.severity = rule.get("severity", "Error")
+        self.message = rule.get("message", "")
+        self.selected = selected
+        self.passed = passed
+        self.error = error
+        # Change in failing elements since an earlier version, if compared
+        self.delta = None
+
+    @property
+    def failed(self):
+        return self.selected & ~self.passed
+
+    def to_dict(self) -> Dict:
+        """Return the counts for this rule."""
+        result = {
+            "number": self.number,
+            "ruleId": self.rule_id,
+            "severity": self.severity,
+            "message": self.message,
+            "selected": 0,
+            "passed": 0,
+            "failed": 0,
+        }
+        if self.error:
+            result["error"] = self.error
+        elif self.selected is not None:
+            selected = int(np.count_nonzero(self.selected))
+            passed = int(np.count_nonzero(self.passed))
+            result.update(selected=selected, passed=passed, failed=selected - passed)
+        if self.delta is not None:
+            result["delta"] = self.delta
+        return result
+
+
+def evaluate_rule(table: ColumnTable, rule: Dict, number: int = 0) -> RuleResult:
+    """
+    Evaluate a single rule against a table.
+
+    Args:
+        table: Elements of the model
+        rule: Rule dictionary with conditions
+        number: Position of the rule, as in the exports
+
+    Returns:
+        RuleResult: Masks of selected and passing elements, or the error that
+        stopped the rule from compiling
+    """
+    try:
+        compiled = compile_rule(rule)
+    except ValueError as e:
+        return RuleResult(number, rule, error=str(e))
+
+    selected = combine(compiled.filters, table)
+    if selected.any():
+        passed = selected & combine(compiled.checks, table)
+    else:
+        # Nothing to check
+        passed = selected
+    return RuleResult(number, rule, selected, passed)
+
+
+def evaluate_ruleset(table: ColumnTable, rules: Iterable[Dict]) -> List[RuleResult]:
+    """Evaluate every non-empty rule, numbered as in the exports."""
+    results = []
+    for rule in rules:
+        if not rule.get("conditions"):
+            continue
+        results.append(evaluate_rule(table, rule, len(results) + 1))
+    return results
+
+
+def build_table(objects, root_id=None) -> ColumnTable:
+    """
+    Build the element table of a version from its objects.
+
+    Args:
+        objects: Root object with inline children, or an iterable (ideally a
+            stream) of the root and its closure
+        root_id: ID of the root object, defaults to the first in the stream
+
+    Returns:
+        ColumnTable: One row per element
+    """
+    elements = iter_version_elements(objects, root_id)
+    return ColumnTable.from_records(flatten_elements(elements))
@@ -0,0 +1,457 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from firebase_functions import https_fn
+
+from ..utils.firestore_utils import (
+    get_rules_for_ruleset,
+    get_ruleset,
+    get_speckle_token_for_user,
+    safe_verify_id_token,
+)
+from ..utils.speckle_api import SpeckleAPI
+from .bitmaps import RowBitmap, to_base64
+from .catalog import DEFAULT_LIMIT
+from .conflicts import analyze_rules
+from .impact import ruleset_impact
+from .results import evaluate_ruleset_cached
+from .store import get_catalog, get_histograms, get_table
+
+# How long a resolved latest version is reused for suggestions and impact
+# counts, in seconds; each keystroke should not cost a Firestore read and a
+# GraphQL query
+LATEST_VERSION_TTL = 60
+
+# Resolved latest versions kept, least recently used dropped first
+MAX_CACHED_LATEST_VERSIONS = 1000
+
+# Versions of a model read to find the one before the version checked; more
+# than two in case versions were pushed since the latest was resolved
+PREVIOUS_VERSION_LOOKBACK = 5
+
+MAX_SUGGESTION_LIMIT = 100
+
+# (user ID, ruleset ID, model ID) -> (time resolved, context)
+_latest_versions = OrderedDict()
+_latest_lock = threading.Lock()
+
+
+def _json_response(data, status=200):
+    return https_fn.Response(
+        json.dumps(data), mimetype="application/json", status=status
+    )
+
+
+def preview_ruleset(request, ruleset_id):
+    """
+    Evaluate a ruleset against the latest version of a model in its project.
+
+    Query parameters:
+        model_id: Model to check, defaults to the most recently updated one
+        failures: If set, each rule also carries the table rows of its failing
+            elements as a base64 serialized row bitmap
+
+    Returns JSON with the version checked, the element count, timings and
+    per-rule counts of selected, passing and failing elements. Rules also
+    get a delta of new and resolved failures since the model's previous
+    version, when that version was checked before.
+    """
+    try:
+        # Get auth header
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return _json_response({"error": "Unauthorized"}, 401)
+
+        id_token = auth_header.split("Bearer ")[1]
+        decoded_token = safe_verify_id_token(id_token)
+        user_id = decoded_token["uid"]
+
+        ruleset = get_ruleset(ruleset_id)
+        if not ruleset:
+            return _json_response({"error": "Ruleset not found"}, 404)
+
+        # Verify ownership
+        if ruleset.get("userId") != user_id:
+            return _json_response(
+                {"error": "You don't have permission to preview this ruleset"}, 403
+            )
+
+        speckle_token = get_speckle_token_for_user(user_id)
+        if not speckle_token:
+            return _json_response({"error": "Speckle account not connected"}, 401)
+
+        project_id = ruleset.get("projectId")
+        api = SpeckleAPI(token=speckle_token)
+        version = api.get_latest_version(project_id, request.args.get("model_id"))
+        if not version:
+            return _json_response({"error": "No model versions to check"}, 404)
+
+        object_id = version["referencedObject"]
+        started = time.perf_counter()
+        table = get_table(
+            object_id, lambda: api.download_version_objects(project_id, object_id)
+        )
+        loaded = time.perf_counter()
+
+        previous = _previous_version(api, project_id, version)
+        results = evaluate_ruleset_cached(
+            object_id,
+            table,
+            get_rules_for_ruleset(ruleset_id),
+            previous["referencedObject"] if previous else None,
+        )
+        evaluated = time.perf_counter()
+
+        return _json_response(
+            {
+                "rulesetId": ruleset_id,
+                "projectId": project_id,
+                "modelId": version["modelId"],
+                "versionId": version["id"],
+                "previousVersionId": previous["id"] if previous else None,
+                "elements": len(table),
+                "loadMs": round((loaded - started) * 1000, 1),
+                "evaluateMs": round((evaluated - loaded) * 1000, 1),
+                "rules": [
+                    _rule_result(result, request.args.get("failures"))
+                    for result in results
+                ],
+            }
+        )
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error previewing ruleset: {str(e)}")
+        print(f"Error details: {error_details}")
+        return _json_response({"error": f"Error previewing ruleset: {str(e)}"}, 500)
+
+
+def _rule_result(result, failures):
+    """Return a rule's preview entry, with its failing rows if asked for."""
+    entry = result.to_dict()
+    if failures and not result.error:
+        entry["failures"] = to_base64(RowBitmap.from_mask(result.failed))
+    return entry
+
+
+def _previous_version(api, project_id, version):
+    """
+    Return the version of the same model just before the one checked.
+
+    Taken from the model's history rather than from earlier previews, so a
+    version is always compared with the same one. The comparison is extra
+    information; if the history cannot be read there is none.
+    """
+    try:
+        versions = api.get_model_versions(
+            project_id, version["modelId"], PREVIOUS_VERSION_LOOKBACK
+        )
+    except Exception as e:
+        print(f"Could not read versions of model {version['modelId']}: {str(e)}")
+        return None
+
+    ids = [item["id"] for item in versions]
+    if version["id"] not in ids:
+        return None
+    position = ids.index(version["id"]) + 1
+    return versions[position] if position < len(versions) else None
+
+
+def _resolve_latest_version(user_id, ruleset_id, model_id):
+    """
+    Find the latest version a user's ruleset is checked against.
+
+    A recent answer for the same ruleset and model is reused.
+
+    Returns:
+        tuple: ({"version", "load_objects"}, None), or (None, error response)
+    """
+    key = (user_id, ruleset_id, model_id)
+    now = time.monotonic()
+    with _latest_lock:
+        cached = _latest_versions.get(key)
+        if cached:
+            _latest_versions.move_to_end(key)
+    if cached and now - cached[0] < LATEST_VERSION_TTL:
+        return cached[1], None
+
+    ruleset = get_ruleset(ruleset_id)
+    if not ruleset:
+        return None, _json_response({"error": "Ruleset not found"}, 404)
+
+    # Verify ownership
+    if ruleset.get("userId") != user_id:
+        return None, _json_response(
+            {"error": "You don't have permission to edit this ruleset"}, 403
+        )
+
+    speckle_token = get_speckle_token_for_user(user_id)
+    if not speckle_token:
+        return None, _json_response({"error": "Speckle account not connected"}, 401)
+
+    project_id = ruleset.get("projectId")
+    api = SpeckleAPI(token=speckle_token)
+    version = api.get_latest_version(project_id, model_id)
+    if not version:
+        return None, _json_response({"error": "No model versions found"}, 404)
+
+    object_id = version["referencedObject"]
+    context = {
+        "version": version,
+        "load_objects": lambda: api.download_version_objects(project_id, object_id),
+    }
+    with _latest_lock:
+        _latest_versions[key] = (now, context)
+        _latest_versions.move_to_end(key)
+        while len(_latest_versions) > MAX_CACHED_LATEST_VERSIONS:
+            _latest_versions.popitem(last=False)
+    return context, None
+
+
+def _suggestion_request(request, ruleset_id):
+    """
+    Authenticate a suggestion request and find the version it draws from.
+
+    Returns:
+        tuple: (context from _resolve_latest_version, limit, None), or
+        (None, None, error response)
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None, None, _json_response({"error": "Unauthorized"}, 401)
+
+    id_token = auth_header.split("Bearer ")[1]
+    decoded_token = safe_verify_id_token(id_token)
+    user_id = decoded_token["uid"]
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return None, None, _json_response({"error": "limit must be a number"}, 400)
+    limit = max(1, min(limit, MAX_SUGGESTION_LIMIT))
+
+    context, error = _resolve_latest_version(
+        user_id, ruleset_id, request.args.get("model_id")
+    )
+    return context, limit, error
+
+
+def suggest_properties(request, ruleset_id):
+    """
+    Suggest property paths for a ruleset's conditions.
+
+    Paths come from the catalog of the latest version of a model in the
+    ruleset's project, matched on a prefix of the path or of any of its
+    dotted suffixes.
+
+    Query parameters:
+        q: Text typed so far
+        model_id: Model to draw paths from, defaults to the most recently
+            updated one
+        limit: Maximum number of suggestions (default 20)
+
+    Returns JSON with the version used and the matching paths, each with its
+    element count, value kind and most common values.
+    """
+    try:
+        context, limit, error = _suggestion_request(request, ruleset_id)
+        if error:
+            return error
+
+        version = context["version"]
+        started = time.perf_counter()
+        catalog = get_catalog(version["referencedObject"], context["load_objects"])
+        suggestions = catalog.suggest(request.args.get("q", ""), limit)
+        suggested = time.perf_counter()
+
+        return _json_response(
+            {
+                "modelId": version["modelId"],
+                "versionId": version["id"],
+                "properties": len(catalog),
+                "suggestMs": round((suggested - started) * 1000, 2),
+                "suggestions": suggestions,
+            }
+        )
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error suggesting properties: {str(e)}")
+        print(f"Error details: {error_details}")
+        return _json_response({"error": f"Error suggesting properties: {str(e)}"}, 500)
+
+
+def suggest_values(request, ruleset_id):
+    """
+    Suggest values for a condition from the values a property takes.
+
+    Values come from the histograms of the latest version of a model in the
+    ruleset's project; values starting with the typed text come first, then
+    values containing it, each group most common first.
+
+    Query parameters:
+        property: Property name of the condition
+        q: Value typed so far
+        model_id: Model to draw values from, defaults to the most recently
+            updated one
+        limit: Maximum number of values (default 20)
+
+    Returns JSON with the version used, the property's element count, number
+    of distinct values, matching values with their counts and, for numbers,
+    the minimum, maximum and quantiles.
+    """
+    try:
+        property_name = request.args.get("property")
+        if not property_name:
+            return _json_response({"error": "Missing property"}, 400)
+
+        context, limit, error = _suggestion_request(request, ruleset_id)
+        if error:
+            return error
+
+        version = context["version"]
+        started = time.perf_counter()
+        histograms = get_histograms(
+            version["referencedObject"], context["load_objects"]
+        )
+        summary = histograms.suggest(property_name, request.args.get("q", ""), limit)
+        suggested = time.perf_counter()
+
+        result = {
+            "modelId": version["modelId"],
+            "versionId": version["id"],
+            "property": property_name,
+            "suggestMs": round((suggested - started) * 1000, 2),
+        }
+        if summary is None:
+            result.update(kind=None, count=0, distinct=0, values=[])
+        else:
+            result.update(summary)
+        return _json_response(result)
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error suggesting values: {str(e)}")
+        print(f"Error details: {error_details}")
+        return _json_response({"error": f"Error suggesting values: {str(e)}"}, 500)
+
+
+def get_rule_impact(request, ruleset_id):
+    """
+    Count the elements each rule of a ruleset selects and passes.
+
+    Counts are taken against the latest version of a model in the ruleset's
+    project and cached per rule, so only rules that changed since the last
+    request are evaluated.
+
+    Query parameters:
+        model_id: Model to check, defaults to the most recently updated one
+
+    Returns JSON with the version used and, per rule ID, the counts of
+    selected, passing and failing elements.
+    """
+    try:
+        # Get auth header
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return _json_response({"error": "Unauthorized"}, 401)
+
+        id_token = auth_header.split("Bearer ")[1]
+        decoded_token = safe_verify_id_token(id_token)
+        user_id = decoded_token["uid"]
+
+        context, error = _resolve_latest_version(
+            user_id, ruleset_id, request.args.get("model_id")
+        )
+        if error:
+            return error
+
+        version = context["version"]
+        object_id = version["referencedObject"]
+        started = time.perf_counter()
+        table = get_table(object_id, context["load_objects"])
+        loaded = time.perf_counter()
+
+        impact = ruleset_impact(object_id, table, get_rules_for_ruleset(ruleset_id))
+        evaluated = time.perf_counter()
+
+        return _json_response(
+            {
+                "modelId": version["modelId"],
+                "versionId": version["id"],
+                "elements": len(table),
+                "loadMs": round((loaded - started) * 1000, 1),
+                "evaluateMs": round((evaluated - loaded) * 1000, 1),
+                "rules": impact,
+            }
+        )
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error counting rule impact: {str(e)}")
+        print(f"Error details: {error_details}")
+        return _json_response({"error": f"Error counting rule impact: {str(e)}"}, 500)
+
+
+def get_ruleset_conflicts(request, ruleset_id):
+    """
+    Find conflicting, unsatisfiable and duplicated rules in a ruleset.
+
+    Needs no model: rules are compared with each other (see conflicts.py).
+
+    Returns JSON with the number of rules and the findings, each with its
+    type, the IDs and list numbers of the rules involved, the property and a
+    message.
+    """
+    try:
+        # Get auth header
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return _json_response({"error": "Unauthorized"}, 401)
+
+        id_token = auth_header.split("Bearer ")[1]
+        decoded_token = safe_verify_id_token(id_token)
+        user_id = decoded_token["uid"]
+
+        ruleset = get_ruleset(ruleset_id)
+        if not ruleset:
+            return _json_response({"error": "Ruleset not found"}, 404)
+
+        # Verify ownership
+        if ruleset.get("userId") != user_id:
+            return _json_response(
+                {"error": "You don't have permission to view these rules"}, 403
+            )
+
+        rules = get_rules_for_ruleset(ruleset_id)
+        started = time.perf_counter()
+        findings = analyze_rules(rules)
+        analyzed = time.perf_counter()
+
+        return _json_response(
+            {
+                "rules": len(rules),
+                "analyzeMs": round((analyzed - started) * 1000, 1),
+                "findings": findings,
+            }
+        )
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error analysing rule conflicts: {str(e)}")
+        print(f"Error details: {error_details}")
+        return _json_response(
+            {"error": f"Error analysing rule conflicts: {str(e)}"}, 500
+        )
@@ -0,0 +1,199 @@
+"""
+Walking Speckle object trees and flattening elements to dotted property paths.
+
+Rules address properties by the dotted paths authors type into the condition
+row, e.g. ``category`` or ``parameters.Width``. This module turns a version's
+objects into one flat ``{path: scalar}`` record per element, which is what the
+columnar table is built from.
+
+Elements are the objects a model is made of: everything reached through
+``elements``/``@elements`` and other detached ``@`` properties, except
+containers (collections, data chunks) and display geometry.
+"""
+
+from typing import Dict, Iterable, Iterator, Optional
+
+PATH_SEPARATOR = "."
+
+# Keys holding child objects rather than properties of this one
+ELEMENT_KEYS = {"elements", "@elements"}
+DISPLAY_KEYS = {"displayValue", "@displayValue"}
+
+# Bookkeeping fields that are never useful in a rule
+SKIPPED_KEYS = {"__closure", "totalChildrenCount"}
+
+# Objects that only group or carry other objects
+DATA_CHUNK_TYPE = "Speckle.Core.Models.DataChunk"
+CONTAINER_TYPES = ("Speckle.Core.Models.Collection", DATA_CHUNK_TYPE)
+
+# Objects that are geometry or styling rather than model elements
+NON_ELEMENT_PREFIXES = ("Objects.Geometry.", "Objects.Other.")
+
+
+def speckle_types(obj: Dict):
+    """Return the inheritance chain of an object's speckle_type."""
+    return (obj.get("speckle_type") or "").split(":")
+
+
+def is_container(obj: Dict) -> bool:
+    """Return whether an object only groups other objects."""
+    return any(t in CONTAINER_TYPES for t in speckle_types(obj))
+
+
+def is_element(obj: Dict) -> bool:
+    """Return whether an object is a model element that rules apply to."""
+    types = speckle_types(obj)
+    if not types[0]:
+        return False
+    if any(t in CONTAINER_TYPES for t in types):
+        return False
+    return not types[-1].startswith(NON_ELEMENT_PREFIXES)
+
+
+def _resolve(value, objects_by_id):
+    """Follow a detached reference to its object when the object is available."""
+    if isinstance(value, dict) and "referencedId" in value and objects_by_id:
+        return objects_by_id.get(value["referencedId"], value)
+    return value
+
+
+def _children(obj: Dict, objects_by_id) -> Iterator[Dict]:
+    """
+    Yield the child objects held in an object's element properties.
+
+    References that cannot be resolved are skipped; when objects arrive one
+    at a time the referenced object turns up on its own.
+    """
+    if DATA_CHUNK_TYPE in speckle_types(obj):
+        # Chunked lists keep their items under "data"
+        items = obj.get("data", [])
+    else:
+        items = []
+        for key, value in obj.items():
+            if key in DISPLAY_KEYS:
+                continue
+            if key in ELEMENT_KEYS or key.startswith("@"):
+                items.extend(value if isinstance(value, list) else [value])
+
+    for item in items:
+        item = _resolve(item, objects_by_id)
+        if isinstance(item, dict) and "speckle_type" in item:
+            if "referencedId" not in item:
+                yield item
+
+
+def iter_elements(
+    root: Dict,
+    objects_by_id: Optional[Dict[str, Dict]] = None,
+    include_root: bool = False,
+) -> Iterator[Dict]:
+    """
+    Yield every element below an object, depth first.
+
+    Args:
+        root: Object to start from, with children inline or as references
+        objects_by_id: Objects by ID, used to resolve references when the
+            children are not inline
+        include_root: Also yield the object itself if it is an element
+
+    Yields:
+        dict: Element objects, each once
+    """
+    seen = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        obj_id = obj.get("id")
+        if obj_id is not None:
+            if obj_id in seen:
+                continue
+            seen.add(obj_id)
+        if (include_root or obj is not root) and is_element(obj):
+            yield obj
+        # Reversed so siblings come out in document order
+        stack.extend(reversed(list(_children(obj, objects_by_id))))
+
+
+def iter_version_elements(objects, root_id: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yield the elements of a version from whatever the object endpoint returned.
+
+    Accepts either the root object with its children inline, or an iterable
+    of the root and its closure, one object at a time, which is how Speckle
+    streams objects. Objects in a stream are handled as they arrive and
+    dropped, so memory does not grow with the size of the model: each
+    detached element is its own object in the closure, and anything inline
+    is found by walking the object it is inlined in.
+
+    Args:
+        objects: Root object, or iterable of objects
+        root_id: ID of the root object in the stream, defaults to the first
+
+    Yields:
+        dict: Element objects
+    """
+    if isinstance(objects, dict):
+        yield from iter_elements(objects)
+        return
+
+    for obj in objects:
+        if root_id is None:
+            root_id = obj.get("id")
+        yield from iter_elements(obj, include_root=obj.get("id") != root_id)
+
+
+def _is_parameter(value: Dict) -> bool:
+    return "value" in value and "name" in value
+
+
+def _flatten_into(record: Dict, obj: Dict, prefix: str):
+    for key, value in obj.items():
+        if key in SKIPPED_KEYS or key in ELEMENT_KEYS or key in DISPLAY_KEYS:
+            continue
+        if key.startswith("@"):
+            continue
+
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if "referencedId" in value:
+                continue
+            if _is_parameter(value):
+                # Parameters are addressed by their name as well as their key
+                param_value = value["value"]
+                if param_value is None or isinstance(
+                    param_value, (str, int, float, bool)
+                ):
+                    record[path] = param_value
+                    name = value.get("name")
+                    if isinstance(name, str) and name and name != key:
+                        record.setdefault(f"{prefix}{name}", param_value)
+                continue
+            _flatten_into(record, value, path + PATH_SEPARATOR)
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            record[path] = value
+
+
+def flatten_element(obj: Dict) -> Dict:
+    """
+    Flatten an element to {dotted path: scalar value}.
+
+    Nested objects contribute their scalars under their key path, Revit-style
+    parameters ({"name", "value", ...}) contribute their value under both
+    their key and their name, and lists, child objects and references are
+    left out.
+
+    Args:
+        obj: Element object
+
+    Returns:
+        dict: Flat record of the element's properties
+    """
+    record = {}
+    _flatten_into(record, obj, "")
+    return record
+
+
+def flatten_elements(elements: Iterable[Dict]) -> Iterator[Dict]:
+    """Flatten each element in turn."""
+    for element in elements:
+        yield flatten_element(element)
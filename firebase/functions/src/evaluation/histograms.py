@@ -0,0 +1,195 @@
+"""
+Distinct-value histograms of a model's properties, for suggesting values.
+
+For each property path the histogram keeps the most common values with their
+element counts, the number of distinct values and, for numbers, the minimum,
+maximum and quantiles. Columns are already dictionary-encoded, so the counts
+are exact and come from one ``bincount`` over each column's codes; memory is
+bounded by the distinct values the table holds anyway, and only the top
+values are kept in the saved file.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .columns import NUMBER, Column, ColumnTable, value_key
+from .flatten import PATH_SEPARATOR
+
+HISTOGRAMS_FILE = "histograms.json"
+HISTOGRAMS_FORMAT_VERSION = 1
+
+# Most common values kept per path
+TOP_VALUES = 50
+
+QUANTILES = {"p5": 0.05, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p95": 0.95}
+
+DEFAULT_LIMIT = 20
+
+
+def column_histogram(column: Column, top_values: int = TOP_VALUES) -> Dict:
+    """
+    Summarize the values of a column.
+
+    Args:
+        column: Column to summarize
+        top_values: Most common values to keep
+
+    Returns:
+        dict: count, distinct, top ([value, count] pairs, most common first)
+        and, for numbers, min, max and quantiles
+    """
+    codes = np.asarray(column.codes)
+    codes = codes[codes >= 0]
+    histogram = {"kind": column.kind, "count": len(codes), "distinct": 0, "top": []}
+    if not len(codes):
+        return histogram
+
+    frequencies = np.bincount(codes, minlength=len(column.categories))
+    distinct = np.flatnonzero(frequencies)
+    histogram["distinct"] = int(len(distinct))
+    if len(distinct) > top_values:
+        distinct = distinct[np.argpartition(-frequencies[distinct], top_values - 1)]
+        distinct = distinct[:top_values]
+    # Most common first, ties in category order
+    distinct = distinct[np.lexsort((distinct, -frequencies[distinct]))]
+    histogram["top"] = [[column.categories[i], int(frequencies[i])] for i in distinct]
+
+    if column.kind == NUMBER:
+        values = np.asarray(column.values)[column.present]
+        histogram["min"] = value_key(float(values.min()))
+        histogram["max"] = value_key(float(values.max()))
+        quantiles = np.quantile(values, list(QUANTILES.values()))
+        histogram["quantiles"] = {
+            name: value_key(float(q)) for name, q in zip(QUANTILES, quantiles)
+        }
+    return histogram
+
+
+def merge_histograms(histograms: List[Dict]) -> Dict:
+    """
+    Combine the histograms of the columns a property name resolves to.
+
+    Counts of values kept by several columns are added; values outside every
+    column's top are not seen, so merged counts are lower bounds.
+    """
+    if len(histograms) == 1:
+        return histograms[0]
+
+    counts = {}
+    for histogram in histograms:
+        for value, count in histogram["top"]:
+            counts[value] = counts.get(value, 0) + count
+    top = sorted(counts.items(), key=lambda item: -item[1])
+    kinds = {histogram["kind"] for histogram in histograms}
+    return {
+        "kind": kinds.pop() if len(kinds) == 1 else "string",
+        "count": sum(histogram["count"] for histogram in histograms),
+        "distinct": max(len(counts), *(h["distinct"] for h in histograms)),
+        "top": [list(item) for item in top],
+    }
+
+
+class ValueHistograms:
+    """Histograms of every property path of a version."""
+
+    def __init__(self, histograms: Dict[str, Dict]):
+        self.histograms = histograms
+        self._by_lower = None
+        self._by_leaf = None
+
+    def __len__(self):
+        return len(self.histograms)
+
+    @classmethod
+    def from_table(
+        cls, table: ColumnTable, top_values: int = TOP_VALUES
+    ) -> "ValueHistograms":
+        """Summarize every column of a table."""
+        return cls(
+            {
+                path: column_histogram(column, top_values)
+                for path, column in sorted(table.columns.items())
+            }
+        )
+
+    def save(self, path: str):
+        """Write the histograms as compact JSON, replacing any existing file."""
+        data = {"version": HISTOGRAMS_FORMAT_VERSION, "histograms": self.histograms}
+        staging = f"{path}.{os.getpid()}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(staging, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ValueHistograms":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != HISTOGRAMS_FORMAT_VERSION:
+            raise ValueError("Unsupported histograms version")
+        return cls(data["histograms"])
+
+    def resolve(self, property_name: str) -> Optional[Dict]:
+        """
+        Find the histogram of a property name the way rules find columns.
+
+        The exact path wins, then a case-insensitive match of the whole path,
+        then every path with the same last segment, merged.
+        """
+        if property_name in self.histograms:
+            return self.histograms[property_name]
+
+        if self._by_lower is None:
+            self._by_lower = {}
+            self._by_leaf = {}
+            for path in sorted(
+                self.histograms, key=lambda p: (p.count(PATH_SEPARATOR), p)
+            ):
+                lower = path.lower()
+                self._by_lower.setdefault(lower, path)
+                leaf = lower.rsplit(PATH_SEPARATOR, 1)[-1]
+                self._by_leaf.setdefault(leaf, []).append(path)
+
+        lower = (property_name or "").strip().lower()
+        if lower in self._by_lower:
+            return self.histograms[self._by_lower[lower]]
+        leaf = lower.rsplit(PATH_SEPARATOR, 1)[-1]
+        paths = self._by_leaf.get(leaf)
+        if not paths:
+            return None
+        return merge_histograms([self.histograms[path] for path in paths])
+
+    def suggest(
+        self, property_name: str, text: str = "", limit: int = DEFAULT_LIMIT
+    ) -> Optional[Dict]:
+        """
+        Suggest values of a property.
+
+        Args:
+            property_name: Property name as typed in the rule
+            text: Value typed so far; values starting with it come first,
+                then values containing it
+            limit: Maximum number of values
+
+        Returns:
+            dict: The property's summary with ``values`` ([{value, count}],
+            most common first), or None if no element has the property
+        """
+        histogram = self.resolve(property_name)
+        if histogram is None:
+            return None
+
+        text = (text or "").strip().lower()
+        starting, containing = [], []
+        for value, count in histogram["top"]:
+            lower = value.lower()
+            if lower.startswith(text):
+                starting.append({"value": value, "count": count})
+            elif text in lower:
+                containing.append({"value": value, "count": count})
+
+        summary = {k: v for k, v in histogram.items() if k != "top"}
+        summary["values"] = (starting + containing)[:limit]
+        return summary
@@ -0,0 +1,33 @@
+"""
+Per-rule impact counts for the rules list.
+
+Each rule row shows how many elements of the project's latest model the rule
+selects and how many of those pass. The rules list renders without them and
+the page asks /api/rulesets/{id}/impact once it has loaded. Counts come from
+the rule results cache (see results.py), keyed by the version's root object
+ID and a hash of the rule's conditions, which previews share: after one rule
+is edited, that request evaluates the edited rule alone, against the columns
+already in memory.
+"""
+
+from typing import Dict, Iterable
+
+from .columns import ColumnTable
+from .results import ruleset_counts
+
+
+def ruleset_impact(
+    object_id: str, table: ColumnTable, rules: Iterable[Dict]
+) -> Dict[str, Dict]:
+    """
+    Return the counts of every rule of a ruleset against a version.
+
+    Returns:
+        dict: Rule ID -> counts, for rules with conditions
+    """
+    rules = list(rules)
+    return {
+        rule.get("id"): rule_counts
+        for rule, rule_counts in zip(rules, ruleset_counts(object_id, table, rules))
+        if rule_counts is not None
+    }
@@ -0,0 +1,269 @@
+"""
+Incremental evaluation of a version from the results of an earlier one.
+
+Speckle object IDs are content hashes, and an element's row is flattened
+from its own object alone, so an element whose ID is in both versions has
+the same row in both and the same result under any rule. Given the cached
+results of a rule on the earlier version, the later version's result is
+patched together: matched rows copy their bits across, and only the rows of
+new or changed elements are evaluated. The cost follows the size of the
+edit rather than the size of the model.
+
+That holds as long as the rule's property names resolve the same way in
+both tables (see ColumnTable.resolution); a rule whose property now names a
+different column is evaluated in full.
+
+Failures are also compared between the versions, by element identity: the
+``applicationId`` the authoring tool gave the element where there is one,
+so an edited element is the same element before and after, else its ID.
+"""
+
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .columns import ColumnTable
+from .engine import RuleResult, evaluate_rule
+
+ID_PATH = "id"
+APPLICATION_ID_PATH = "applicationId"
+
+# Version pairs whose row matching is kept per process; only the matching
+# is kept, never the tables, so a cached pair does not pin them in memory
+MAX_CACHED_DIFFS = 4
+
+# Average length of runs of matched rows below which rows are gathered one
+# by one instead
+MIN_RUN_LENGTH = 64
+
+_diffs = OrderedDict()
+# Table -> its ID lookup; each version is the earlier one of the next diff
+_id_indexes = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def row_strings(
+    table: ColumnTable, path: str, rows: Optional[np.ndarray] = None
+) -> Optional[np.ndarray]:
+    """
+    Return a string column's value per row ("" where missing), or None.
+
+    Args:
+        table: Table holding the column
+        path: Column path
+        rows: Only these rows, defaults to all
+    """
+    column = table.columns.get(path)
+    if column is None:
+        return None
+    codes = column.codes if rows is None else column.codes[rows]
+    categories = column.categories
+    return np.array(
+        [categories[code] if code >= 0 else "" for code in codes.tolist()],
+        dtype=object,
+    )
+
+
+def match_rows(previous: ColumnTable, current: ColumnTable) -> np.ndarray:
+    """
+    Return, for each row of the current table, the row of the same element
+    in the previous table, or -1 for elements that are new or changed.
+    """
+    rows = np.full(len(current), -1, dtype=np.int64)
+    before = previous.columns.get(ID_PATH)
+    after = current.columns.get(ID_PATH)
+    if before is None or after is None:
+        return rows
+
+    # Rows are matched through the ID categories, each a distinct ID
+    row_of_code = np.full(len(before.categories) + 1, -1, dtype=np.int64)
+    present = np.flatnonzero(before.codes >= 0)
+    row_of_code[before.codes[present]] = present
+    index = _id_index(previous, before)
+    # Each current ID as a category of the previous table, -1 (the extra
+    # slot at the end) if it is new
+    codes = np.fromiter(
+        map(index.get, after.categories, itertools.repeat(-1)),
+        dtype=np.int64,
+        count=len(after.categories),
+    )
+    codes = np.append(codes, -1)
+    return row_of_code[codes[after.codes]]
+
+
+def _id_index(table: ColumnTable, column) -> Dict[str, int]:
+    """Return a table's ID -> category lookup, built once per table."""
+    with _lock:
+        index = _id_indexes.get(table)
+    if index is None:
+        index = dict(zip(column.categories, range(len(column.categories))))
+        with _lock:
+            _id_indexes[table] = index
+    return index
+
+
+def matched_runs(rows: np.ndarray) -> Optional[List[tuple]]:
+    """
+    Return the matched rows as runs of consecutive rows in both versions.
+
+    Versions usually keep their elements in order, so copying a few long
+    runs is much cheaper than gathering row by row.
+
+    Returns:
+        list: (start, stop, previous start) per run, or None if the rows are
+        too scattered for runs to pay off
+    """
+    matched = rows >= 0
+    follows = np.zeros(len(rows), dtype=bool)
+    follows[1:] = matched[1:] & matched[:-1] & (rows[1:] == rows[:-1] + 1)
+    starts = np.flatnonzero(matched & ~follows)
+    if len(starts) > max(len(rows) // MIN_RUN_LENGTH, 1):
+        return None
+    stops = np.flatnonzero(matched & ~np.append(follows[1:], False)) + 1
+    return list(zip(starts.tolist(), stops.tolist(), rows[starts].tolist()))
+
+
+def identities(table: ColumnTable, rows: np.ndarray) -> Optional[List[str]]:
+    """Return the identity of some rows' elements, or None if they have none."""
+    ids = row_strings(table, ID_PATH, rows)
+    application_ids = row_strings(table, APPLICATION_ID_PATH, rows)
+    if application_ids is None:
+        return None if ids is None else ids.tolist()
+    if ids is None:
+        return application_ids.tolist()
+    return np.where(application_ids != "", application_ids, ids).tolist()
+
+
+class RowMatch:
+    """The rows of one version matched onto an earlier one, without the tables."""
+
+    def __init__(self, previous: ColumnTable, current: ColumnTable):
+        self.rows = match_rows(previous, current)
+        # Rows of elements that are new or changed, the only ones evaluated
+        self.added = np.flatnonzero(self.rows < 0)
+        # Rows of the previous version's elements that are gone or changed
+        kept = np.zeros(len(previous), dtype=bool)
+        kept[self.rows[self.rows >= 0]] = True
+        self.removed = np.flatnonzero(~kept)
+        self.runs = matched_runs(self.rows)
+        # Identities of the removed and added elements, once asked for
+        self.identities = None
+
+
+class VersionDiff:
+    """How the elements of one version map onto those of an earlier one."""
+
+    def __init__(
+        self,
+        previous: ColumnTable,
+        current: ColumnTable,
+        match: Optional[RowMatch] = None,
+    ):
+        self.previous = previous
+        self.current = current
+        self.match = match or RowMatch(previous, current)
+        self.rows = self.match.rows
+        self.added = self.match.added
+        self.removed = self.match.removed
+        self.runs = self.match.runs
+
+    def patchable(self, rule: Dict) -> bool:
+        """Return whether a rule's properties resolve alike in both versions."""
+        for condition in rule.get("conditions", []):
+            name = (condition.get("propertyName") or "").strip()
+            if self.previous.resolution(name) != self.current.resolution(name):
+                return False
+        return True
+
+    def patch(self, rule: Dict, before: tuple) -> RuleResult:
+        """
+        Return a rule's result on the current version from its previous one.
+
+        Args:
+            rule: Rule dictionary, unchanged since the previous result
+            before: Selected and passed masks of the previous result
+
+        Returns:
+            RuleResult: Result over the whole current version
+        """
+        selected = np.zeros(len(self.current), dtype=bool)
+        passed = np.zeros(len(self.current), dtype=bool)
+        if self.runs is not None:
+            for start, stop, source in self.runs:
+                end = source + stop - start
+                selected[start:stop] = before[0][source:end]
+                passed[start:stop] = before[1][source:end]
+        else:
+            matched = self.rows >= 0
+            source = self.rows[matched]
+            selected[matched] = before[0][source]
+            passed[matched] = before[1][source]
+
+        if len(self.added):
+            result = evaluate_rule(self.current.rows(self.added), rule)
+            if result.error:
+                return result
+            selected[self.added] = result.selected
+            passed[self.added] = result.passed
+        return RuleResult(0, rule, selected, passed)
+
+    def delta(self, before: tuple, result: RuleResult) -> Optional[Dict]:
+        """
+        Compare a rule's failing elements with those of the previous version.
+
+        Args:
+            before: Selected and passed masks of the previous result
+            result: The rule's result on the current version
+
+        Returns:
+            dict: newFailures and resolved element counts, or None if the
+            elements have no identities to compare by
+        """
+        if self.match.identities is None:
+            self.match.identities = (
+                identities(self.previous, self.removed),
+                identities(self.current, self.added),
+            )
+        removed, added = self.match.identities
+        if removed is None or added is None:
+            return None
+
+        # Unchanged elements fail in both versions or in neither, so only
+        # removed and added elements can make a difference
+        selected = before[0][self.removed]
+        passed = before[1][self.removed]
+        failing_before = {removed[i] for i in np.flatnonzero(selected & ~passed)}
+        failing_after = {added[i] for i in np.flatnonzero(result.failed[self.added])}
+        return {
+            "newFailures": len(failing_after - failing_before),
+            "resolved": len(failing_before - failing_after),
+        }
+
+
+def version_diff(
+    previous_id: str, previous: ColumnTable, object_id: str, current: ColumnTable
+) -> VersionDiff:
+    """
+    Return the diff between two versions, matching their rows once.
+
+    Object IDs are content hashes, so the matching cached for a pair of IDs
+    holds for any copy of their tables.
+    """
+    key = (previous_id, object_id)
+    with _lock:
+        match = _diffs.get(key)
+        if match is not None:
+            _diffs.move_to_end(key)
+    if match is not None:
+        return VersionDiff(previous, current, match)
+
+    diff = VersionDiff(previous, current)
+    with _lock:
+        _diffs[key] = diff.match
+        while len(_diffs) > MAX_CACHED_DIFFS:
+            _diffs.popitem(last=False)
+    return diff
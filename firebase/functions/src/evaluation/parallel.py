@@ -0,0 +1,210 @@
+"""
+Sharded evaluation of rulesets over large stored tables.
+
+A table that has been saved is split into row ranges evaluated by a pool of
+worker processes. Nothing but rules and results crosses the process
+boundary: each worker memory-maps the table from its directory (once, then
+keeps it) and slices its range out of the mapped columns. Every range
+starts on a multiple of 8 rows, so a worker reads only its own bytes of
+each validity bitmap, and the packed result bitmaps of consecutive ranges
+concatenate directly into the bitmaps of the whole table.
+
+``EVALUATION_WORKERS`` sets the number of worker processes. By default there
+is one per CPU this process may run on, at most ``EVALUATION_MAX_WORKERS``
+(default 4): on Cloud Run and Functions the host's core count says nothing
+about the instance's vCPU limit. Small tables, tables that only exist in
+memory, and single-CPU hosts are evaluated in-process as before, and so is a
+table whose shards fail, e.g. because the store evicted it mid-run.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .columns import ColumnTable, unpack_validity
+from .engine import RuleResult, evaluate_rule, evaluate_ruleset
+
+# Below this many elements dispatching shards costs more than it saves
+PARALLEL_MIN_ROWS = 500_000
+
+# Shards per worker, so one slow shard does not leave the others idle
+SHARDS_PER_WORKER = 2
+
+# Shard boundaries fall on whole bytes of the packed bitmaps
+ROW_ALIGNMENT = 8
+
+# Tables kept open per worker process
+MAX_WORKER_TABLES = 2
+
+# Default ceiling on worker processes, whatever the CPU count reports
+DEFAULT_MAX_WORKERS = 4
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+# Worker side: tables opened by this process, by directory
+_worker_tables = OrderedDict()
+
+
+def available_cpus() -> int:
+    """Return the number of CPUs this process may be scheduled on."""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        # Not every platform has scheduler affinity
+        return os.cpu_count() or 1
+
+
+def evaluation_workers() -> int:
+    """Return the number of worker processes to evaluate with."""
+    configured = os.environ.get("EVALUATION_WORKERS")
+    if configured:
+        return int(configured)
+    ceiling = int(os.environ.get("EVALUATION_MAX_WORKERS") or DEFAULT_MAX_WORKERS)
+    return max(1, min(available_cpus(), ceiling))
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # Spawned rather than forked: the serving process runs threads
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_workers = workers
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def shard_ranges(row_count: int, shards: int) -> List[tuple]:
+    """
+    Split rows into at most a number of ranges starting on whole bytes.
+
+    Returns:
+        list: (start, stop) pairs covering every row, in order
+    """
+    size = -(-row_count // max(shards, 1))
+    size = -(-size // ROW_ALIGNMENT) * ROW_ALIGNMENT
+    return [
+        (start, min(start + size, row_count))
+        for start in range(0, row_count, max(size, ROW_ALIGNMENT))
+    ]
+
+
+def _open_table(directory: str) -> ColumnTable:
+    table = _worker_tables.get(directory)
+    if table is None:
+        table = ColumnTable.load(directory)
+        _worker_tables[directory] = table
+        while len(_worker_tables) > MAX_WORKER_TABLES:
+            _worker_tables.popitem(last=False)
+    else:
+        _worker_tables.move_to_end(directory)
+    return table
+
+
+def evaluate_shard(directory: str, start: int, stop: int, rules: List[Dict]):
+    """
+    Evaluate rules over one range of a stored table, in a worker process.
+
+    Returns:
+        list: Per rule, the compile error, or the packed selected and passed
+        bitmaps of the range
+    """
+    shard = _open_table(directory).slice(start, stop)
+    results = []
+    for rule in rules:
+        result = evaluate_rule(shard, rule)
+        if result.error:
+            results.append(result.error)
+        else:
+            results.append(
+                (
+                    np.packbits(result.selected, bitorder="little"),
+                    np.packbits(result.passed, bitorder="little"),
+                )
+            )
+    return results
+
+
+def evaluate_ruleset_parallel(
+    table: ColumnTable, rules: Iterable[Dict], workers: Optional[int] = None
+) -> List[RuleResult]:
+    """
+    Evaluate every non-empty rule, sharding large stored tables over processes.
+
+    Results are the same as evaluate_ruleset's, numbered as in the exports.
+
+    Args:
+        table: Elements of the model
+        rules: Rule dictionaries
+        workers: Worker processes, defaults to evaluation_workers()
+
+    Returns:
+        list: RuleResult per rule with conditions
+    """
+    rules = [rule for rule in rules if rule.get("conditions")]
+    workers = workers or evaluation_workers()
+    if (
+        workers <= 1
+        or table.directory is None
+        or not len(table)
+        or len(table) < PARALLEL_MIN_ROWS
+    ):
+        return evaluate_ruleset(table, rules)
+
+    ranges = shard_ranges(len(table), workers * SHARDS_PER_WORKER)
+    futures = []
+    try:
+        executor = _get_executor(workers)
+        futures = [
+            executor.submit(evaluate_shard, table.directory, start, stop, rules)
+            for start, stop in ranges
+        ]
+        shards = [future.result() for future in futures]
+    except BrokenProcessPool as e:
+        print(f"Evaluation workers failed, evaluating in-process: {str(e)}")
+        _reset_executor()
+        return evaluate_ruleset(table, rules)
+    except FileNotFoundError as e:
+        # The store evicted the table's files; this process still has them
+        # mapped, the workers cannot open them
+        print(f"Table files gone, evaluating in-process: {str(e)}")
+        for future in futures:
+            future.cancel()
+        return evaluate_ruleset(table, rules)
+
+    results = []
+    for i, rule in enumerate(rules):
+        parts = [shard[i] for shard in shards]
+        if isinstance(parts[0], str):
+            results.append(RuleResult(i + 1, rule, error=parts[0]))
+            continue
+        selected = np.concatenate([part[0] for part in parts])
+        passed = np.concatenate([part[1] for part in parts])
+        results.append(
+            RuleResult(
+                i + 1,
+                rule,
+                unpack_validity(selected, len(table)),
+                unpack_validity(passed, len(table)),
+            )
+        )
+    return results
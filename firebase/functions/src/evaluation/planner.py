@@ -0,0 +1,138 @@
+"""
+Ordering of AND-chained conditions by estimated selectivity and cost.
+
+Conditions joined by AND can run in any order without changing the result,
+so each run of them is sorted to put first the conditions expected to leave
+few elements for little work. The estimates come from the column statistics
+kept with every table (see Column.stats): the fraction of elements with a
+value, the number of distinct values and, for numbers, their range. A
+property no element has is free and selects nothing, so it always comes
+first.
+
+Conditions are ordered by rank, cost / (1 - selectivity), the classic order
+for filters that can stop a chain early: once the intermediate mask is
+empty the rest of the run is skipped.
+"""
+
+from typing import List, Tuple
+
+from .columns import BOOL, NUMBER, ColumnTable
+
+# Estimated fraction of valued elements matching a predicate with no better
+# estimate (patterns, substrings)
+DEFAULT_MATCH = 0.5
+
+# Fraction of valued elements a numeric comparison keeps when the column's
+# range is unknown
+DEFAULT_RANGE_MATCH = 1 / 3
+
+# Cost of one Python call per distinct value, relative to one vectorized
+# operation per element
+CATEGORY_COST = 50
+PATTERN_COST = 200
+
+NUMERIC_COMPARISONS = {"greater than", "less than", "in range"}
+PER_CATEGORY = {
+    "in list",
+    "equal to",
+    "not equal to",
+    "is true",
+    "is false",
+    "identical to",
+    "contains",
+    "does not contain",
+}
+
+
+def _range_fraction(stats, low, high) -> float:
+    """Fraction of a numeric column's range between low and high."""
+    minimum, maximum = stats["min"], stats["max"]
+    if minimum is None or maximum is None:
+        return DEFAULT_RANGE_MATCH
+    if maximum == minimum:
+        return 1.0 if low <= minimum <= high else 0.0
+    covered = min(high, maximum) - max(low, minimum)
+    return min(max(covered / (maximum - minimum), 0.0), 1.0)
+
+
+def _match_fraction(column, predicate, operand) -> float:
+    """Estimated fraction of the column's valued elements that match."""
+    stats = column.stats
+    distinct = max(stats["distinct"], 1)
+
+    if predicate == "exists":
+        return 1.0
+    if predicate in NUMERIC_COMPARISONS:
+        if column.kind == BOOL:
+            # Booleans have no numbers, so no comparison holds
+            return 0.0
+        if predicate == "in range":
+            if operand.low is None or operand.high is None:
+                return 0.0
+            low, high = operand.low, operand.high
+        elif operand.number is None:
+            return 0.0
+        elif predicate == "greater than":
+            low, high = operand.number, float("inf")
+        else:
+            low, high = float("-inf"), operand.number
+        if column.kind != NUMBER:
+            return DEFAULT_RANGE_MATCH
+        return _range_fraction(stats, low, high)
+    if predicate in ("equal to", "identical to"):
+        return 1 / distinct
+    if predicate == "not equal to":
+        return 1 - 1 / distinct
+    if predicate == "in list":
+        return min(len(operand.members) / distinct, 1.0)
+    if predicate in ("is true", "is false"):
+        return 0.5
+    if predicate == "is like" and operand.pattern is None:
+        return 0.0
+    return DEFAULT_MATCH
+
+
+def estimate(condition, table: ColumnTable) -> Tuple[float, float]:
+    """
+    Estimate the selectivity and cost of a condition over a table.
+
+    Args:
+        condition: Compiled condition (property_name, predicate, operand)
+        table: Elements the condition will be evaluated over
+
+    Returns:
+        tuple: Fraction of elements expected to satisfy the condition, and
+        the cost of evaluating it relative to one pass over the elements
+    """
+    column = table.resolve(condition.property_name)
+    if column is None or not len(table):
+        return 0.0, 0.0
+
+    present = 1 - column.stats["nulls"]
+    selectivity = present * _match_fraction(
+        column, condition.predicate, condition.operand
+    )
+
+    # One vectorized pass, plus the per-value calls of string predicates
+    cost = 1.0
+    if condition.predicate == "is like":
+        cost += PATTERN_COST * column.stats["distinct"] / len(table)
+    elif condition.predicate in PER_CATEGORY:
+        cost += CATEGORY_COST * column.stats["distinct"] / len(table)
+    return selectivity, cost
+
+
+def order(conditions: List, table: ColumnTable) -> List:
+    """
+    Sort AND-joined conditions so the cheapest, most selective come first.
+
+    Ties keep a fixed order (by condition key), so the same conditions typed
+    in different orders plan to the same chain and share cached masks.
+    """
+    ranked = []
+    for condition in conditions:
+        selectivity, cost = estimate(condition, table)
+        rank = cost / (1 - selectivity) if selectivity < 1 else float("inf")
+        ranked.append((rank, condition.key, condition))
+    ranked.sort(key=lambda entry: entry[:2])
+    return [condition for _, _, condition in ranked]
@@ -0,0 +1,176 @@
+"""
+Vectorized implementations of the canonical predicates.
+
+Each predicate takes a Column and the condition's prepared operand and
+returns a boolean mask over the table's elements. A missing property
+satisfies no predicate, including the negative ones: "not equal to" and
+"does not contain" only hold for elements that have the property.
+
+Operands are built once per condition by prepare(): thresholds and range
+bounds parsed, list items lowered into a frozenset, patterns compiled. So
+evaluating a compiled rule again never re-parses its values. Numeric
+predicates compare the column's numbers; string predicates are computed once
+per distinct value and broadcast through the column's codes.
+"""
+
+import re
+
+import numpy as np
+
+from ..utils.format_utils import parse_number
+from .columns import Column
+
+TRUE_VALUES = {"true", "yes", "1"}
+FALSE_VALUES = {"false", "no", "0"}
+
+
+def _text(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+class Operand:
+    """A condition's value, parsed into what its predicate compares with."""
+
+    __slots__ = (
+        "text",
+        "lower",
+        "number",
+        "low",
+        "high",
+        "members",
+        "numbers",
+        "pattern",
+    )
+
+    def __init__(self, value):
+        self.text = "" if value is None else str(value)
+        self.lower = _text(value).lower()
+        self.number = None
+        self.low = None
+        self.high = None
+        self.members = frozenset()
+        self.numbers = None
+        self.pattern = None
+
+
+def prepare(predicate: str, value) -> Operand:
+    """
+    Parse a condition's value for its canonical predicate.
+
+    Values that cannot be parsed (a bad number, range or pattern) leave the
+    operand empty, and the predicate then matches nothing.
+    """
+    operand = Operand(value)
+    if predicate in ("greater than", "less than", "equal to", "not equal to"):
+        operand.number = parse_number(value)
+    elif predicate == "in range":
+        bounds = _text(value).split(",")
+        if len(bounds) == 2:
+            operand.low = parse_number(bounds[0])
+            operand.high = parse_number(bounds[1])
+    elif predicate == "in list":
+        items = [item.strip() for item in _text(value).split(",") if item.strip()]
+        operand.members = frozenset(item.lower() for item in items)
+        numbers = [parse_number(item) for item in items]
+        numbers = [n for n in numbers if n is not None]
+        if numbers:
+            operand.numbers = np.array(numbers, dtype=np.float64)
+    elif predicate == "is like":
+        try:
+            operand.pattern = re.compile(_text(value), re.IGNORECASE)
+        except re.error:
+            pass
+    return operand
+
+
+def exists(column: Column, operand: Operand) -> np.ndarray:
+    return column.present
+
+
+def greater_than(column: Column, operand: Operand) -> np.ndarray:
+    if operand.number is None:
+        return np.zeros(len(column), dtype=bool)
+    return column.numbers > operand.number
+
+
+def less_than(column: Column, operand: Operand) -> np.ndarray:
+    if operand.number is None:
+        return np.zeros(len(column), dtype=bool)
+    return column.numbers < operand.number
+
+
+def in_range(column: Column, operand: Operand) -> np.ndarray:
+    if operand.low is None or operand.high is None:
+        return np.zeros(len(column), dtype=bool)
+    numbers = column.numbers
+    return (numbers >= operand.low) & (numbers <= operand.high)
+
+
+def in_list(column: Column, operand: Operand) -> np.ndarray:
+    wanted = operand.members
+    mask = column.category_mask(c in wanted for c in column.lower_categories)
+    if operand.numbers is not None:
+        mask |= np.isin(column.numbers, operand.numbers)
+    return mask
+
+
+def equal_to(column: Column, operand: Operand) -> np.ndarray:
+    text = operand.lower
+    mask = column.category_mask(c == text for c in column.lower_categories)
+    if operand.number is not None:
+        # Numeric values match whatever their spelling, "200" == "200.0"
+        mask |= column.numbers == operand.number
+    return mask
+
+
+def not_equal_to(column: Column, operand: Operand) -> np.ndarray:
+    return column.present & ~equal_to(column, operand)
+
+
+def is_true(column: Column, operand: Operand) -> np.ndarray:
+    return column.category_mask(c in TRUE_VALUES for c in column.lower_categories)
+
+
+def is_false(column: Column, operand: Operand) -> np.ndarray:
+    return column.category_mask(c in FALSE_VALUES for c in column.lower_categories)
+
+
+def is_like(column: Column, operand: Operand) -> np.ndarray:
+    pattern = operand.pattern
+    if pattern is None:
+        return np.zeros(len(column), dtype=bool)
+    return column.category_mask(
+        pattern.search(c) is not None for c in column.categories
+    )
+
+
+def identical_to(column: Column, operand: Operand) -> np.ndarray:
+    text = operand.text
+    return column.category_mask(c == text for c in column.categories)
+
+
+def contains(column: Column, operand: Operand) -> np.ndarray:
+    text = operand.lower
+    return column.category_mask(text in c for c in column.lower_categories)
+
+
+def does_not_contain(column: Column, operand: Operand) -> np.ndarray:
+    return column.present & ~contains(column, operand)
+
+
+# Canonical predicate name -> vectorized implementation
+PREDICATES = {
+    "exists": exists,
+    "greater than": greater_than,
+    "less than": less_than,
+    "in range": in_range,
+    "in list": in_list,
+    "equal to": equal_to,
+    "not equal to": not_equal_to,
+    "is true": is_true,
+    "is false": is_false,
+    "is like": is_like,
+    "identical to": identical_to,
+    "contains": contains,
+    "does not contain": does_not_contain,
+}
@@ -0,0 +1,257 @@
+"""
+Cache of rule results per model version.
+
+A rule's result against a version depends only on the version's root object
+ID and the rule's conditions, so results are cached under (root object ID,
+rule content hash) and stay valid forever. Previewing a ruleset again after
+editing one rule evaluates that rule alone; the others come from the cache.
+
+Results are kept as compressed bitmaps (see bitmaps.py) of the rows each
+rule selects and fails: in memory (least recently used dropped first, up to
+``MAX_CACHED_RESULT_BYTES``), and on disk next to the version's stored
+table, so they also survive worker restarts and are shared by every process
+on the instance. Stored results count towards the table store's byte budget
+and are evicted with their version (see store.py). Failures are usually few,
+so they take a few bytes where a plain bitmap of a large model takes
+hundreds of kilobytes. Rules that fail to compile are not cached; compiling
+them again is instant.
+
+Given an earlier version of the same model, rules missing from the cache
+but cached for the earlier version are patched from it (see incremental.py)
+instead of evaluated in full, and every rule cached for the earlier version
+reports how its failures changed.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from .bitmaps import CHUNK_BITS, RowBitmap, dumps, loads
+from .columns import ColumnTable
+from .engine import RuleResult, evaluate_rule, rule_key
+from .incremental import version_diff
+from .parallel import evaluate_ruleset_parallel
+from .store import enforce_store_budget, find_table, table_path
+
+RESULTS_DIRECTORY = "results"
+
+# Memory the packed bitmaps of cached results may take per process
+MAX_CACHED_RESULT_BYTES = 64 * 1024 * 1024
+
+# (object ID, rule key) -> (selected, failed) row bitmaps
+_results = OrderedDict()
+_result_bytes = 0
+_lock = threading.Lock()
+
+
+def result_path(object_id: str, key: str) -> str:
+    """Return the file a rule's result against a version is stored in."""
+    return os.path.join(table_path(object_id), RESULTS_DIRECTORY, f"{key}.rows")
+
+
+def _nbytes(bitmaps) -> int:
+    return sum(bitmap.nbytes for bitmap in bitmaps)
+
+
+def _remember(cache_key, bitmaps: tuple):
+    global _result_bytes
+    with _lock:
+        previous = _results.pop(cache_key, None)
+        if previous is not None:
+            _result_bytes -= _nbytes(previous)
+        _results[cache_key] = bitmaps
+        _result_bytes += _nbytes(bitmaps)
+        while _result_bytes > MAX_CACHED_RESULT_BYTES and len(_results) > 1:
+            _, dropped = _results.popitem(last=False)
+            _result_bytes -= _nbytes(dropped)
+
+
+def _load(object_id: str, key: str, row_count: Optional[int]) -> Optional[tuple]:
+    """
+    Return a rule's cached (selected, failed) bitmaps, or None.
+
+    Without a row count to check them against, stored results are not read
+    and only results in memory are returned.
+    """
+    with _lock:
+        bitmaps = _results.get((object_id, key))
+        if bitmaps is not None:
+            _results.move_to_end((object_id, key))
+            return bitmaps
+    if row_count is None:
+        return None
+
+    path = result_path(object_id, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            bitmaps = tuple(loads(f.read()))
+    except (OSError, ValueError) as e:
+        print(f"Discarding unreadable result {key} of {object_id}: {str(e)}")
+        return None
+    last_chunk = (row_count - 1) >> CHUNK_BITS
+    if len(bitmaps) != 2 or any(
+        chunk > last_chunk for bitmap in bitmaps for chunk in bitmap.chunks
+    ):
+        return None
+    _remember((object_id, key), bitmaps)
+    return bitmaps
+
+
+def _store(object_id: str, key: str, bitmaps: tuple) -> bool:
+    """
+    Remember a rule's bitmaps and write them next to the version's table.
+
+    Returns:
+        bool: Whether the result was written to disk
+    """
+    _remember((object_id, key), bitmaps)
+    directory = os.path.dirname(result_path(object_id, key))
+    if not os.path.isdir(table_path(object_id)):
+        # The table itself could not be stored, or was evicted; keep the
+        # result in memory
+        return False
+    staging = os.path.join(directory, f"{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(staging, "wb") as f:
+            f.write(dumps(bitmaps))
+        os.replace(staging, result_path(object_id, key))
+        return True
+    except OSError as e:
+        print(f"Could not store result {key} of {object_id}: {str(e)}")
+        if os.path.exists(staging):
+            os.remove(staging)
+        return False
+
+
+def _masks(bitmaps: tuple, row_count: int) -> tuple:
+    """Return cached (selected, failed) bitmaps as selected and passed masks."""
+    selected = bitmaps[0].to_mask(row_count)
+    return selected, selected & ~bitmaps[1].to_mask(row_count)
+
+
+def _bitmaps(result: RuleResult) -> tuple:
+    return RowBitmap.from_mask(result.selected), RowBitmap.from_mask(result.failed)
+
+
+def evaluate_ruleset_cached(
+    object_id: str,
+    table: ColumnTable,
+    rules: Iterable[Dict],
+    previous_id: Optional[str] = None,
+) -> List[RuleResult]:
+    """
+    Evaluate a ruleset against a version, reusing cached rule results.
+
+    Args:
+        object_id: The version's root object ID
+        table: The version's elements
+        rules: Rule dictionaries
+        previous_id: Root object ID of an earlier version of the same model,
+            to patch results from and compare failures with; only used if its
+            table is loaded or stored
+
+    Returns:
+        list: RuleResult per rule with conditions, numbered as in the exports,
+        the same as evaluate_ruleset_parallel's, with a delta for rules the
+        earlier version has results for
+    """
+    rules = [rule for rule in rules if rule.get("conditions")]
+    diff = None
+    if previous_id and previous_id != object_id:
+        previous = find_table(previous_id)
+        if previous is not None:
+            diff = version_diff(previous_id, previous, object_id, table)
+
+    results = [None] * len(rules)
+    earlier = [None] * len(rules)
+    keys = [rule_key(rule) for rule in rules]
+    missing = []
+    stored = False
+    for i, rule in enumerate(rules):
+        if diff is not None:
+            bitmaps = _load(previous_id, keys[i], len(diff.previous))
+            if bitmaps is not None:
+                earlier[i] = _masks(bitmaps, len(diff.previous))
+        bitmaps = _load(object_id, keys[i], len(table))
+        if bitmaps is not None:
+            results[i] = RuleResult(0, rule, *_masks(bitmaps, len(table)))
+        elif earlier[i] is not None and diff.patchable(rule):
+            results[i] = diff.patch(rule, earlier[i])
+            if not results[i].error:
+                stored |= _store(object_id, keys[i], _bitmaps(results[i]))
+        else:
+            missing.append(i)
+
+    if missing:
+        evaluated = evaluate_ruleset_parallel(table, [rules[i] for i in missing])
+        for i, result in zip(missing, evaluated):
+            results[i] = result
+            if not result.error:
+                stored |= _store(object_id, keys[i], _bitmaps(result))
+    if stored:
+        enforce_store_budget(keep=object_id)
+
+    for i, result in enumerate(results):
+        result.number = i + 1
+        if earlier[i] is not None and not result.error:
+            result.delta = diff.delta(earlier[i], result)
+    return results
+
+
+def ruleset_counts(
+    object_id: str, table: Optional[ColumnTable], rules: Iterable[Dict]
+) -> List[Optional[Dict]]:
+    """
+    Return each rule's counts against a version, from its cached result.
+
+    Counts are read off the cached bitmaps without unpacking them, so a rule
+    previewed or counted before costs a lookup. Other rules are evaluated
+    and cached as preview results are.
+
+    Args:
+        object_id: The version's root object ID
+        table: The version's elements, or None to only use results in memory
+        rules: Rule dictionaries
+
+    Returns:
+        list: Per rule, selected, passed and failed counts (or an error), or
+        None if the rule has no conditions or is not cached and there is no
+        table
+    """
+    row_count = None if table is None else len(table)
+    counts = []
+    stored = False
+    for rule in rules:
+        if not rule.get("conditions"):
+            counts.append(None)
+            continue
+        key = rule_key(rule)
+        bitmaps = _load(object_id, key, row_count)
+        if bitmaps is None:
+            if table is None:
+                counts.append(None)
+                continue
+            result = evaluate_rule(table, rule)
+            if result.error:
+                result = result.to_dict()
+                counts.append(
+                    {
+                        name: result[name]
+                        for name in ("selected", "passed", "failed", "error")
+                    }
+                )
+                continue
+            bitmaps = _bitmaps(result)
+            stored |= _store(object_id, key, bitmaps)
+        selected, failed = len(bitmaps[0]), len(bitmaps[1])
+        counts.append(
+            {"selected": selected, "passed": selected - failed, "failed": failed}
+        )
+    if stored:
+        enforce_store_budget(keep=object_id)
+    return counts
@@ -0,0 +1,281 @@
+"""
+Local store of decoded model tables, keyed by version root object ID.
+
+Speckle object IDs are content hashes, so the table built from a version's
+root object never goes stale. The first request for a version flattens its
+objects and saves the table; later requests in any process on the instance
+memory-map it instead of downloading and walking the JSON again, and the
+last few tables stay loaded in memory. Each table's property catalog and
+value histograms are stored in the same directory once asked for.
+
+``MODEL_TABLE_STORE_DIR`` overrides where tables are written (by default a
+directory under the system temp dir, which is what Functions and Cloud Run
+give us). That temp dir is in-memory on both, so everything stored counts
+against the instance's memory: the store is kept under
+``MODEL_TABLE_STORE_MAX_BYTES`` (default 512 MiB) by deleting whole version
+directories, table, summaries and cached results together, least recently
+used first. Point ``MODEL_TABLE_STORE_DIR`` at a real disk and raise the
+budget where one is available.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .catalog import CATALOG_FILE, PropertyCatalog
+from .columns import MANIFEST_FILE, ColumnTable
+from .engine import build_table
+from .histograms import HISTOGRAMS_FILE, ValueHistograms
+
+# Tables kept loaded per process, most recently used last
+MAX_LOADED_TABLES = 4
+
+# Bytes the stored versions may take together, unless overridden
+DEFAULT_STORE_MAX_BYTES = 512 * 1024 * 1024
+
+_loaded = OrderedDict()
+_catalogs = OrderedDict()
+_histograms = OrderedDict()
+_lock = threading.Lock()
+
+
+def store_directory() -> str:
+    """Return the directory tables are stored under."""
+    return os.environ.get(
+        "MODEL_TABLE_STORE_DIR",
+        os.path.join(tempfile.gettempdir(), "model-checker", "tables"),
+    )
+
+
+def table_path(object_id: str) -> str:
+    """Return the directory holding the table of one version."""
+    return os.path.join(store_directory(), object_id)
+
+
+def store_max_bytes() -> int:
+    """Return the byte budget of the store."""
+    return int(os.environ.get("MODEL_TABLE_STORE_MAX_BYTES", DEFAULT_STORE_MAX_BYTES))
+
+
+def touch_table(object_id: str):
+    """Mark a stored version as used, so it is evicted last."""
+    try:
+        os.utime(table_path(object_id))
+    except OSError:
+        pass
+
+
+def _directory_bytes(path: str) -> int:
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+def enforce_store_budget(keep: Optional[str] = None) -> int:
+    """
+    Delete least recently used versions until the store fits its budget.
+
+    A version's directory is deleted whole. Tables already memory-mapped
+    from it stay readable until they are dropped; results for it are then
+    only kept in memory.
+
+    Args:
+        keep: Object ID of a version never to evict, the one just written
+
+    Returns:
+        int: Bytes freed
+    """
+    root = store_directory()
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return 0
+
+    versions = []
+    total = 0
+    for entry in entries:
+        # Staging directories are still being written
+        if entry.name.endswith(".tmp") or not entry.is_dir(follow_symlinks=False):
+            continue
+        size = _directory_bytes(entry.path)
+        total += size
+        versions.append((entry.stat().st_mtime, entry.name, size))
+
+    budget = store_max_bytes()
+    freed = 0
+    for _, object_id, size in sorted(versions):
+        if total - freed <= budget:
+            break
+        if object_id == keep:
+            continue
+        shutil.rmtree(os.path.join(root, object_id), ignore_errors=True)
+        freed += size
+        print(f"Evicted stored table {object_id} ({size} bytes)")
+    return freed
+
+
+def _remember(cache, object_id, value):
+    with _lock:
+        cache[object_id] = value
+        cache.move_to_end(object_id)
+        while len(cache) > MAX_LOADED_TABLES:
+            cache.popitem(last=False)
+
+
+def save_table(object_id: str, table: ColumnTable):
+    """
+    Save a table under its object ID without exposing a partial copy.
+
+    The table is written to a private directory and renamed into place; if
+    another process got there first its copy is kept.
+    """
+    target = table_path(object_id)
+    staging = f"{target}.{uuid.uuid4().hex}.tmp"
+    table.save(staging)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+    if os.path.exists(os.path.join(target, MANIFEST_FILE)):
+        table.directory = target
+
+
+def find_table(object_id: str) -> Optional[ColumnTable]:
+    """
+    Return the table for a version if it is loaded or stored, else None.
+
+    Never downloads or builds anything.
+    """
+    with _lock:
+        table = _loaded.get(object_id)
+        if table is not None:
+            _loaded.move_to_end(object_id)
+    if table is not None:
+        touch_table(object_id)
+        return table
+
+    target = table_path(object_id)
+    if not os.path.exists(os.path.join(target, MANIFEST_FILE)):
+        return None
+    try:
+        table = ColumnTable.load(target)
+    except (OSError, ValueError) as e:
+        print(f"Discarding unreadable table {object_id}: {str(e)}")
+        shutil.rmtree(target, ignore_errors=True)
+        return None
+    touch_table(object_id)
+    _remember(_loaded, object_id, table)
+    return table
+
+
+def get_table(object_id: str, load_objects: Callable) -> ColumnTable:
+    """
+    Return the table for a version, building and storing it if needed.
+
+    Args:
+        object_id: The version's root object ID
+        load_objects: Called with no arguments when the table is not stored
+            yet; returns the version's objects, ideally as a stream so they
+            are flattened as they arrive
+
+    Returns:
+        ColumnTable: The version's elements
+    """
+    table = find_table(object_id)
+    if table is not None:
+        return table
+
+    table = build_table(load_objects(), object_id)
+    try:
+        save_table(object_id, table)
+        enforce_store_budget(keep=object_id)
+    except OSError as e:
+        # Still usable from memory, just not shared
+        print(f"Could not store table {object_id}: {str(e)}")
+
+    _remember(_loaded, object_id, table)
+    return table
+
+
+def _load_summary(cache, object_id, filename, cls):
+    """Return a stored summary of a version from memory or disk, or None."""
+    with _lock:
+        summary = cache.get(object_id)
+        if summary is not None:
+            cache.move_to_end(object_id)
+            return summary
+
+    path = os.path.join(table_path(object_id), filename)
+    if not os.path.exists(path):
+        return None
+    try:
+        summary = cls.load(path)
+    except (OSError, ValueError) as e:
+        print(f"Discarding unreadable {filename} of {object_id}: {str(e)}")
+        return None
+    _remember(cache, object_id, summary)
+    return summary
+
+
+def _summarize(object_id: str, load_objects: Callable):
+    """Build, store and remember the catalog and histograms of a version."""
+    table = get_table(object_id, load_objects)
+    histograms = ValueHistograms.from_table(table)
+    catalog = PropertyCatalog.from_table(table, histograms)
+
+    directory = table_path(object_id)
+    try:
+        histograms.save(os.path.join(directory, HISTOGRAMS_FILE))
+        catalog.save(os.path.join(directory, CATALOG_FILE))
+        enforce_store_budget(keep=object_id)
+    except OSError as e:
+        print(f"Could not store summaries of {object_id}: {str(e)}")
+
+    _remember(_histograms, object_id, histograms)
+    _remember(_catalogs, object_id, catalog)
+    return catalog, histograms
+
+
+def get_catalog(object_id: str, load_objects: Callable) -> PropertyCatalog:
+    """
+    Return the property catalog of a version, building it from its table.
+
+    Args:
+        object_id: The version's root object ID
+        load_objects: As for get_table, used if the table is not stored yet
+
+    Returns:
+        PropertyCatalog: The version's property paths
+    """
+    catalog = _load_summary(_catalogs, object_id, CATALOG_FILE, PropertyCatalog)
+    if catalog is None:
+        catalog, _ = _summarize(object_id, load_objects)
+    return catalog
+
+
+def get_histograms(object_id: str, load_objects: Callable) -> ValueHistograms:
+    """
+    Return the value histograms of a version, building them from its table.
+
+    Args:
+        object_id: The version's root object ID
+        load_objects: As for get_table, used if the table is not stored yet
+
+    Returns:
+        ValueHistograms: The version's property values
+    """
+    histograms = _load_summary(
+        _histograms, object_id, HISTOGRAMS_FILE, ValueHistograms
+    )
+    if histograms is None:
+        _, histograms = _summarize(object_id, load_objects)
+    return histograms
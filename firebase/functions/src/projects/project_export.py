@@ -0,0 +1,164 @@
+import datetime
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase_functions import https_fn
+
+from ..utils.firestore_utils import (
+    get_rules_for_ruleset,
+    get_rulesets_for_project,
+    safe_verify_id_token,
+)
+from ..utils.tsv_utils import iter_ruleset_tsv, ruleset_tsv_filename
+from ..utils.zip_stream import iter_zip
+
+# Rulesets whose rules are being read at once; also bounds how many fetched
+# rulesets can sit in memory waiting to be written
+EXPORT_FETCH_WORKERS = 8
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _prefetch_rules(rulesets, workers=EXPORT_FETCH_WORKERS):
+    """
+    Yield (ruleset, rules) in order while reading later rulesets concurrently.
+
+    Args:
+        rulesets (list): Ruleset dictionaries with IDs
+        workers (int): Maximum number of rule reads in flight
+
+    Yields:
+        tuple: (ruleset, list of rule dictionaries)
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        queued = iter(rulesets)
+
+        for ruleset in queued:
+            pending.append(
+                (ruleset, executor.submit(get_rules_for_ruleset, ruleset["id"]))
+            )
+            if len(pending) >= workers:
+                break
+
+        while pending:
+            ruleset, future = pending.pop(0)
+            rules = future.result()
+
+            # Keep the window full while this ruleset is being compressed
+            next_ruleset = next(queued, None)
+            if next_ruleset is not None:
+                pending.append(
+                    (
+                        next_ruleset,
+                        executor.submit(get_rules_for_ruleset, next_ruleset["id"]),
+                    )
+                )
+
+            yield ruleset, rules
+
+
+def _entry_name(ruleset, used_names):
+    """Return a unique archive path for a ruleset's TSV."""
+    filename = ruleset_tsv_filename(ruleset).replace("/", "_").replace("\\", "_")
+    name = f"rulesets/{filename}"
+
+    # Two rulesets can share a name; suffix later ones with their ID
+    if name in used_names:
+        name = f"rulesets/{filename[:-4]}_{ruleset['id']}.tsv"
+    used_names.add(name)
+
+    return name
+
+
+def _hashed(chunks, digest):
+    """Pass chunks through while feeding their UTF-8 bytes to a digest."""
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        yield chunk
+
+
+def iter_project_archive_entries(project_id, rulesets):
+    """
+    Generate the (name, content) entries of a project export archive.
+
+    Every ruleset becomes one TSV; the manifest comes last because it records
+    the rule count and SHA-256 of each file, which are only known once the
+    TSV has been written.
+
+    Args:
+        project_id (str): Speckle project ID
+        rulesets (list): Ruleset dictionaries with IDs
+
+    Yields:
+        tuple: (archive_name, iterable of str chunks)
+    """
+    used_names = set()
+    manifest_rulesets = []
+
+    for ruleset, rules in _prefetch_rules(rulesets):
+        name = _entry_name(ruleset, used_names)
+        digest = hashlib.sha256()
+
+        yield name, _hashed(iter_ruleset_tsv(ruleset, rules), digest)
+
+        manifest_rulesets.append(
+            {
+                "id": ruleset["id"],
+                "name": ruleset.get("name", ""),
+                "description": ruleset.get("description", ""),
+                "isShared": ruleset.get("isShared", False),
+                "file": name,
+                # Rules without conditions are left out of the TSV
+                "ruleCount": sum(1 for rule in rules if rule.get("conditions")),
+                "sha256": digest.hexdigest(),
+            }
+        )
+
+    manifest = {
+        "projectId": project_id,
+        "exportedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "rulesetCount": len(manifest_rulesets),
+        "rulesets": manifest_rulesets,
+    }
+    yield MANIFEST_NAME, [json.dumps(manifest, indent=2)]
+
+
+def export_project_as_zip(request, project_id):
+    """Stream a ZIP with one TSV per ruleset in a project plus a manifest."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return https_fn.Response("Unauthorized", mimetype="text/plain", status=401)
+
+    if not project_id:
+        return https_fn.Response(
+            "Missing project ID", mimetype="text/plain", status=400
+        )
+
+    try:
+        id_token = auth_header.split("Bearer ")[1]
+        decoded_token = safe_verify_id_token(id_token)
+        user_id = decoded_token["uid"]
+
+        # Only the caller's own rulesets are ever listed
+        rulesets = get_rulesets_for_project(user_id, project_id)
+
+        filename = f"{project_id}_rulesets.zip"
+
+        return https_fn.Response(
+            iter_zip(iter_project_archive_entries(project_id, rulesets)),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error details: {error_details}")
+        return https_fn.Response(
+            f"Error exporting project: {str(e)}",
+            mimetype="text/plain",
+            status=500,
+        )
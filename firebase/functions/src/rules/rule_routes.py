@@ -3,17 +3,22 @@ import re
 from firebase_functions import https_fn
 from google.cloud import firestore
 
+from ..evaluation.conflicts import rule_conflicts
+from ..rulesets.ruleset_publish import republish_ruleset
+from ..rulesets.ruleset_snapshots import snapshot_ruleset
 from ..utils.firestore_utils import (
     create_rule,
     delete_single_rule,
     get_rule,
     get_rules_for_ruleset,
     get_ruleset,
+    import_rules,
     safe_verify_id_token,
     update_single_rule,
 )
 from ..utils.jinja_env import render_template
-from ..utils.mapping import get_canonical_predicate
+from ..utils.mapping import CANONICAL_PREDICATES, get_canonical_predicate
+from ..utils.tsv_utils import TsvImportError, iter_tsv_lines, parse_ruleset_tsv
 
 
 def get_rules(request, ruleset_id):
@@ -56,24 +61,7 @@ def get_rules(request, ruleset_id):
         # Get rules from the subcollection
         rules = get_rules_for_ruleset(ruleset_id)
 
-        # Convert any symbolic storage predicates to canonical forms for display
-        for rule in rules:
-            for condition in rule.get("conditions", []):
-                if "predicate" in condition:
-                    stored_predicate = condition["predicate"]
-                    canonical_predicate = get_canonical_predicate(stored_predicate)
-                    condition["predicate"] = canonical_predicate
-
-        # Return the rules list
-        return https_fn.Response(
-            render_template(
-                "rules_list.html",
-                ruleset=ruleset,
-                ruleset_id=ruleset_id,
-                rules=rules,
-            ),
-            mimetype="text/html",
-        )
+        return _rules_list_response(ruleset, ruleset_id, rules)
 
     except Exception as e:
         import traceback
@@ -88,6 +76,42 @@ def get_rules(request, ruleset_id):
         )
 
 
+def _rules_list_response(ruleset, ruleset_id, rules):
+    """Return the rules list HTML for rules already loaded."""
+    # Convert any symbolic storage predicates to canonical forms for display
+    for rule in rules:
+        for condition in rule.get("conditions", []):
+            if "predicate" in condition:
+                stored_predicate = condition["predicate"]
+                canonical_predicate = get_canonical_predicate(stored_predicate)
+                condition["predicate"] = canonical_predicate
+
+    # Return the rules list
+    return https_fn.Response(
+        render_template(
+            "rules_list.html",
+            ruleset=ruleset,
+            ruleset_id=ruleset_id,
+            rules=rules,
+            conflicts=rule_conflicts(rules),
+        ),
+        mimetype="text/html",
+    )
+
+
+def _saved_rules_response(ruleset_id, ruleset):
+    """
+    Snapshot and republish an edited ruleset, then return its rules list.
+
+    The rules are read once and shared by all three; the list is rendered
+    last because it rewrites predicates for display.
+    """
+    rules = get_rules_for_ruleset(ruleset_id)
+    snapshot_ruleset(ruleset_id, ruleset, rules)
+    republish_ruleset(ruleset_id, ruleset, rules)
+    return _rules_list_response(ruleset, ruleset_id, rules)
+
+
 def get_new_rule_form(request, ruleset_id):
     """Return HTML for the new rule form."""
     try:
@@ -353,8 +377,9 @@ def create_rule_handler(request, ruleset_id):
 
         print(f"Created rule with data: {created_rule}")
 
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        # Return the updated rules list; the page then asks for counts, and
+        # only the new rule is evaluated for them
+        return _saved_rules_response(ruleset_id, ruleset)
 
     except Exception as e:
         import traceback
@@ -369,6 +394,88 @@ def create_rule_handler(request, ruleset_id):
         )
 
 
+def import_rules_handler(request, ruleset_id):
+    """Import rules from an uploaded TSV file into a ruleset."""
+    try:
+        # Get auth header
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return https_fn.Response(
+                render_template("error.html", message="Unauthorized"),
+                mimetype="text/html",
+                status=401,
+            )
+
+        id_token = auth_header.split("Bearer ")[1]
+        decoded_token = safe_verify_id_token(id_token)
+        user_id = decoded_token["uid"]
+
+        # Get the ruleset to verify ownership
+        ruleset = get_ruleset(ruleset_id)
+
+        if not ruleset:
+            return https_fn.Response(
+                render_template("error.html", message="Ruleset not found"),
+                mimetype="text/html",
+                status=404,
+            )
+
+        # Verify ownership
+        if ruleset.get("userId") != user_id:
+            return https_fn.Response(
+                render_template(
+                    "error.html",
+                    message="You don't have permission to add rules to this ruleset",
+                ),
+                mimetype="text/html",
+                status=403,
+            )
+
+        # Accept a multipart upload from the form or a raw TSV request body
+        upload = request.files.get("file")
+        stream = upload.stream if upload else request.stream
+        replace = request.form.get("mode") == "replace"
+
+        # Parse everything before writing so a bad row imports nothing
+        try:
+            rules = list(
+                parse_ruleset_tsv(iter_tsv_lines(stream), CANONICAL_PREDICATES)
+            )
+        except TsvImportError as e:
+            # Plain text so the form can show the offending lines
+            return https_fn.Response(
+                f"Could not import rules:\n{str(e)}",
+                mimetype="text/plain",
+                status=400,
+            )
+
+        if not rules:
+            return https_fn.Response(
+                "No rules found in file", mimetype="text/plain", status=400
+            )
+
+        written = import_rules(ruleset_id, user_id, rules, replace=replace)
+
+        print(f"Imported {written} rules into ruleset {ruleset_id}")
+
+        # Return the updated rules list; when the page asks for counts,
+        # imported rules are evaluated unless a rule with the same conditions
+        # already was
+        return _saved_rules_response(ruleset_id, ruleset)
+
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Error importing rules: {str(e)}")
+        print(f"Error details: {error_details}")
+        return https_fn.Response(
+            render_template("error.html", message=f"Error importing rules: {str(e)}"),
+            mimetype="text/html",
+            status=500,
+        )
+
+
 def update_rule_handler(request, ruleset_id, rule_id):
     """Update an existing rule."""
     try:
@@ -474,8 +581,9 @@ def update_rule_handler(request, ruleset_id, rule_id):
         # Update rule in Firestore
         update_single_rule(ruleset_id, rule_id, rule_data)
 
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        # Return the updated rules list; when the page asks for counts, the
+        # edited rule is evaluated again if its conditions changed
+        return _saved_rules_response(ruleset_id, ruleset)
 
     except Exception as e:
         import traceback
@@ -539,8 +647,9 @@ def delete_rule_handler(request, ruleset_id, rule_id):
         # Delete rule from Firestore
         delete_single_rule(ruleset_id, rule_id)
 
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        # Return the updated rules list; when the page asks for counts, the
+        # remaining rules are all cached
+        return _saved_rules_response(ruleset_id, ruleset)
 
     except Exception as e:
         return https_fn.Response(
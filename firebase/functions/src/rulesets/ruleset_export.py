@@ -2,14 +2,54 @@ from firebase_functions import https_fn
 
 from ..utils.firestore_utils import (
     get_ruleset,
-    get_rules_for_ruleset,
     safe_verify_id_token,
+    stream_rules_for_ruleset,
 )
-from ..utils.tsv_utils import generate_ruleset_tsv
+from ..utils.format_utils import RULESET_FORMATS, ruleset_format_filename
+from ..utils.tsv_utils import iter_ruleset_tsv, ruleset_tsv_filename
+
+
+def ruleset_download_response(ruleset, rules, format_name, headers=None):
+    """
+    Build a streaming download of a ruleset in the requested format.
+
+    Args:
+        ruleset (dict): Ruleset data
+        rules (iterable): Rule dictionaries, consumed lazily
+        format_name (str): "tsv" or one of RULESET_FORMATS
+        headers (dict): Extra response headers
+
+    Returns:
+        https_fn.Response: The download, or a 400 for an unknown format
+    """
+    if format_name == "tsv":
+        body = iter_ruleset_tsv(ruleset, rules)
+        mimetype = "text/tab-separated-values"
+        filename = ruleset_tsv_filename(ruleset)
+    elif format_name in RULESET_FORMATS:
+        generate, mimetype, extension = RULESET_FORMATS[format_name]
+        body = generate(ruleset, rules)
+        filename = ruleset_format_filename(ruleset, extension)
+    else:
+        supported = ", ".join(["tsv", *RULESET_FORMATS])
+        return https_fn.Response(
+            f"Unsupported format '{format_name}', expected one of: {supported}",
+            mimetype="text/plain",
+            status=400,
+        )
+
+    return https_fn.Response(
+        body,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            **(headers or {}),
+        },
+    )
 
 
 def export_ruleset_as_tsv(request, ruleset_id):
-    """Export a ruleset as a TSV file."""
+    """Export a ruleset as TSV, or in the format given by ?format=."""
     try:
         # Get user info from request (if available)
         try:
@@ -46,18 +86,11 @@ def export_ruleset_as_tsv(request, ruleset_id):
                 status=403,
             )
 
-        # Get rules
-        rules = get_rules_for_ruleset(ruleset_id)
-
-        # Generate TSV content using the shared utility
-        tsv_content, filename = generate_ruleset_tsv(ruleset, rules)
+        # Stream rules page by page straight into the response body
+        rules = stream_rules_for_ruleset(ruleset_id)
+        format_name = request.args.get("format", "tsv").lower()
 
-        # Set headers for file download
-        return https_fn.Response(
-            tsv_content,
-            mimetype="text/tab-separated-values",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-        )
+        return ruleset_download_response(ruleset, rules, format_name)
 
     except Exception as e:
         import traceback
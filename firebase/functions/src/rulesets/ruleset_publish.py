@@ -0,0 +1,229 @@
+"""
+Publishing of shared rulesets as immutable, content-addressed static objects.
+
+Every time a shared ruleset changes its TSV is rendered once and written to
+object storage under ``shared/{ruleset_id}/{sha256}/{filename}``. Because the
+path changes whenever the content does, the object itself can be cached
+forever, and ``/shared/{id}`` only has to point at the current version.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from ..utils.firestore_utils import (
+    get_rules_for_ruleset,
+    get_ruleset,
+    set_ruleset_publication,
+)
+from ..utils.tsv_utils import generate_ruleset_tsv
+
+PUBLISHED_PREFIX = "shared"
+TSV_CONTENT_TYPE = "text/tab-separated-values"
+
+# Published objects never change, so browsers and the CDN may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# The /shared/{id} pointer does change, so Hosting only keeps it briefly
+POINTER_CACHE_CONTROL = "public, max-age=60, s-maxage=300"
+
+DEFAULT_BUCKET = "speckle-model-checker.firebasestorage.app"
+
+
+class GCSPublishStore:
+    """Publish store backed by a public Cloud Storage bucket."""
+
+    def __init__(self, bucket_name=None):
+        self.bucket_name = bucket_name or os.environ.get(
+            "SHARED_RULESETS_BUCKET", DEFAULT_BUCKET
+        )
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            from firebase_admin import storage
+
+            self._bucket = storage.bucket(self.bucket_name)
+        return self._bucket
+
+    def exists(self, path):
+        return self.bucket.blob(path).exists()
+
+    def put(self, path, data, content_type, filename):
+        blob = self.bucket.blob(path)
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        blob.content_disposition = f'attachment; filename="{filename}"'
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+
+    def public_url(self, path):
+        return self.bucket.blob(path).public_url
+
+    def read(self, path):
+        return self.bucket.blob(path).download_as_bytes()
+
+    def delete_prefix(self, prefix):
+        blobs = list(self.bucket.list_blobs(prefix=prefix))
+        for blob in blobs:
+            blob.delete()
+        return len(blobs)
+
+
+class LocalPublishStore:
+    """
+    Publish store writing to the local filesystem.
+
+    Used by the emulator and tests. When ``base_url`` is set (for example a
+    local static file server) shared links redirect there, otherwise the
+    function serves the published bytes itself.
+    """
+
+    def __init__(self, root, base_url=None):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def exists(self, path):
+        return (self.root / path).is_file()
+
+    def put(self, path, data, content_type, filename):
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial object
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+    def public_url(self, path):
+        if not self.base_url:
+            return None
+        return f"{self.base_url}/{path}"
+
+    def read(self, path):
+        return (self.root / path).read_bytes()
+
+    def delete_prefix(self, prefix):
+        files = [path for path in self.root.glob(f"{prefix}**/*") if path.is_file()]
+        for path in files:
+            path.unlink()
+        return len(files)
+
+
+_store = None
+
+
+def get_publish_store():
+    """
+    Return the configured publish store.
+
+    ``SHARED_RULESETS_STORE`` selects the backend: ``gcs`` (default) or
+    ``local:/some/dir``. ``SHARED_RULESETS_BASE_URL`` optionally gives the URL
+    a local store is served from.
+    """
+    global _store
+    if _store is None:
+        spec = os.environ.get("SHARED_RULESETS_STORE", "gcs")
+        if spec.startswith("local:"):
+            _store = LocalPublishStore(
+                spec[len("local:") :], os.environ.get("SHARED_RULESETS_BASE_URL")
+            )
+        else:
+            _store = GCSPublishStore()
+    return _store
+
+
+def published_path(ruleset_id, content_hash, filename):
+    """Return the content-addressed object path for a ruleset version."""
+    return f"{PUBLISHED_PREFIX}/{ruleset_id}/{content_hash}/{filename}"
+
+
+def publish_ruleset(ruleset, rules, store=None):
+    """
+    Render a ruleset and write it to the publish store.
+
+    Publishing is idempotent: an unchanged ruleset maps to an existing path
+    and nothing is uploaded.
+
+    Args:
+        ruleset (dict): Ruleset document with ID
+        rules (list): Rule documents in order
+        store: Publish store, defaults to the configured one
+
+    Returns:
+        dict: ``hash``, ``path``, ``url`` and ``filename`` of the published TSV
+    """
+    store = store or get_publish_store()
+
+    tsv_content, filename = generate_ruleset_tsv(ruleset, rules)
+    data = tsv_content.encode("utf-8")
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = published_path(ruleset["id"], content_hash, filename)
+
+    if not store.exists(path):
+        store.put(path, data, TSV_CONTENT_TYPE, filename)
+
+    return {
+        "hash": content_hash,
+        "path": path,
+        "url": store.public_url(path),
+        "filename": filename,
+    }
+
+
+def unpublish_ruleset(ruleset_id, store=None):
+    """
+    Delete every published version of a ruleset.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        store: Publish store, defaults to the configured one
+
+    Returns:
+        int: Number of objects deleted
+    """
+    store = store or get_publish_store()
+    return store.delete_prefix(f"{PUBLISHED_PREFIX}/{ruleset_id}/")
+
+
+def republish_ruleset(ruleset_id, ruleset=None, rules=None):
+    """
+    Bring the published copy of a ruleset in line with Firestore.
+
+    Shared rulesets are (re)published and the ruleset document records the
+    current version. Unsharing deletes the published objects as well as the
+    pointer, so neither /shared nor an old object URL resolves any more.
+    Failures are logged rather than raised so an edit never fails because
+    publishing did.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        ruleset (dict, optional): Already loaded ruleset document
+        rules (list, optional): Already loaded rule documents in order
+
+    Returns:
+        dict: Publication details, or None if nothing is published
+    """
+    try:
+        if ruleset is None:
+            ruleset = get_ruleset(ruleset_id)
+        if not ruleset:
+            return None
+
+        if not ruleset.get("isShared", False):
+            if ruleset.get("publishedPath"):
+                unpublish_ruleset(ruleset_id)
+                set_ruleset_publication(ruleset_id, None)
+            return None
+
+        if rules is None:
+            rules = get_rules_for_ruleset(ruleset_id)
+
+        publication = publish_ruleset(ruleset, rules)
+
+        if publication["path"] != ruleset.get("publishedPath"):
+            set_ruleset_publication(ruleset_id, publication)
+
+        return publication
+    except Exception as e:
+        print(f"Error publishing ruleset {ruleset_id}: {str(e)}")
+        return None
@@ -1,6 +1,7 @@
 from firebase_functions import https_fn
 from google.cloud import firestore
 
+from ..evaluation.conflicts import rule_conflicts
 from ..utils.firestore_utils import (
     create_ruleset,
     delete_ruleset,
@@ -10,6 +11,8 @@ from ..utils.firestore_utils import (
     update_ruleset,
 )
 from ..utils.jinja_env import render_template
+from .ruleset_publish import republish_ruleset, unpublish_ruleset
+from .ruleset_snapshots import snapshot_ruleset
 
 
 def get_ruleset_edit_form(request, ruleset_id):
@@ -59,6 +62,7 @@ def get_ruleset_edit_form(request, ruleset_id):
                 ruleset=ruleset,
                 rules=rules,
                 ruleset_id=ruleset_id,
+                conflicts=rule_conflicts(rules),
             ),
             mimetype="text/html",
         )
@@ -101,6 +105,7 @@ def create_new_ruleset(request):
 
         # Create the ruleset
         ruleset = create_ruleset(user_id, project_id, name, description)
+        ruleset["snapshotHash"] = snapshot_ruleset(ruleset["id"], ruleset)
 
         # Redirect to the project page
         return https_fn.Response(
@@ -155,6 +160,10 @@ def update_ruleset_info(request, ruleset_id):
 
         # Update the ruleset
         update_ruleset(ruleset_id, {"name": name, "description": description})
+        ruleset.update(name=name, description=description)
+        rules = get_rules_for_ruleset(ruleset_id)
+        snapshot_ruleset(ruleset_id, ruleset, rules)
+        republish_ruleset(ruleset_id, ruleset, rules)
 
         # Reload the edit page
         return get_ruleset_edit_form(request, ruleset_id)
@@ -213,6 +222,10 @@ def delete_ruleset_handler(request, ruleset_id):
                 status=403,
             )
 
+        # Take down any published versions first, so a failure leaves the
+        # ruleset in place to delete again
+        unpublish_ruleset(ruleset_id)
+
         # Delete the ruleset
         delete_ruleset(ruleset_id)
 
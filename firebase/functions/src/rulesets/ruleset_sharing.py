@@ -1,16 +1,20 @@
 from firebase_functions import https_fn
-import csv
-from io import StringIO
 
 from ..projects.project_routes import get_location
 from ..utils.firestore_utils import (
     get_rules_for_ruleset,
     get_ruleset,
     safe_verify_id_token,
+    stream_rules_for_ruleset,
     toggle_ruleset_sharing,
 )
 from ..utils.jinja_env import render_template
-from ..utils.tsv_utils import generate_ruleset_tsv
+from .ruleset_export import ruleset_download_response
+from .ruleset_publish import (
+    POINTER_CACHE_CONTROL,
+    get_publish_store,
+    republish_ruleset,
+)
 
 
 def get_share_dialog(request, ruleset_id):
@@ -112,6 +116,7 @@ def toggle_ruleset_sharing_handler(request, ruleset_id):
         toggle_ruleset_sharing(ruleset_id)
         ruleset = get_ruleset(ruleset_id)
         ruleset["rules"] = get_rules_for_ruleset(ruleset["id"])
+        republish_ruleset(ruleset_id, ruleset, ruleset["rules"])
 
         # Get host URL for generating shared links
         host_url = request.headers.get("Host", "")
@@ -139,7 +144,7 @@ def toggle_ruleset_sharing_handler(request, ruleset_id):
 
 
 def get_shared_ruleset_view(request, ruleset_id):
-    """Return TSV for a publicly shared ruleset."""
+    """Return TSV (or the ?format= variant) for a publicly shared ruleset."""
     try:
         # Get the ruleset
         ruleset = get_ruleset(ruleset_id)
@@ -159,28 +164,24 @@ def get_shared_ruleset_view(request, ruleset_id):
                 status=403,
             )
 
-        # Get the rules
-        rules = get_rules_for_ruleset(ruleset_id)
+        format_name = request.args.get("format", "tsv").lower()
 
-        # Try using the shared utility first
-        try:
-            # Generate TSV content using the shared utility
-            tsv_content, filename = generate_ruleset_tsv(ruleset, rules)
-        except Exception as util_error:
-            print(
-                f"Shared utility error: {util_error}. Falling back to inline generation."
-            )
-            # Fall back to inline generation if the utility fails
-            tsv_content, filename = _generate_tsv_inline(ruleset, rules)
+        # Serve the published copy when there is one, so repeat downloads are
+        # answered by the CDN instead of this function (only TSV is published)
+        if format_name == "tsv":
+            published = _serve_published_ruleset(ruleset)
+            if published is not None:
+                return published
 
-        # Return TSV file directly - this is important for automation
-        return https_fn.Response(
-            tsv_content,
-            mimetype="text/tab-separated-values",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "Content-Type": "text/tab-separated-values",
-            },
+        # Stream the rules so large rulesets start downloading immediately
+        rules = stream_rules_for_ruleset(ruleset_id)
+
+        # Return the file directly - this is important for automation
+        return ruleset_download_response(
+            ruleset,
+            rules,
+            format_name,
+            headers={"Cache-Control": POINTER_CACHE_CONTROL},
         )
     except Exception as e:
         import traceback
@@ -195,82 +196,36 @@ def get_shared_ruleset_view(request, ruleset_id):
         )
 
 
-def _generate_tsv_inline(ruleset, rules):
+def _serve_published_ruleset(ruleset):
     """
-    Inline TSV generation as a fallback.
-    Puts severity and message on the last row of each rule.
+    Return a response for the published copy of a shared ruleset, if any.
+
+    Redirects to the immutable object when the store is publicly reachable,
+    otherwise (local store without a base URL) serves its bytes directly.
     """
-    # Generate TSV
-    output = StringIO()
-    writer = csv.writer(output, delimiter="\t")
-
-    # Write header with "Rule Number" instead of "Rule #"
-    writer.writerow(
-        [
-            "Rule Number",
-            "Logic",
-            "Property Name",
-            "Predicate",
-            "Value",
-            "Report Severity",
-            "Message",
-        ]
-    )
-
-    # Write rules
-    rule_number = 1
-    for rule in rules:
-        # Get all conditions for this rule
-        conditions = rule.get("conditions", [])
-
-        # Skip empty rules
-        if not conditions:
-            continue
-
-        # For each condition except the last one
-        for i, condition in enumerate(conditions[:-1]):
-            row = []
-
-            # Only include rule number on first row
-            if i == 0:
-                row.append(str(rule_number))  # Rule number
-            else:
-                row.append("")  # Empty rule number for middle conditions
-
-            row.append(condition.get("logic", ""))  # Logic
-            row.append(condition.get("propertyName", ""))  # Property Path
-            row.append(condition.get("predicate", ""))  # Predicate
-            row.append(condition.get("value", ""))  # Value
-            row.append("")  # Empty severity for non-last conditions
-            row.append("")  # Empty message for non-last conditions
-
-            writer.writerow(row)
-
-        # For the last condition, include severity and message
-        if conditions:
-            last_condition = conditions[-1]
-            row = []
-
-            # Only include rule number on first row if there was only one condition
-            if len(conditions) == 1:
-                row.append(str(rule_number))  # Rule number
-            else:
-                row.append(
-                    ""
-                )  # Empty rule number for last condition if not the only condition
-
-            row.append(last_condition.get("logic", ""))  # Logic
-            row.append(last_condition.get("propertyName", ""))  # Property Path
-            row.append(last_condition.get("predicate", ""))  # Predicate
-            row.append(last_condition.get("value", ""))  # Value
-            row.append(rule.get("severity", "Error"))  # Severity on last row
-            row.append(rule.get("message", ""))  # Message on last row
-
-            writer.writerow(row)
-
-        rule_number += 1
-
-    # Create filename based on ruleset name
-    filename = f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
-
-    return output.getvalue(), filename
+    path = ruleset.get("publishedPath")
+    if not path:
+        return None
+
+    try:
+        store = get_publish_store()
+        url = ruleset.get("publishedUrl") or store.public_url(path)
+        if url:
+            return https_fn.Response(
+                "",
+                status=302,
+                headers={"Location": url, "Cache-Control": POINTER_CACHE_CONTROL},
+            )
+
+        filename = path.rsplit("/", 1)[-1]
+        return https_fn.Response(
+            store.read(path),
+            mimetype="text/tab-separated-values",
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Cache-Control": POINTER_CACHE_CONTROL,
+            },
+        )
+    except Exception as e:
+        print(f"Published copy unavailable ({str(e)}), rendering instead.")
+        return None
@@ -0,0 +1,212 @@
+"""
+Content-addressed, immutable snapshots of ruleset content.
+
+Every save reduces the ruleset to its canonical content (name, description
+and the rules in order, without IDs or timestamps) and stores it once under
+the SHA-256 of that content in ``ruleSetSnapshots/{hash}``. The live ruleset
+records the hash of its current snapshot in ``snapshotHash``.
+
+A snapshot never changes once written, so ``/api/snapshots/{hash}`` can be
+cached forever. Identical content saved twice, or by two rulesets, maps to
+the same snapshot, which records the IDs of the rulesets that saved it.
+
+The hash is not a secret: it is derived from the content and every ruleset
+is snapshotted. A snapshot is therefore only served to anyone, and cached
+publicly, while one of its rulesets is shared; otherwise only the owner of
+one of its rulesets can read it, with private caching.
+"""
+
+import hashlib
+import json
+import re
+
+from firebase_functions import https_fn
+
+from ..utils.firestore_utils import (
+    create_ruleset_snapshot,
+    get_rules_for_ruleset,
+    get_ruleset,
+    get_ruleset_snapshot,
+    safe_verify_id_token,
+    set_ruleset_snapshot,
+    stream_snapshot_rules,
+)
+from .ruleset_export import ruleset_download_response
+from .ruleset_publish import IMMUTABLE_CACHE_CONTROL
+
+# Snapshots read by their owner stay out of shared caches
+PRIVATE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+DEFAULT_SEVERITY = "Error"
+
+CONDITION_FIELDS = ("logic", "propertyName", "predicate", "value")
+
+SNAPSHOT_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def canonical_rule(rule):
+    """Return the content of a rule that a snapshot preserves."""
+    return {
+        "severity": rule.get("severity") or DEFAULT_SEVERITY,
+        "message": rule.get("message") or "",
+        "conditions": [
+            {field: condition.get(field, "") for field in CONDITION_FIELDS}
+            for condition in rule.get("conditions", [])
+        ],
+    }
+
+
+def canonical_ruleset_content(ruleset, rules):
+    """
+    Reduce a ruleset to the content its snapshot hash covers.
+
+    Args:
+        ruleset (dict): Ruleset document
+        rules (iterable): Rule documents in order
+
+    Returns:
+        dict: {"name", "description", "rules"}, with empty rules skipped as
+        in every export
+    """
+    return {
+        "name": ruleset.get("name", ""),
+        "description": ruleset.get("description", ""),
+        "rules": [canonical_rule(rule) for rule in rules if rule.get("conditions")],
+    }
+
+
+def snapshot_hash(content):
+    """Return the SHA-256 of canonical content serialized as sorted JSON."""
+    data = json.dumps(
+        content, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def snapshot_ruleset(ruleset_id, ruleset=None, rules=None):
+    """
+    Store a snapshot of a ruleset's current content and point the ruleset at it.
+
+    Failures are logged rather than raised so an edit never fails because the
+    snapshot did.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        ruleset (dict, optional): Already loaded ruleset document
+        rules (list, optional): Already loaded rule documents in order
+
+    Returns:
+        str: Snapshot hash, or None on failure
+    """
+    try:
+        if ruleset is None:
+            ruleset = get_ruleset(ruleset_id)
+        if not ruleset:
+            return None
+
+        if rules is None:
+            rules = get_rules_for_ruleset(ruleset_id)
+
+        content = canonical_ruleset_content(ruleset, rules)
+        content_hash = snapshot_hash(content)
+
+        create_ruleset_snapshot(
+            content_hash,
+            {"name": content["name"], "description": content["description"]},
+            content["rules"],
+            ruleset_id,
+        )
+
+        if content_hash != ruleset.get("snapshotHash"):
+            set_ruleset_snapshot(ruleset_id, content_hash)
+
+        return content_hash
+    except Exception as e:
+        print(f"Error snapshotting ruleset {ruleset_id}: {str(e)}")
+        return None
+
+
+def _requesting_user(request):
+    """Return the ID of the user whose token the request carries, if any."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    try:
+        return safe_verify_id_token(auth_header.split("Bearer ")[1])["uid"]
+    except Exception as e:
+        print(f"Ignoring invalid token on snapshot request: {str(e)}")
+        return None
+
+
+def snapshot_cache_control(snapshot, user_id):
+    """
+    Decide who may read a snapshot, from the rulesets that saved it.
+
+    Args:
+        snapshot (dict): Snapshot document
+        user_id (str): Requesting user, or None when anonymous
+
+    Returns:
+        str: Cache-Control for the response, public while one of the
+        rulesets is shared and private for its owner, or None if the
+        snapshot may not be read
+    """
+    owned = False
+    for ruleset_id in snapshot.get("rulesetIds") or []:
+        ruleset = get_ruleset(ruleset_id)
+        if not ruleset:
+            continue
+        if ruleset.get("isShared", False):
+            return IMMUTABLE_CACHE_CONTROL
+        if user_id and ruleset.get("userId") == user_id:
+            owned = True
+    return PRIVATE_CACHE_CONTROL if owned else None
+
+
+def get_snapshot_view(request, content_hash):
+    """
+    Serve a ruleset snapshot by hash, as TSV or in the format given by ?format=.
+
+    Snapshots of shared rulesets are public; others need the owner's token
+    and are answered as not found otherwise, so a guessed hash reveals
+    nothing. The response is marked immutable and carries the hash as its
+    ETag.
+    """
+    try:
+        not_found = https_fn.Response(
+            "Snapshot not found", mimetype="text/plain", status=404
+        )
+        if not content_hash or not SNAPSHOT_HASH_PATTERN.fullmatch(content_hash):
+            return not_found
+
+        snapshot = get_ruleset_snapshot(content_hash)
+        if not snapshot:
+            return not_found
+
+        cache_control = snapshot_cache_control(snapshot, _requesting_user(request))
+        if not cache_control:
+            return not_found
+
+        etag = f'"{content_hash}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if cache_control == PRIVATE_CACHE_CONTROL:
+            # The same URL answers differently per user
+            headers["Vary"] = "Authorization"
+        if request.headers.get("If-None-Match") in (etag, content_hash):
+            return https_fn.Response(status=304, headers=headers)
+
+        format_name = request.args.get("format", "tsv").lower()
+        return ruleset_download_response(
+            snapshot,
+            stream_snapshot_rules(content_hash),
+            format_name,
+            headers=headers,
+        )
+
+    except Exception as e:
+        print(f"Error serving snapshot {content_hash}: {str(e)}")
+        return https_fn.Response(
+            f"Error serving snapshot: {str(e)}",
+            mimetype="text/plain",
+            status=500,
+        )
@@ -10,6 +10,18 @@ from google.cloud import firestore
 # Verify challenge exists and hasn't been used
 db = firestore.Client()
 
+# Number of rule documents read per query when streaming a ruleset
+RULES_PAGE_SIZE = 500
+
+# Firestore allows at most 500 writes in one batch
+WRITE_BATCH_SIZE = 500
+
+# Immutable, content-addressed copies of ruleset content
+SNAPSHOTS_COLLECTION = "ruleSetSnapshots"
+
+# Rules stored per snapshot part document, well under the 1 MiB document limit
+SNAPSHOT_PART_SIZE = 500
+
 
 def get_rulesets_for_project(user_id, project_id):
     """
@@ -226,6 +238,166 @@ def toggle_ruleset_sharing(ruleset_id):
     return is_shared
 
 
+def set_ruleset_publication(ruleset_id, publication):
+    """
+    Record where the current published copy of a ruleset lives.
+
+    Deliberately leaves updatedAt alone: publishing is a side effect of an
+    edit, not an edit itself.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        publication (dict): Publication details, or None to clear them
+
+    Returns:
+        bool: Success status
+    """
+
+    if publication:
+        update_data = {
+            "publishedHash": publication["hash"],
+            "publishedPath": publication["path"],
+            "publishedUrl": publication["url"],
+            "publishedAt": firestore.SERVER_TIMESTAMP,
+        }
+    else:
+        update_data = {
+            "publishedHash": firestore.DELETE_FIELD,
+            "publishedPath": firestore.DELETE_FIELD,
+            "publishedUrl": firestore.DELETE_FIELD,
+            "publishedAt": firestore.DELETE_FIELD,
+        }
+
+    db.collection("ruleSets").document(ruleset_id).update(update_data)
+
+    return True
+
+
+def set_ruleset_snapshot(ruleset_id, content_hash):
+    """
+    Point a ruleset at its current content snapshot.
+
+    Like set_ruleset_publication this leaves updatedAt alone.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        content_hash (str): Snapshot hash
+
+    Returns:
+        bool: Success status
+    """
+
+    db.collection("ruleSets").document(ruleset_id).update(
+        {"snapshotHash": content_hash}
+    )
+
+    return True
+
+
+def create_ruleset_snapshot(
+    content_hash, header, rules, ruleset_id, part_size=SNAPSHOT_PART_SIZE
+):
+    """
+    Store an immutable snapshot of ruleset content under its hash.
+
+    Rules are split over a "parts" subcollection so large rulesets stay under
+    Firestore's document size limit. The snapshot document itself is written
+    last, so a reader that finds it also finds every part. Existing snapshots
+    are never rewritten; they only gain the IDs of further rulesets that
+    saved the same content, which decide who may read them.
+
+    Args:
+        content_hash (str): Hash of the canonical content
+        header (dict): Ruleset name and description
+        rules (list): Canonical rule dictionaries in order
+        ruleset_id (str): ID of the ruleset being snapshotted
+        part_size (int): Rules stored per part document
+
+    Returns:
+        bool: True if the snapshot was written, False if it already existed
+    """
+
+    # Only rules with conditions are served, so only those are stored and counted
+    rules = [rule for rule in rules if rule.get("conditions")]
+
+    snapshot_ref = db.collection(SNAPSHOTS_COLLECTION).document(content_hash)
+    existing = snapshot_ref.get()
+    if existing.exists:
+        if ruleset_id not in (existing.to_dict().get("rulesetIds") or []):
+            snapshot_ref.update({"rulesetIds": firestore.ArrayUnion([ruleset_id])})
+        return False
+
+    parts = [rules[i : i + part_size] for i in range(0, len(rules), part_size)]
+
+    batch = db.batch()
+    pending = 0
+    for index, part in enumerate(parts):
+        batch.set(
+            snapshot_ref.collection("parts").document(f"{index:05d}"),
+            {"rules": part},
+        )
+        pending += 1
+        if pending == WRITE_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    batch.set(
+        snapshot_ref,
+        {
+            **header,
+            "rulesetIds": [ruleset_id],
+            "ruleCount": len(rules),
+            "partCount": len(parts),
+            "createdAt": firestore.SERVER_TIMESTAMP,
+        },
+    )
+    batch.commit()
+
+    return True
+
+
+def get_ruleset_snapshot(content_hash):
+    """
+    Get the header of a ruleset snapshot.
+
+    Args:
+        content_hash (str): Snapshot hash
+
+    Returns:
+        dict: Snapshot document with ID, or None if not found
+    """
+
+    doc = db.collection(SNAPSHOTS_COLLECTION).document(content_hash).get()
+    if not doc.exists:
+        return None
+
+    snapshot = doc.to_dict()
+    snapshot["id"] = doc.id
+    return snapshot
+
+
+def stream_snapshot_rules(content_hash):
+    """
+    Yield the rules of a snapshot in order, one part at a time.
+
+    Args:
+        content_hash (str): Snapshot hash
+
+    Yields:
+        dict: Rule dictionaries
+    """
+
+    parts_ref = (
+        db.collection(SNAPSHOTS_COLLECTION)
+        .document(content_hash)
+        .collection("parts")
+        .order_by("__name__")
+    )
+    for doc in parts_ref.stream():
+        yield from doc.to_dict().get("rules", [])
+
+
 def get_shared_ruleset(ruleset_id):
     """
     Get a shared ruleset by ID, if it's shared.
@@ -270,6 +442,45 @@ def get_rules_for_ruleset(ruleset_id):
     return rules
 
 
+def stream_rules_for_ruleset(ruleset_id, page_size=RULES_PAGE_SIZE):
+    """
+    Lazily yield all rules for a ruleset, reading them a page at a time.
+
+    Unlike get_rules_for_ruleset this never holds more than one page in
+    memory, which keeps TSV downloads of very large rulesets flat.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        page_size (int): Number of rule documents fetched per query
+
+    Yields:
+        dict: Rule documents with IDs, in order
+    """
+
+    query = (
+        db.collection("ruleSets")
+        .document(ruleset_id)
+        .collection("rules")
+        .order_by("order")
+        .limit(page_size)
+    )
+
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        page = page_query.get()
+
+        for doc in page:
+            rule = doc.to_dict()
+            rule["id"] = doc.id
+            yield rule
+
+        if len(page) < page_size:
+            return
+
+        last_doc = page[-1]
+
+
 def create_rule(ruleset_id, user_id, rule_data):
     """
     Create a new rule in a ruleset.
@@ -314,6 +525,73 @@ def create_rule(ruleset_id, user_id, rule_data):
     return result
 
 
+def import_rules(ruleset_id, user_id, rules, replace=False):
+    """
+    Write many rules to a ruleset using chunked batch writes.
+
+    Args:
+        ruleset_id (str): Ruleset ID
+        user_id (str): User ID
+        rules (list): Rule data including message, severity, and conditions
+        replace (bool): Delete the existing rules first instead of appending
+
+    Returns:
+        int: Number of rules written
+    """
+
+    rules_ref = db.collection("ruleSets").document(ruleset_id).collection("rules")
+
+    if replace:
+        batch = db.batch()
+        pending = 0
+        for doc_ref in rules_ref.list_documents(page_size=WRITE_BATCH_SIZE):
+            batch.delete(doc_ref)
+            pending += 1
+            if pending == WRITE_BATCH_SIZE:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+        next_order = 0
+    else:
+        # Count without reading the existing rules
+        next_order = rules_ref.count().get()[0][0].value
+
+    batch = db.batch()
+    pending = 0
+    written = 0
+    for rule_data in rules:
+        batch.set(
+            rules_ref.document(),
+            {
+                "message": rule_data.get("message"),
+                "severity": rule_data.get("severity"),
+                "conditions": rule_data.get("conditions", []),
+                "rulesetId": ruleset_id,
+                "userId": user_id,
+                "createdAt": firestore.SERVER_TIMESTAMP,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+                "order": next_order + written,
+            },
+        )
+        pending += 1
+        written += 1
+        if pending == WRITE_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    db.collection("ruleSets").document(ruleset_id).update(
+        {"updatedAt": firestore.SERVER_TIMESTAMP}
+    )
+
+    return written
+
+
 def get_rule(ruleset_id, rule_id):
     """
     Get a rule by ID.
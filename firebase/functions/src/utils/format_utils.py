@@ -0,0 +1,245 @@
+"""
+Machine-readable ruleset formats shared by both backends.
+
+This file is kept byte-identical in cloudrun/backend/services/format_service.py
+and firebase/functions/src/utils/format_utils.py (cloudrun/backend/tests enforce
+it). Every format carries the same rule model as the TSV export, numbered the
+same way, but with one record per rule and condition values already parsed:
+numbers for "greater than" and "less than", "in range" as {"min", "max"} and
+"in list" as a list. "equal to" and "not equal to" keep the text they were
+stored with, and a list item only becomes a number when the number reads back
+as the same text, so an ID like "007" is never turned into 7.
+
+Streams are a ruleset header followed by one record per rule, so they can be
+produced straight from a paged Firestore read:
+
+- json: {"ruleset": {...}, "rules": [...]}
+- ndjson: the header on the first line, then one rule per line
+- msgpack: the header, then one rule, as consecutive MessagePack objects
+  (read them with msgpack.Unpacker)
+"""
+
+import json
+import math
+from typing import Dict, Iterable, Iterator, Optional
+
+import msgpack
+
+from .mapping import get_canonical_predicate
+
+# Rules are grouped into chunks of roughly this many bytes before being
+# handed to the response
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_SEVERITY = "Error"
+
+# Predicates whose value is irrelevant to the check
+VALUELESS_PREDICATES = {"exists", "is true", "is false"}
+
+# Predicates whose value is only meaningful as a number
+NUMERIC_PREDICATES = {"greater than", "less than"}
+
+RANGE_SEPARATOR = ","
+LIST_SEPARATOR = ","
+
+
+def parse_number(text):
+    """Return text as an int or float, or None if it is not a finite number."""
+    if not isinstance(text, str):
+        if isinstance(text, bool) or not isinstance(text, (int, float)):
+            return None
+        return text if math.isfinite(text) else None
+
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_condition_value(predicate, value):
+    """
+    Convert a stored condition value to the type its predicate works on.
+
+    Args:
+        predicate (str): Predicate as stored, symbolic (">") or canonical
+        value: Value as stored, normally a string
+
+    Returns:
+        None for predicates without a value, a number for "greater than" and
+        "less than" when the value parses as one, {"min", "max"} for "in
+        range", a list for "in list" (items that read back unchanged as
+        numbers are numbers) and the original value otherwise
+    """
+    predicate = get_canonical_predicate(predicate)
+
+    if predicate in VALUELESS_PREDICATES:
+        return None
+
+    if value is None:
+        return None
+
+    if predicate in NUMERIC_PREDICATES:
+        number = parse_number(value)
+        return value if number is None else number
+
+    if predicate == "in range":
+        bounds = str(value).split(RANGE_SEPARATOR)
+        if len(bounds) == 2:
+            low, high = parse_number(bounds[0]), parse_number(bounds[1])
+            if low is not None and high is not None:
+                return {"min": low, "max": high}
+        return value
+
+    if predicate == "in list":
+        items = []
+        for item in str(value).split(LIST_SEPARATOR):
+            item = item.strip()
+            if item:
+                # Leave items like "007" or "2.50" as written
+                number = parse_number(item)
+                typed = number is not None and str(number) == item
+                items.append(number if typed else item)
+        return items
+
+    return value
+
+
+def ruleset_header(ruleset: Dict) -> Dict:
+    """Return the ruleset fields that lead every machine-readable export."""
+    return {
+        "id": ruleset.get("id", ""),
+        "name": ruleset.get("name", ""),
+        "description": ruleset.get("description", ""),
+    }
+
+
+def iter_rule_records(rules: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Yield one typed record per rule, numbered as in the TSV export.
+
+    Args:
+        rules: Iterable of rule dictionaries
+
+    Yields:
+        dict: {"number", "severity", "message", "conditions"} where each
+        condition is {"logic", "property", "predicate", "value"}
+    """
+    number = 0
+    for rule in rules:
+        conditions = rule.get("conditions")
+
+        # Skip empty rules, as the TSV does
+        if not conditions:
+            continue
+
+        number += 1
+        yield {
+            "number": number,
+            "severity": rule.get("severity", DEFAULT_SEVERITY),
+            "message": rule.get("message", ""),
+            "conditions": [
+                {
+                    "logic": condition.get("logic", ""),
+                    "property": condition.get("propertyName", ""),
+                    "predicate": condition.get("predicate", ""),
+                    "value": parse_condition_value(
+                        condition.get("predicate", ""), condition.get("value")
+                    ),
+                }
+                for condition in conditions
+            ],
+        }
+
+
+def _dumps(record) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _chunked(pieces: Iterable, chunk_size: int, empty):
+    """Join consecutive pieces into chunks of at least chunk_size."""
+    chunk = []
+    size = 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield empty.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield empty.join(chunk)
+
+
+def iter_ruleset_json(
+    ruleset: Dict,
+    rules: Optional[Iterable[Dict]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Generate a single JSON document for a ruleset incrementally."""
+    if rules is None:
+        rules = ruleset.get("rules", [])
+
+    def pieces():
+        yield '{"ruleset":' + _dumps(ruleset_header(ruleset)) + ',"rules":['
+        separator = ""
+        for record in iter_rule_records(rules):
+            yield separator + _dumps(record)
+            separator = ","
+        yield "]}\n"
+
+    return _chunked(pieces(), chunk_size, "")
+
+
+def iter_ruleset_ndjson(
+    ruleset: Dict,
+    rules: Optional[Iterable[Dict]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Generate newline-delimited JSON for a ruleset incrementally."""
+    if rules is None:
+        rules = ruleset.get("rules", [])
+
+    def pieces():
+        yield _dumps(ruleset_header(ruleset)) + "\n"
+        for record in iter_rule_records(rules):
+            yield _dumps(record) + "\n"
+
+    return _chunked(pieces(), chunk_size, "")
+
+
+def iter_ruleset_msgpack(
+    ruleset: Dict,
+    rules: Optional[Iterable[Dict]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Generate a stream of MessagePack objects for a ruleset incrementally."""
+    if rules is None:
+        rules = ruleset.get("rules", [])
+
+    packer = msgpack.Packer(default=str)
+
+    def pieces():
+        yield packer.pack(ruleset_header(ruleset))
+        for record in iter_rule_records(rules):
+            yield packer.pack(record)
+
+    return _chunked(pieces(), chunk_size, b"")
+
+
+# format name -> (generator, media type, file extension)
+RULESET_FORMATS = {
+    "json": (iter_ruleset_json, "application/json", "json"),
+    "ndjson": (iter_ruleset_ndjson, "application/x-ndjson", "ndjson"),
+    "msgpack": (iter_ruleset_msgpack, "application/msgpack", "msgpack"),
+}
+
+
+def ruleset_format_filename(ruleset: Dict, extension: str) -> str:
+    """Return the download filename for a ruleset in the given format."""
+    return f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.{extension}"
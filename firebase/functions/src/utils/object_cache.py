@@ -0,0 +1,209 @@
+"""
+Persistent, content-addressed cache of Speckle objects.
+
+Speckle object IDs are hashes of the object's content, so a cached object
+never goes stale and successive versions of a model share most of theirs.
+Objects are kept in a SQLite database laid out like specklepy's
+SQLiteTransport (object ID -> serialized JSON), with two additions the
+transport lacks: a size and last-use time per object, so the cache can be
+held to a byte budget by evicting the least recently used objects, and a
+connection per thread in WAL mode, so the download workers and every
+process on the instance can read and write it concurrently.
+
+``SPECKLE_OBJECT_CACHE`` sets the database path and
+``SPECKLE_OBJECT_CACHE_BYTES`` the budget.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Evict down to this fraction of the budget, so eviction runs rarely
+EVICT_TO = 0.9
+
+# Check the total size after this many bytes have been written
+EVICT_CHECK_BYTES = 16 * 1024 * 1024
+
+# SQLite limits the number of bound parameters per statement
+QUERY_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects(
+    hash TEXT PRIMARY KEY,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_last_used ON objects(last_used);
+"""
+
+
+class ObjectCache:
+    """Disk-backed object store with size-based LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, object_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Return the cached objects among the given IDs, marking them used.
+
+        Args:
+            object_ids: Object IDs to look up
+
+        Returns:
+            dict: Object ID -> decoded object, for the IDs that were cached
+        """
+        object_ids = list(object_ids)
+        conn = self._connection()
+        found = {}
+        for i in range(0, len(object_ids), QUERY_BATCH_SIZE):
+            batch = object_ids[i : i + QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, content FROM objects WHERE hash IN ({placeholders})",
+                batch,
+            ).fetchall()
+            for object_id, content in rows:
+                found[object_id] = json.loads(content)
+
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "UPDATE objects SET last_used = ? WHERE hash = ?",
+                    [(now, object_id) for object_id in found],
+                )
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(object_ids) - len(found)
+        return found
+
+    def get(self, object_id: str) -> Optional[Dict]:
+        """Return one cached object, or None."""
+        return self.get_many([object_id]).get(object_id)
+
+    def put_many(self, objects: Iterable[Dict]):
+        """Store objects under their IDs; objects without an ID are ignored."""
+        now = time.time()
+        rows = []
+        for obj in objects:
+            object_id = obj.get("id")
+            if object_id:
+                content = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+                rows.append((object_id, content, len(content), now))
+        if not rows:
+            return
+
+        conn = self._connection()
+        with conn:
+            # Content never changes for an ID, so existing rows are kept
+            conn.executemany(
+                "INSERT OR IGNORE INTO objects(hash, content, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+        with self._lock:
+            self._written += sum(row[2] for row in rows)
+            check = self._written >= EVICT_CHECK_BYTES
+            if check:
+                self._written = 0
+        if check:
+            self.evict()
+
+    def size(self) -> int:
+        """Return the total size of the cached objects in bytes."""
+        row = self._connection().execute("SELECT SUM(size) FROM objects").fetchone()
+        return row[0] or 0
+
+    def evict(self) -> int:
+        """
+        Drop least recently used objects until the cache is within budget.
+
+        Returns:
+            int: Number of objects removed
+        """
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        excess = total - int(self.max_bytes * EVICT_TO)
+
+        conn = self._connection()
+        with conn:
+            # Walk the index from the oldest and stop as soon as enough is freed
+            rows = conn.execute("SELECT hash, size FROM objects ORDER BY last_used")
+            doomed: List[str] = []
+            for object_id, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append(object_id)
+                excess -= size
+            for i in range(0, len(doomed), QUERY_BATCH_SIZE):
+                batch = doomed[i : i + QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(
+                    f"DELETE FROM objects WHERE hash IN ({placeholders})", batch
+                )
+        return len(doomed)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_cache = None
+
+
+def get_object_cache() -> Optional[ObjectCache]:
+    """
+    Return the process-wide object cache, or None if it cannot be opened.
+
+    The cache is an optimisation only; a failure to open it is logged and
+    downloads go straight to the server.
+    """
+    global _cache
+    if _cache is None:
+        path = os.environ.get(
+            "SPECKLE_OBJECT_CACHE",
+            os.path.join(tempfile.gettempdir(), "model-checker", "objects.sqlite3"),
+        )
+        max_bytes = int(
+            os.environ.get("SPECKLE_OBJECT_CACHE_BYTES", DEFAULT_MAX_BYTES)
+        )
+        try:
+            _cache = ObjectCache(path, max_bytes)
+        except sqlite3.Error as e:
+            print(f"Object cache unavailable at {path}: {str(e)}")
+            return None
+    return _cache
@@ -0,0 +1,59 @@
+from functools import wraps
+
+from .compression_utils import (
+    MIN_COMPRESS_SIZE,
+    add_vary,
+    compress_bytes,
+    compress_chunks,
+    is_compressible,
+    negotiate_encoding,
+)
+
+
+def compress_response(request, response):
+    """
+    Compress a response body if the client accepts it and it is worth it.
+
+    Streamed bodies (generators, as used by the TSV and ZIP downloads) are
+    compressed chunk by chunk; buffered bodies only above MIN_COMPRESS_SIZE.
+
+    Args:
+        request: The incoming request
+        response: The https_fn.Response produced for it
+
+    Returns:
+        The same response, compressed in place when applicable
+    """
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if (
+        encoding is None
+        or "Content-Encoding" in response.headers
+        or response.status_code in (204, 304)
+        or not is_compressible(response.content_type)
+    ):
+        return response
+
+    if response.is_streamed:
+        response.response = compress_chunks(
+            response.response, encoding, response.content_type
+        )
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding, response.content_type))
+
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = add_vary(response.headers.get("Vary"))
+    return response
+
+
+def compressed(handler):
+    """Decorate a Functions request handler so its response is compressed."""
+
+    @wraps(handler)
+    def wrapper(req):
+        return compress_response(req, handler(req))
+
+    return wrapper
@@ -1,9 +1,120 @@
-import requests
+import json
 import logging
-from typing import Dict, List, Optional
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .object_cache import get_object_cache
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from the response at a time when streaming objects
+OBJECT_STREAM_CHUNK_SIZE = 256 * 1024
+
+# Largest single object we will buffer while streaming. The body is never
+# held in full, so this bounds the JSON in memory at any time.
+MAX_OBJECT_BYTES = int(os.environ.get("SPECKLE_MAX_OBJECT_BYTES", 64 * 1024 * 1024))
+
+
+# Closure downloads: object IDs per getobjects request, parallel requests,
+# and batches allowed in flight or waiting to be consumed
+CLOSURE_BATCH_SIZE = 2000
+CLOSURE_WORKERS = 4
+CLOSURE_MAX_PENDING = CLOSURE_WORKERS * 2
+
+# Attempts per batch before a download gives up, with exponential backoff
+CLOSURE_RETRIES = 3
+CLOSURE_RETRY_DELAY = 0.5
+
+# Responses worth retrying; anything else is a real error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Missing object IDs quoted in an incomplete closure error
+MISSING_IDS_SHOWN = 10
+
+
+class ObjectTooLargeError(ValueError):
+    """A streamed object is larger than the configured ceiling."""
+
+
+class IncompleteClosureError(ValueError):
+    """The server did not return every object of a version's closure."""
+
+    def __init__(self, missing: List[str]):
+        self.missing = missing
+        shown = ", ".join(missing[:MISSING_IDS_SHOWN])
+        more = len(missing) - MISSING_IDS_SHOWN
+        if more > 0:
+            shown += f" and {more} more"
+        super().__init__(f"Server did not return {len(missing)} objects: {shown}")
+
+
+def iter_object_lines(
+    chunks: Iterable[bytes], max_object_bytes: int = MAX_OBJECT_BYTES
+) -> Iterator[Dict]:
+    """
+    Parse Speckle's line-delimited object format incrementally.
+
+    Speckle serves objects as text, one ``{id}\t{json}`` line per object.
+    Chunks are split into lines as they arrive and each object is decoded and
+    yielded before the next is read, so only one object (plus one chunk) is
+    buffered at a time.
+
+    Args:
+        chunks: Response body as an iterable of byte chunks
+        max_object_bytes: Largest object allowed before giving up
+
+    Yields:
+        dict: Decoded objects in the order served
+
+    Raises:
+        ObjectTooLargeError: If one object exceeds max_object_bytes
+    """
+    # Pieces of the current, unfinished line; only new bytes are scanned
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            pending.append(chunk[start:end])
+            obj = _parse_object_line(b"".join(pending))
+            pending = []
+            pending_size = 0
+            if obj is not None:
+                yield obj
+            start = end + 1
+            end = chunk.find(b"\n", start)
+
+        if start < len(chunk):
+            pending.append(chunk[start:])
+            pending_size += len(chunk) - start
+            if pending_size > max_object_bytes:
+                raise ObjectTooLargeError(
+                    f"Object larger than {max_object_bytes} bytes in stream"
+                )
+
+    obj = _parse_object_line(b"".join(pending))
+    if obj is not None:
+        yield obj
+
+
+def _parse_object_line(line: bytes) -> Optional[Dict]:
+    line = line.strip()
+    if not line:
+        return None
+    # Lines are "{id}\t{json}"; tolerate bare JSON too
+    if not line.startswith(b"{"):
+        line = line.partition(b"\t")[2]
+    return json.loads(line)
+
 
 class SpeckleAPI:
     """
@@ -115,27 +226,91 @@ class SpeckleAPI:
         data = self.run_graphql_query(project_query, variables)
         return data["project"]
 
-    def get_model_versions(self, model_id: str) -> List[Dict]:
+    def get_model_versions(
+        self, project_id: str, model_id: str, limit: int = 25
+    ) -> List[Dict]:
+        """
+        Return the newest versions of a model, newest first.
+
+        Returns:
+            list: Versions with ``id``, ``referencedObject``, ``message``,
+            ``createdAt`` and ``author``
+        """
         versions_query = """
-        query GetModelVersions($modelId: String!) {
-            model(id: $modelId) {
-                versions {
-                    items {
-                        id
-                        message
-                        createdAt
-                        author {
+        query GetModelVersions($projectId: String!, $modelId: String!, $limit: Int!) {
+            project(id: $projectId) {
+                model(id: $modelId) {
+                    versions(limit: $limit) {
+                        items {
                             id
-                            name
+                            referencedObject
+                            message
+                            createdAt
+                            author {
+                                id
+                                name
+                            }
                         }
                     }
                 }
             }
         }
         """
-        variables = {"modelId": model_id}
+        variables = {"projectId": project_id, "modelId": model_id, "limit": limit}
         data = self.run_graphql_query(versions_query, variables)
-        return data["model"]["versions"]["items"]
+        return data["project"]["model"]["versions"]["items"]
+
+    def get_latest_version(
+        self, project_id: str, model_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Return the newest version of a model, or of any model in the project.
+
+        Returns:
+            dict: ``id``, ``referencedObject``, ``createdAt`` and ``modelId``,
+            or None if there are no versions
+        """
+        versions_fragment = """
+            id
+            name
+            versions(limit: 1) {
+                items {
+                    id
+                    referencedObject
+                    createdAt
+                }
+            }
+        """
+        if model_id:
+            query = f"""
+            query LatestModelVersion($projectId: String!, $modelId: String!) {{
+                project(id: $projectId) {{
+                    model(id: $modelId) {{ {versions_fragment} }}
+                }}
+            }}
+            """
+            variables = {"projectId": project_id, "modelId": model_id}
+            data = self.run_graphql_query(query, variables)
+            models = [data["project"]["model"]]
+        else:
+            query = f"""
+            query LatestProjectVersion($projectId: String!) {{
+                project(id: $projectId) {{
+                    models(limit: 100) {{
+                        items {{ {versions_fragment} }}
+                    }}
+                }}
+            }}
+            """
+            data = self.run_graphql_query(query, {"projectId": project_id})
+            models = data["project"]["models"]["items"]
+
+        latest = None
+        for model in models:
+            for version in model["versions"]["items"]:
+                if latest is None or version["createdAt"] > latest["createdAt"]:
+                    latest = {**version, "modelId": model["id"]}
+        return latest
 
     def create_comment(self, stream_id: str, object_id: str, message: str) -> Dict:
         mutation = """
@@ -172,20 +347,211 @@ class SpeckleAPI:
         data = self.run_graphql_query(search_query, variables)
         return data["stream"]["objectSearch"]
 
-    def get_version_objects(self, stream_id: str, object_id: str) -> Dict:
+    def download_version_objects(
+        self, stream_id: str, object_id: str, **options
+    ) -> Iterator[Dict]:
         """
-        This replaces the operations.receive() call by doing a GET to the `/objects/{streamId}/{objectId}` endpoint.
+        Download a version's objects in parallel batches, streaming them out.
+
+        Options are passed to ClosureDownloader (batch_size, workers, ...);
+        the shared object cache is used unless ``cache`` is given.
         """
-        url = f"{self.host}/api/streams/{stream_id}/objects/{object_id}"
-        try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(
-                f"Error fetching version objects for stream {stream_id} object {object_id}: {str(e)}"
+        if "cache" not in options:
+            options["cache"] = get_object_cache()
+        with ClosureDownloader(self, stream_id, **options) as downloader:
+            yield from downloader.iter_objects(object_id)
+
+
+class ClosureDownloader:
+    """
+    Download a version's objects in parallel batches over pooled connections.
+
+    The root object is fetched on its own; its ``__closure`` table lists every
+    descendant, which is then requested through ``/api/getobjects`` in
+    batches of ``batch_size`` IDs by ``workers`` threads sharing one
+    keep-alive connection pool. Parents come before children (the closure is
+    ordered by depth) and batches are yielded in order.
+
+    At most ``max_pending`` batches are requested or waiting to be consumed,
+    so a slow consumer stops the download instead of buffering the model.
+    Failed batches are retried with backoff, and so are IDs the server leaves
+    out of a response; if any are still missing after the last attempt the
+    download raises IncompleteClosureError rather than yield a partial model.
+    Objects already yielded are recorded in ``completed``; iterating again
+    after an error resumes with only the objects that are still missing.
+
+    With a ``cache`` (an ObjectCache) every object is looked up there first
+    and only the misses are requested, then stored. Object IDs are content
+    hashes, so a new version of a model only downloads what changed.
+    """
+
+    def __init__(
+        self,
+        api: "SpeckleAPI",
+        stream_id: str,
+        batch_size: int = CLOSURE_BATCH_SIZE,
+        workers: int = CLOSURE_WORKERS,
+        max_pending: int = CLOSURE_MAX_PENDING,
+        max_object_bytes: int = MAX_OBJECT_BYTES,
+        cache=None,
+    ):
+        self.api = api
+        self.cache = cache
+        self.downloaded = 0
+        self.stream_id = stream_id
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.max_object_bytes = max_object_bytes
+        self.completed = set()
+        self.requests_made = 0
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(api.headers)
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method, url, **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures with backoff."""
+        for attempt in range(CLOSURE_RETRIES):
+            with self._lock:
+                self.requests_made += 1
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == CLOSURE_RETRIES - 1:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                if attempt == CLOSURE_RETRIES - 1:
+                    response.raise_for_status()
+                response.close()
+            time.sleep(CLOSURE_RETRY_DELAY * 2**attempt)
+
+    def fetch_root(self, object_id: str) -> Dict:
+        """Fetch a single object without its children."""
+        if self.cache is not None:
+            cached = self.cache.get(object_id)
+            if cached is not None:
+                return cached
+
+        url = f"{self.api.host}/objects/{self.stream_id}/{object_id}/single"
+        root = self._request("GET", url).json()
+        self._record_downloads([root])
+        return root
+
+    def fetch_batch(self, object_ids: List[str]) -> List[Dict]:
+        """
+        Fetch a batch of objects by ID, from the cache where possible.
+
+        Raises:
+            IncompleteClosureError: If the server still leaves some of the
+                IDs out after every retry
+        """
+        found = self.cache.get_many(object_ids) if self.cache is not None else {}
+        missing = [object_id for object_id in object_ids if object_id not in found]
+
+        for attempt in range(CLOSURE_RETRIES):
+            if not missing:
+                break
+            if attempt:
+                time.sleep(CLOSURE_RETRY_DELAY * 2**attempt)
+            fetched = self._download(missing)
+            self._record_downloads(fetched)
+            for obj in fetched:
+                found[obj.get("id")] = obj
+            missing = [object_id for object_id in missing if object_id not in found]
+
+        if missing:
+            raise IncompleteClosureError(missing)
+        return [found[object_id] for object_id in object_ids]
+
+    def _download(self, object_ids: List[str]) -> List[Dict]:
+        """Request objects from /api/getobjects, as many as the server returns."""
+        url = f"{self.api.host}/api/getobjects/{self.stream_id}"
+        response = self._request(
+            "POST",
+            url,
+            data={"objects": json.dumps(object_ids)},
+            headers={"Accept": "text/plain"},
+            stream=True,
+        )
+        with response:
+            return list(
+                iter_object_lines(
+                    response.iter_content(OBJECT_STREAM_CHUNK_SIZE),
+                    self.max_object_bytes,
+                )
             )
-            raise
+
+    def _record_downloads(self, objects: List[Dict]):
+        with self._lock:
+            self.downloaded += len(objects)
+        if self.cache is not None:
+            self.cache.put_many(objects)
+
+    def missing_ids(self, root: Dict) -> List[str]:
+        """Return the closure IDs not yet downloaded, shallowest first."""
+        closure = root.get("__closure") or {}
+        return [
+            object_id
+            for object_id, _ in sorted(closure.items(), key=lambda item: item[1])
+            if object_id not in self.completed
+        ]
+
+    def iter_objects(
+        self, object_id: str, root: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """
+        Yield the root object and then every object in its closure.
+
+        Args:
+            object_id: Root object ID of the version
+            root: The root object, if already fetched
+
+        Yields:
+            dict: Objects not yielded by an earlier, interrupted iteration
+        """
+        if root is None:
+            root = self.fetch_root(object_id)
+        if object_id not in self.completed:
+            self.completed.add(object_id)
+            yield root
+
+        ids = self.missing_ids(root)
+        batches = (
+            ids[i : i + self.batch_size] for i in range(0, len(ids), self.batch_size)
+        )
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                for batch in batches:
+                    pending.append(pool.submit(self.fetch_batch, batch))
+                    if len(pending) >= self.max_pending:
+                        yield from self._take(pending.popleft())
+                while pending:
+                    yield from self._take(pending.popleft())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _take(self, future) -> Iterator[Dict]:
+        for obj in future.result():
+            if obj.get("id") not in self.completed:
+                self.completed.add(obj.get("id"))
+                yield obj
 
 
 # Helper functions to instantiate and use easily:
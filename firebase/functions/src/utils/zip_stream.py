@@ -0,0 +1,75 @@
+"""
+Write ZIP archives straight into a response body.
+
+zipfile normally seeks back to patch each entry's header once its size is
+known. Given an output that cannot tell() or seek() it instead appends a data
+descriptor after every entry, which is what lets the archive be yielded piece
+by piece without ever holding it whole.
+"""
+
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+# Deflate level used for every entry; 6 is zlib's default speed/size balance
+COMPRESS_LEVEL = 6
+
+
+class _StreamOutput:
+    """Write-only sink that zipfile fills and the generator drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(
+    entries: Iterable[Tuple[str, Iterable]],
+    compress_level: int = COMPRESS_LEVEL,
+) -> Iterator[bytes]:
+    """Generate a ZIP archive incrementally.
+
+    Entries are consumed lazily and each one's content is compressed as it
+    arrives, so only the current chunk and zlib's window are held in memory.
+
+    Args:
+        entries: Iterable of (archive_name, content) pairs where content is an
+            iterable of str or bytes chunks; str is encoded as UTF-8
+        compress_level: Deflate level passed to zipfile
+
+    Yields:
+        Consecutive pieces of the archive
+    """
+    output = _StreamOutput()
+
+    with zipfile.ZipFile(
+        output, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compress_level
+    ) as archive:
+        for name, content in entries:
+            # force_zip64 because the size is unknown when the header is written
+            with archive.open(name, "w", force_zip64=True) as entry:
+                for chunk in content:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode("utf-8")
+                    entry.write(chunk)
+
+                    data = output.drain()
+                    if data:
+                        yield data
+
+            data = output.drain()
+            if data:
+                yield data
+
+    # Central directory written on close
+    yield output.drain()
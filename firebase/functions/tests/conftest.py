@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Add the functions directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Route modules create a Firestore client on import; point it at the emulator
+# so they import without credentials (tests never reach Firestore)
+os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "localhost:8080")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "demo-test")
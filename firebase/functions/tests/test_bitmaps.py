@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from src.evaluation import bitmaps
+from src.evaluation.bitmaps import RowBitmap
+
+ROWS = 200_000
+
+
+def random_mask(density, seed):
+    return np.random.default_rng(seed).random(ROWS) < density
+
+
+@pytest.mark.parametrize("density", [0.0, 0.0005, 0.02, 0.3, 1.0])
+def test_masks_round_trip_through_every_form(density):
+    """Test masks survive compressing, listing and serializing"""
+    mask = random_mask(density, 1)
+
+    bitmap = RowBitmap.from_mask(mask)
+    restored, end = RowBitmap.deserialize(bitmap.serialize())
+
+    assert len(bitmap) == np.count_nonzero(mask)
+    assert np.array_equal(bitmap.to_mask(ROWS), mask)
+    assert np.array_equal(bitmap.to_rows(), np.flatnonzero(mask))
+    assert RowBitmap.from_rows(np.flatnonzero(mask)) == bitmap
+    assert restored == bitmap and end == len(bitmap.serialize())
+
+
+@pytest.mark.parametrize("densities", [(0.0005, 0.3), (0.3, 0.6), (0.001, 0.03)])
+def test_set_algebra_matches_boolean_masks(densities):
+    """Test AND, OR and ANDNOT across array and bitmap chunks"""
+    a_mask = random_mask(densities[0], 2)
+    b_mask = random_mask(densities[1], 3)
+    a = RowBitmap.from_mask(a_mask)
+    b = RowBitmap.from_mask(b_mask)
+
+    for x, y, x_mask, y_mask in ((a, b, a_mask, b_mask), (b, a, b_mask, a_mask)):
+        assert np.array_equal((x & y).to_mask(ROWS), x_mask & y_mask)
+        assert np.array_equal((x | y).to_mask(ROWS), x_mask | y_mask)
+        assert np.array_equal((x - y).to_mask(ROWS), x_mask & ~y_mask)
+
+
+def test_sparse_results_are_small():
+    """Test few rows take a few bytes and dense ones no more than a bitmap"""
+    sparse = RowBitmap.from_rows([5, 70_000, 199_999])
+    dense = RowBitmap.from_mask(random_mask(0.5, 4))
+
+    assert len(sparse.serialize()) < 40
+    assert 70_000 in sparse and 70_001 not in sparse
+    assert dense.nbytes <= (ROWS + 65_535) // 65_536 * 8192
+
+
+def test_several_bitmaps_serialize_back_to_back():
+    """Test dumps/loads and base64 for transport, and rejected garbage"""
+    pair = [RowBitmap.from_rows([1, 2, 3]), RowBitmap.from_mask(random_mask(0.3, 5))]
+
+    assert bitmaps.loads(bitmaps.dumps(pair)) == pair
+    assert bitmaps.from_base64(bitmaps.to_base64(pair[0])) == pair[0]
+    with pytest.raises(ValueError):
+        bitmaps.loads(bitmaps.dumps(pair)[:-10])
+    with pytest.raises(ValueError):
+        bitmaps.loads(b"not a bitmap")
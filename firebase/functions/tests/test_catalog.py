@@ -0,0 +1,77 @@
+from src.evaluation import store
+from src.evaluation.catalog import PropertyCatalog
+from src.evaluation.columns import ColumnTable
+
+RECORDS = [
+    {"category": "Walls", "parameters.Width": 200, "parameters.Fire Rating": "EI 60"},
+    {"category": "Walls", "parameters.Width": 100, "parameters.Fire Rating": "EI 60"},
+    {"category": "Doors", "parameters.Width": 900, "type.Width": 1},
+    {"category": "Walls", "isExternal": True},
+]
+
+
+def paths(suggestions):
+    return [entry["path"] for entry in suggestions]
+
+
+def test_catalog_records_counts_kinds_and_samples():
+    """Test every path is listed with its count, kind and common values"""
+    catalog = PropertyCatalog.from_table(ColumnTable.from_records(RECORDS))
+    entries = {entry["path"]: entry for entry in catalog.entries}
+
+    assert len(catalog) == 5
+    assert entries["category"]["count"] == 4
+    assert entries["category"]["kind"] == "string"
+    assert entries["category"]["samples"] == ["Walls", "Doors"]
+    assert entries["parameters.Width"]["kind"] == "number"
+    assert entries["parameters.Width"]["min"] == "100"
+    assert entries["parameters.Width"]["max"] == "900"
+    assert entries["isExternal"]["samples"] == ["True"]
+
+
+def test_suggestions_match_any_segment_case_insensitively():
+    """Test a prefix finds paths by their start or by a later segment"""
+    catalog = PropertyCatalog.from_table(ColumnTable.from_records(RECORDS))
+
+    # Most common first, then shortest
+    assert paths(catalog.suggest("wid")) == ["parameters.Width", "type.Width"]
+    assert paths(catalog.suggest("PARAMETERS.f")) == ["parameters.Fire Rating"]
+    assert paths(catalog.suggest("fire r")) == ["parameters.Fire Rating"]
+    assert paths(catalog.suggest("", limit=2)) == ["category", "parameters.Width"]
+    assert catalog.suggest("height") == []
+
+
+def test_limit_keeps_the_most_common_paths():
+    """Test a large match set is cut to the most common paths"""
+    records = [{f"p{i}": i for i in range(n)} for n in range(1, 200)]
+    catalog = PropertyCatalog.from_table(ColumnTable.from_records(records))
+
+    assert paths(catalog.suggest("p", limit=3)) == ["p0", "p1", "p2"]
+
+
+def test_catalog_is_stored_with_the_table(tmp_path, monkeypatch):
+    """Test the catalog is built once and reloaded from disk"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    monkeypatch.setattr(store, "_catalogs", store.OrderedDict())
+    calls = []
+
+    def load_objects():
+        calls.append(1)
+        return {
+            "id": "root",
+            "speckle_type": "Speckle.Core.Models.Collection",
+            "elements": [
+                {"id": "e1", "speckle_type": "Objects.BuiltElements.Wall", "mark": "A"}
+            ],
+        }
+
+    first = store.get_catalog("abc123", load_objects)
+    store._loaded.clear()
+    store._catalogs.clear()
+    second = store.get_catalog("abc123", load_objects)
+
+    assert len(calls) == 1
+    assert (tmp_path / "abc123" / "catalog.json").exists()
+    assert second.entries == first.entries
+    assert paths(second.suggest("ma")) == ["mark"]
@@ -0,0 +1,159 @@
+import gzip
+import json
+
+import pytest
+from src.evaluation import cli
+from src.utils.tsv_utils import generate_ruleset_tsv
+
+RULES = [
+    {
+        "severity": "Error",
+        "message": "Walls need a fire rating",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "exists",
+                "value": "",
+            },
+        ],
+    },
+    {
+        "severity": "Warning",
+        "message": "Doors are at least 800 wide",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "==",
+                "value": "Doors",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Width",
+                "predicate": "greater than",
+                "value": "799",
+            },
+        ],
+    },
+]
+
+
+def element(number, category, **properties):
+    return {
+        "id": f"e{number}",
+        "speckle_type": "Objects.BuiltElements.Wall",
+        "category": category,
+        **properties,
+    }
+
+
+ELEMENTS = [
+    element(1, "Walls", **{"Fire Rating": "EI 60"}),
+    element(2, "Walls"),
+    element(3, "Doors", Width=900),
+]
+ROOT = {"id": "root", "speckle_type": "Speckle.Core.Models.Collection"}
+
+
+@pytest.fixture
+def ruleset(tmp_path):
+    tsv, _ = generate_ruleset_tsv({"name": "Fire"}, RULES)
+    path = tmp_path / "fire.tsv"
+    path.write_text(tsv, encoding="utf-8")
+    return str(path)
+
+
+def write_dumps(directory, elements=ELEMENTS):
+    """Write the same model in each supported dump format"""
+    directory.mkdir()
+    closure = [
+        {**ROOT, "elements": [{"referencedId": e["id"]} for e in elements]}
+    ] + elements
+    (directory / "inline.json").write_text(
+        json.dumps({**ROOT, "elements": elements}, indent=2)
+    )
+    (directory / "array.json").write_text(json.dumps(closure))
+    lines = "".join(f"{obj['id']}\t{json.dumps(obj)}\n" for obj in closure)
+    (directory / "objects.txt").write_text(lines)
+    with gzip.open(directory / "objects.ndjson.gz", "wt") as f:
+        f.writelines(json.dumps(obj) + "\n" for obj in closure)
+    return directory
+
+
+def run(capsys, *args):
+    code = cli.main([str(arg) for arg in args])
+    return code, capsys.readouterr().out
+
+
+def test_every_dump_format_gives_the_same_report(tmp_path, ruleset, capsys):
+    """Test inline, array and line-delimited dumps, plain and gzipped"""
+    models = write_dumps(tmp_path / "models")
+
+    code, out = run(capsys, ruleset, models, "--workers", 1)
+    report = json.loads(out)
+
+    assert code == 1
+    assert report["ruleset"]["rules"] == 2
+    assert len(report["models"]) == 4
+    for model in report["models"]:
+        assert model["elements"] == 3
+        walls, doors = model["rules"]
+        assert (walls["selected"], walls["failed"]) == (2, 1)
+        assert walls["failures"] == ["e2"]
+        assert (doors["selected"], doors["failed"]) == (1, 0)
+    assert report["summary"]["elements"] == 12
+    # Failing rules per severity, counted per model
+    assert report["summary"]["failedRules"] == {"Error": 4}
+
+
+def test_exit_code_follows_the_most_severe_failure(tmp_path, ruleset, capsys):
+    """Test --fail-on and warnings, and invalid models"""
+    passing = ELEMENTS[:1] + [element(3, "Doors", Width=700)]
+    models = write_dumps(tmp_path / "models", passing)
+    model = models / "array.json"
+
+    assert run(capsys, ruleset, model)[0] == 0
+    assert run(capsys, ruleset, model, "--fail-on", "warning")[0] == 3
+    assert run(capsys, ruleset, model, "--fail-on", "never")[0] == 0
+
+    broken = tmp_path / "broken.json"
+    broken.write_text("[{")
+    code, out = run(capsys, ruleset, model, broken, "--format", "jsonl")
+    lines = [json.loads(line) for line in out.splitlines()]
+    assert code == 2
+    assert "error" in lines[2]["model"] and lines[-1]["summary"]["exitCode"] == 2
+
+
+@pytest.mark.parametrize(
+    "dump", ['[1, 2, "x"]', '{"id": "r", "elements": 5}', '"text"', "{}"]
+)
+def test_malformed_models_are_invalid_input(tmp_path, ruleset, capsys, dump):
+    """Test dumps of the wrong shape, or with no elements, exit with 2"""
+    model = tmp_path / "model.json"
+    model.write_text(dump)
+
+    code, out = run(capsys, ruleset, model)
+    report = json.loads(out)
+
+    assert code == 2
+    assert report["models"][0]["error"].startswith("Could not read model")
+
+
+def test_models_are_checked_in_worker_processes(tmp_path, ruleset, capsys):
+    """Test reports from a process pool come back in input order"""
+    models = write_dumps(tmp_path / "models")
+    output = tmp_path / "report.json"
+
+    code = cli.main([ruleset, str(models), "--workers", "2", "-o", str(output)])
+    report = json.loads(output.read_text())
+
+    assert code == 1
+    assert [m["path"] for m in report["models"]] == cli.model_paths([str(models)])
+    assert all(m["rules"][0]["failures"] == ["e2"] for m in report["models"])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from src.evaluation import store
+from src.evaluation.columns import BOOL, NUMBER, STRING, ColumnTable
+
+RECORDS = [
+    {"Width": 200, "External": True, "Mark": "W1", "Mixed": 1},
+    {"Width": 100.5, "External": False, "Mark": None, "Mixed": "one"},
+    {"Mark": "W3", "Mixed": 1.0},
+    {"Width": 200.0, "External": True, "Unicode": "Brandschutz ≥ EI 60"},
+]
+
+
+def test_columns_are_typed_with_validity():
+    """Test each path gets the narrowest type and a null bitmap"""
+    table = ColumnTable.from_records(RECORDS)
+    width = table.columns["Width"]
+
+    assert width.kind == NUMBER
+    assert table.columns["External"].kind == BOOL
+    assert table.columns["Mark"].kind == STRING
+    assert table.columns["Mixed"].kind == STRING
+    assert width.present.tolist() == [True, True, False, True]
+    assert np.array_equal(np.isnan(width.numbers), [False, False, True, False])
+    # Numeric columns are dictionary-encoded on demand for string predicates
+    assert width.categories == ["100.5", "200"]
+    assert width.codes.tolist() == [1, 0, -1, 1]
+    assert table.columns["Mixed"].categories == ["1", "one"]
+
+
+def test_save_and_load_memory_mapped(tmp_path):
+    """Test a saved table loads back memory-mapped with the same contents"""
+    table = ColumnTable.from_records(RECORDS)
+    table.save(str(tmp_path))
+
+    loaded = ColumnTable.load(str(tmp_path))
+
+    assert len(loaded) == 4
+    assert isinstance(loaded.columns["Width"].values, np.memmap)
+    for path, column in table.columns.items():
+        other = loaded.columns[path]
+        assert other.kind == column.kind
+        assert other.present.tolist() == column.present.tolist()
+        assert other.categories == column.categories
+        assert other.codes.tolist() == column.codes.tolist()
+
+
+def test_store_builds_once_per_version(tmp_path, monkeypatch):
+    """Test the store only walks a version's objects the first time"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    calls = []
+
+    def load_objects():
+        calls.append(True)
+        return {
+            "id": "root",
+            "speckle_type": "Speckle.Core.Models.Collection",
+            "elements": [
+                {"id": "a", "speckle_type": "Objects.BuiltElements.Wall", "h": 3}
+            ],
+        }
+
+    first = store.get_table("abc123", load_objects)
+    store._loaded.clear()
+    second = store.get_table("abc123", load_objects)
+
+    assert len(calls) == 1
+    assert len(first) == len(second) == 1
+    assert second.resolve("h").numbers.tolist() == [3.0]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_load_rejects_other_versions(tmp_path, mmap):
+    """Test stores written in another format version are not misread"""
+    ColumnTable.from_records(RECORDS).save(str(tmp_path))
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(manifest.read_text().replace('"version": 1', '"version": 0'))
+
+    with pytest.raises(ValueError):
+        ColumnTable.load(str(tmp_path), mmap=mmap)
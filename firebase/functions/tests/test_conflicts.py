@@ -0,0 +1,147 @@
+import random
+import time
+
+from src.evaluation import conflicts
+from src.evaluation.conflicts import IntervalIndex, analyze_rules
+
+
+def rule(rule_id, *conditions):
+    return {
+        "id": rule_id,
+        "conditions": [
+            {
+                "logic": logic,
+                "propertyName": prop,
+                "predicate": predicate,
+                "value": value,
+            }
+            for logic, prop, predicate, value in conditions
+        ],
+    }
+
+
+WALLS = ("WHERE", "category", "equal to", "Walls")
+EXTERNAL = ("AND", "Is External", "is true", "")
+
+
+def test_disjoint_checks_on_the_same_scope_conflict():
+    """Test ranges and value lists that exclude each other are reported"""
+    rules = [
+        rule("wide", WALLS, ("CHECK", "Width", "greater than", "300")),
+        rule("narrow", WALLS, ("CHECK", "width", "less than", "200")),
+        rule("medium", WALLS, ("CHECK", "Width", "in range", "150,350")),
+        rule("rated", WALLS, ("CHECK", "Fire Rating", "in list", "EI 60, EI 90")),
+        rule("low", WALLS, ("CHECK", "Fire Rating", "equal to", "ei 30")),
+        rule(
+            "doors",
+            ("WHERE", "category", "equal to", "Doors"),
+            ("CHECK", "Width", "less than", "100"),
+        ),
+    ]
+
+    findings = analyze_rules(rules)
+
+    assert [(f["type"], f["rules"]) for f in findings] == [
+        ("conflict", ["wide", "narrow"]),
+        ("conflict", ["rated", "low"]),
+    ]
+    assert findings[0]["property"] == "Width"
+    assert "Width greater than 300" in findings[0]["message"]
+
+
+def test_touching_bounds_conflict_only_when_an_end_is_open():
+    """Test open and closed interval ends meeting at the same number"""
+    rules = [
+        rule("a", WALLS, ("CHECK", "Width", "greater than", "300")),
+        rule("b", WALLS, ("CHECK", "Width", "in range", "100,300")),
+        rule("c", WALLS, ("CHECK", "Width", "equal to", "300.0")),
+    ]
+
+    findings = analyze_rules(rules)
+
+    # 300 is in range but not greater than 300
+    assert [f["rules"] for f in findings] == [["a", "b"], ["a", "c"]]
+
+
+def test_rules_that_cannot_pass_and_duplicates():
+    """Test contradictory checks within a rule and reordered duplicates"""
+    rules = [
+        rule(
+            "never",
+            WALLS,
+            ("CHECK", "Width", "greater than", "300"),
+            ("AND", "Width", "less than", "200"),
+        ),
+        rule("first", WALLS, EXTERNAL, ("CHECK", "Fire Rating", "exists", "")),
+        rule(
+            "again",
+            ("WHERE", "Is External", "is true", ""),
+            ("AND", "Category", "equal to", "walls"),
+            ("CHECK", "Fire Rating", "exists", ""),
+        ),
+        rule(
+            "either",
+            WALLS,
+            ("CHECK", "Width", "greater than", "300"),
+            ("OR", "Width", "less than", "200"),
+        ),
+    ]
+
+    findings = analyze_rules(rules)
+
+    assert [(f["type"], f["numbers"]) for f in findings] == [
+        ("unsatisfiable", [1]),
+        ("duplicate", [2, 3]),
+    ]
+    assert conflicts.findings_by_rule(findings)["again"] == [findings[1]]
+
+
+def test_interval_index_finds_the_nearest_disjoint_interval():
+    """Test counts and witnesses come from both sides"""
+    index = IntervalIndex(
+        [((0, 0), (10, 0)), ((20, 0), (30, 0)), ((40, 0), (50, 0))]
+    )
+
+    assert index.disjoint(((25, 0), (26, 0))) == (2, 0)
+    assert index.disjoint(((5, 0), (8, 0))) == (2, 1)
+    assert index.disjoint(((0, 0), (50, 0))) == (0, None)
+
+
+def test_large_rulesets_are_not_compared_pairwise():
+    """Test thousands of rules on one scope are analysed in well under a second"""
+    rules = [
+        rule(f"r{i}", WALLS, ("CHECK", "Width", "in range", f"{i},{i + 5}"))
+        for i in range(0, 40_000, 10)
+    ] + [
+        rule(f"m{i}", WALLS, ("CHECK", "Material", "in list", f"m{i}, m{i + 1}"))
+        for i in range(0, 4_000, 2)
+    ]
+
+    started = time.perf_counter()
+    findings = analyze_rules(rules)
+    elapsed = time.perf_counter() - started
+
+    assert {f["type"] for f in findings} == {"conflict"}
+    # Every rule is disjoint from the others and reported with one of them
+    reported = {rule_id for f in findings for rule_id in f["rules"]}
+    assert len(reported) == len(rules)
+    assert elapsed < 2
+
+
+def test_value_sets_find_the_first_disjoint_rule():
+    """Test the run-skipping search matches a pairwise scan, overlaps included"""
+    rng = random.Random(7)
+    for pool, size in ((3, 1), (6, 2), (12, 4)):
+        entries = [
+            {"bound": frozenset(rng.sample(range(pool), size))} for _ in range(300)
+        ]
+        # A value every rule shares after the first few
+        entries += [{"bound": frozenset([pool, i])} for i in range(pool, 300)]
+
+        nearest = conflicts._nearest_conflicts(conflicts.VALUES, entries)
+
+        for entry, other in zip(entries, nearest):
+            expected = next(
+                (e for e in entries if not e["bound"] & entry["bound"]), None
+            )
+            assert other is expected
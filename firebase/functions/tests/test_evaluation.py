@@ -0,0 +1,212 @@
+import pytest
+from src.evaluation import engine
+from src.evaluation.engine import build_table, evaluate_rule, evaluate_ruleset
+from src.evaluation.flatten import flatten_element
+
+
+def parameter(name, value):
+    return {
+        "speckle_type": "Objects.BuiltElements.Revit.Parameter",
+        "name": name,
+        "value": value,
+        "units": "mm",
+    }
+
+
+WALL_TYPE = "Objects.BuiltElements.Wall:Objects.BuiltElements.Revit.RevitWall"
+
+
+def wall(i, width, rating, mark=None):
+    return {
+        "id": f"wall{i}",
+        "speckle_type": WALL_TYPE,
+        "category": "Walls",
+        "parameters": {
+            "WALL_ATTR_WIDTH_PARAM": parameter("Width", width),
+            "FIRE_RATING": parameter("Fire Rating", rating),
+            "ALL_MODEL_MARK": parameter("Mark", mark),
+        },
+        "displayValue": [{"id": f"mesh{i}", "speckle_type": "Objects.Geometry.Mesh"}],
+    }
+
+
+# Root collection with inline children and a chunked, referenced layer
+DOOR = {
+    "id": "door1",
+    "speckle_type": "Objects.BuiltElements.Revit.FamilyInstance",
+    "category": "Doors",
+    "parameters": {"Width": parameter("Width", "900")},
+}
+CHUNK = {
+    "id": "chunk1",
+    "speckle_type": "Speckle.Core.Models.DataChunk",
+    "data": [DOOR],
+}
+ROOT = {
+    "id": "root",
+    "speckle_type": "Speckle.Core.Models.Collection",
+    "elements": [
+        {
+            "id": "walls",
+            "speckle_type": "Speckle.Core.Models.Collection",
+            "elements": [
+                wall(1, 200, "EI 60", "W1"),
+                wall(2, 100.0, "EI 90"),
+                wall(3, 350, "ei 120", "W3"),
+            ],
+        },
+    ],
+    "@doors": [{"referencedId": "chunk1", "speckle_type": "reference"}],
+}
+
+
+def rule(*conditions, **fields):
+    return {
+        "conditions": [
+            {"logic": logic, "propertyName": prop, "predicate": pred, "value": value}
+            for logic, prop, pred, value in conditions
+        ],
+        **fields,
+    }
+
+
+@pytest.fixture(scope="module")
+def table():
+    return build_table([ROOT, CHUNK])
+
+
+def test_flatten_addresses_parameters_by_key_and_name():
+    """Test Revit-style parameters appear under both their key and their name"""
+    record = flatten_element(wall(1, 200, "EI 60"))
+
+    assert record["parameters.WALL_ATTR_WIDTH_PARAM"] == 200
+    assert record["parameters.Width"] == 200
+    assert "displayValue" not in record
+    assert not any(path.startswith("parameters.Width.") for path in record)
+
+
+def test_table_holds_elements_only(table):
+    """Test collections, chunks and display meshes are not elements"""
+    assert len(table) == 4
+    assert table.resolve("category").categories == ["Walls", "Doors"]
+
+
+@pytest.mark.parametrize(
+    "condition,expected",
+    [
+        (("CHECK", "Mark", "exists", ""), 2),
+        (("CHECK", "Width", "greater than", "150"), 2),
+        (("CHECK", "Width", "less than", "150"), 1),
+        (("CHECK", "Width", "in range", "100,350"), 3),
+        (("CHECK", "Fire Rating", "in list", "EI 60, EI 120"), 2),
+        (("CHECK", "Width", "equal to", "100"), 1),
+        (("CHECK", "Fire Rating", "not equal to", "ei 60"), 2),
+        (("CHECK", "Fire Rating", "is like", r"^EI \d0$"), 2),
+        (("CHECK", "Fire Rating", "identical to", "ei 120"), 1),
+        (("CHECK", "Fire Rating", "contains", "12"), 1),
+        (("CHECK", "Fire Rating", "does not contain", "12"), 2),
+        (("CHECK", "Width", "==", "100"), 1),
+    ],
+)
+def test_predicates_over_walls(table, condition, expected):
+    """Test each predicate counts the walls it should"""
+    result = evaluate_rule(
+        table, rule(("WHERE", "category", "equal to", "walls"), condition)
+    ).to_dict()
+
+    assert result["selected"] == 3
+    assert result["passed"] == expected
+    assert result["failed"] == 3 - expected
+
+
+def test_filter_logic_and_leaf_lookup(table):
+    """Test AND/OR filters and that a bare name finds the parameter anywhere"""
+    either = rule(
+        ("WHERE", "category", "equal to", "Doors"),
+        ("OR", "parameters.Fire Rating", "equal to", "EI 90"),
+        ("CHECK", "Width", "less than", "1000"),
+    )
+    without_check = rule(
+        ("WHERE", "category", "equal to", "Walls"),
+        ("AND", "Mark", "exists", ""),
+    )
+
+    assert evaluate_rule(table, either).to_dict()["selected"] == 2
+    assert evaluate_rule(table, either).to_dict()["passed"] == 2
+    # Without a CHECK the last condition is the check
+    assert evaluate_rule(table, without_check).to_dict()["passed"] == 2
+
+
+def test_ruleset_numbering_and_errors(table):
+    """Test empty rules are skipped and bad predicates are reported per rule"""
+    results = evaluate_ruleset(
+        table,
+        [
+            rule(("CHECK", "Missing", "exists", ""), id="a"),
+            rule(id="empty"),
+            rule(("CHECK", "category", "sounds like", "wall"), id="b"),
+        ],
+    )
+
+    assert [r.to_dict()["number"] for r in results] == [1, 2]
+    assert results[0].to_dict()["selected"] == 4
+    assert results[0].to_dict()["passed"] == 0
+    assert "sounds like" in results[1].to_dict()["error"]
+
+
+def test_shared_filters_are_evaluated_once(monkeypatch):
+    """Test rules sharing a filter prefix reuse its masks"""
+    evaluated = []
+    original = engine.CompiledCondition.evaluate
+
+    def evaluate(condition, table):
+        evaluated.append(condition.key)
+        return original(condition, table)
+
+    monkeypatch.setattr(engine.CompiledCondition, "evaluate", evaluate)
+    table = build_table([ROOT, CHUNK])
+    walls = ("WHERE", "category", "equal to", "Walls")
+    rated = ("AND", "Fire Rating", "exists", "")
+    results = evaluate_ruleset(
+        table,
+        [
+            rule(walls, rated, ("CHECK", "Width", "greater than", "150")),
+            rule(walls, rated, ("CHECK", "Mark", "exists", "")),
+            # Same filter spelled differently
+            rule(
+                ("WHERE", "category ", "==", "Walls"),
+                ("CHECK", "Width", "greater than", "150"),
+            ),
+        ],
+    )
+
+    assert [r.to_dict()["passed"] for r in results] == [2, 2, 2]
+    assert len(evaluated) == len(set(evaluated)) == 4
+    assert engine.masks_for(table).hits >= 3
+
+
+def test_rules_compile_once_per_content(table, monkeypatch):
+    """Test repeated evaluations reuse the parsed operands of a rule"""
+    prepared = []
+    original = engine.prepare
+
+    def prepare(predicate, value):
+        prepared.append(value)
+        return original(predicate, value)
+
+    monkeypatch.setattr(engine, "prepare", prepare)
+    monkeypatch.setattr(engine, "_compiled", engine.OrderedDict())
+    ranged = rule(
+        ("WHERE", "category", "equal to", "Walls"),
+        ("CHECK", "Width", "in range", "150, 400"),
+        id="a",
+    )
+    broken = rule(("CHECK", "category", "sounds like", "wall"), id="b")
+
+    for _ in range(3):
+        results = evaluate_ruleset(table, [ranged, dict(ranged, id="c"), broken])
+
+    assert prepared == ["Walls", "150, 400"]
+    assert engine.compile_rule(ranged) is engine.compile_rule(dict(ranged))
+    assert results[1].to_dict()["passed"] == 2
+    assert "sounds like" in results[2].to_dict()["error"]
@@ -0,0 +1,165 @@
+import json
+
+import pytest
+from src.evaluation import evaluation_routes, incremental, results, store
+from werkzeug.test import EnvironBuilder
+
+RULES = [
+    {
+        "id": "walls",
+        "severity": "Error",
+        "message": "Walls need a fire rating",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "exists",
+                "value": "",
+            },
+        ],
+    }
+]
+
+
+def element(number, **properties):
+    return {
+        "id": f"e{number}",
+        "speckle_type": "Objects.BuiltElements.Wall",
+        "category": "Walls",
+        **properties,
+    }
+
+
+# Root object ID -> elements of that version
+MODELS = {
+    "root1": [element(1, **{"Fire Rating": "EI 60"}), element(2)],
+    "root2": [element(1, **{"Fire Rating": "EI 60"}), element(3)],
+    "root3": [element(4, **{"Fire Rating": "EI 60"})],
+}
+
+
+class FakeSpeckleAPI:
+    """Serves a model's history, newest first, and each version's objects"""
+
+    history = []
+    downloads = []
+
+    def __init__(self, token):
+        assert token == "speckle-token"
+
+    def get_latest_version(self, project_id, model_id=None):
+        return {**self.history[0], "modelId": "m1"} if self.history else None
+
+    def get_model_versions(self, project_id, model_id, limit=25):
+        return self.history[:limit]
+
+    def download_version_objects(self, project_id, object_id):
+        self.downloads.append(object_id)
+        yield {
+            "id": object_id,
+            "speckle_type": "Speckle.Core.Models.Collection",
+            "elements": MODELS[object_id],
+        }
+
+
+def push(version_id, object_id):
+    FakeSpeckleAPI.history.insert(
+        0, {"id": version_id, "referencedObject": object_id, "createdAt": version_id}
+    )
+
+
+@pytest.fixture
+def routes(tmp_path, monkeypatch):
+    """Isolate every cache and serve one user's ruleset without Firestore"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    monkeypatch.setattr(results, "_results", results.OrderedDict())
+    monkeypatch.setattr(results, "_result_bytes", 0)
+    monkeypatch.setattr(incremental, "_diffs", incremental.OrderedDict())
+    monkeypatch.setattr(
+        evaluation_routes, "_latest_versions", evaluation_routes.OrderedDict()
+    )
+    monkeypatch.setattr(FakeSpeckleAPI, "history", [])
+    monkeypatch.setattr(FakeSpeckleAPI, "downloads", [])
+
+    ruleset = {"id": "rs1", "userId": "u1", "projectId": "p1"}
+    monkeypatch.setattr(evaluation_routes, "SpeckleAPI", FakeSpeckleAPI)
+    monkeypatch.setattr(
+        evaluation_routes, "safe_verify_id_token", lambda token: {"uid": token}
+    )
+    monkeypatch.setattr(
+        evaluation_routes,
+        "get_ruleset",
+        lambda ruleset_id: ruleset if ruleset_id == "rs1" else None,
+    )
+    monkeypatch.setattr(evaluation_routes, "get_rules_for_ruleset", lambda _: RULES)
+    monkeypatch.setattr(
+        evaluation_routes, "get_speckle_token_for_user", lambda _: "speckle-token"
+    )
+    return FakeSpeckleAPI
+
+
+def call(handler, user="u1", ruleset_id="rs1"):
+    headers = {"Authorization": f"Bearer {user}"} if user else {}
+    request = EnvironBuilder(path="/api", headers=headers).get_request()
+    response = handler(request, ruleset_id)
+    return response.status_code, json.loads(response.get_data())
+
+
+def test_preview_compares_with_the_previous_version_in_history(routes):
+    """Test the delta is against the model's previous version, every time"""
+    push("v1", "root1")
+    status, first = call(evaluation_routes.preview_ruleset)
+
+    assert status == 200
+    assert (first["versionId"], first["previousVersionId"]) == ("v1", None)
+    assert first["elements"] == 2
+    assert first["rules"][0]["failed"] == 1
+    assert "delta" not in first["rules"][0]
+
+    push("v2", "root2")
+    for _ in range(2):
+        status, second = call(evaluation_routes.preview_ruleset)
+        assert status == 200
+        assert second["previousVersionId"] == "v1"
+        # e2 was removed and e3, also without a rating, added
+        assert second["rules"][0]["delta"] == {"newFailures": 1, "resolved": 1}
+
+    # v3 is compared with v2 even though v2 was never previewed
+    push("v3", "root3")
+    push("v4", "root1")
+    status, fourth = call(evaluation_routes.preview_ruleset)
+    assert fourth["previousVersionId"] == "v3"
+    assert "delta" not in fourth["rules"][0]
+    assert routes.downloads == ["root1", "root2"]
+
+
+def test_preview_and_impact_check_the_caller(routes):
+    """Test missing tokens, other users' rulesets and missing rulesets"""
+    push("v1", "root1")
+    handlers = (evaluation_routes.preview_ruleset, evaluation_routes.get_rule_impact)
+    for handler in handlers:
+        assert call(handler, user=None)[0] == 401
+        assert call(handler, user="u2")[0] == 403
+        assert call(handler, ruleset_id="missing")[0] == 404
+    assert routes.downloads == []
+
+
+def test_impact_counts_each_rule_against_the_latest_version(routes):
+    """Test the impact route counts rules and reuses preview results"""
+    push("v1", "root1")
+    call(evaluation_routes.preview_ruleset)
+
+    status, body = call(evaluation_routes.get_rule_impact)
+
+    assert status == 200
+    assert body["versionId"] == "v1"
+    assert body["elements"] == 2
+    assert body["rules"] == {"walls": {"selected": 2, "passed": 1, "failed": 1}}
+    assert routes.downloads == ["root1"]
@@ -0,0 +1,74 @@
+from src.evaluation import store
+from src.evaluation.columns import ColumnTable
+from src.evaluation.histograms import ValueHistograms, column_histogram
+
+RECORDS = [
+    {"category": "Walls", "parameters.Fire Rating": "EI 60", "parameters.Width": 100},
+    {"category": "Walls", "parameters.Fire Rating": "EI 90", "parameters.Width": 200},
+    {"category": "Doors", "parameters.Fire Rating": "EI 60", "parameters.Width": 300},
+    {"category": "Windows", "type.Fire Rating": "REI 60", "parameters.Width": 400},
+    {"category": "Walls", "parameters.Fire Rating": "EI 60"},
+]
+
+
+def test_histogram_keeps_the_most_common_values():
+    """Test values are counted exactly and cut to the top few"""
+    table = ColumnTable.from_records(RECORDS)
+    histogram = column_histogram(table.columns["category"], top_values=2)
+
+    assert histogram["count"] == 5
+    assert histogram["distinct"] == 3
+    # Ties keep category order
+    assert histogram["top"] == [["Walls", 3], ["Doors", 1]]
+
+
+def test_numeric_histogram_has_range_and_quantiles():
+    """Test numbers get min, max and quantiles"""
+    table = ColumnTable.from_records(RECORDS)
+    histogram = column_histogram(table.columns["parameters.Width"])
+
+    assert histogram["min"] == "100"
+    assert histogram["max"] == "400"
+    assert histogram["quantiles"]["p50"] == "250"
+
+
+def test_value_suggestions_resolve_property_names_like_rules():
+    """Test a leaf name merges every matching path and filters by text"""
+    histograms = ValueHistograms.from_table(ColumnTable.from_records(RECORDS))
+
+    summary = histograms.suggest("fire rating", "ei")
+    values = [(v["value"], v["count"]) for v in summary["values"]]
+
+    assert summary["count"] == 5
+    # Values starting with the text first, then values containing it
+    assert values == [("EI 60", 3), ("EI 90", 1), ("REI 60", 1)]
+    assert histograms.suggest("Category", "w")["values"][0]["value"] == "Walls"
+    assert histograms.suggest("Height") is None
+
+
+def test_histograms_are_stored_with_the_catalog(tmp_path, monkeypatch):
+    """Test the histograms and catalog of a version are built together"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    monkeypatch.setattr(store, "_catalogs", store.OrderedDict())
+    monkeypatch.setattr(store, "_histograms", store.OrderedDict())
+    calls = []
+
+    def load_objects():
+        calls.append(1)
+        return {
+            "id": "root",
+            "speckle_type": "Speckle.Core.Models.Collection",
+            "elements": [
+                {"id": "e1", "speckle_type": "Objects.BuiltElements.Wall", "mark": "A"}
+            ],
+        }
+
+    store.get_catalog("abc123", load_objects)
+    store._loaded.clear()
+    store._histograms.clear()
+    histograms = store.get_histograms("abc123", load_objects)
+
+    assert len(calls) == 1
+    assert (tmp_path / "abc123" / "histograms.json").exists()
+    assert histograms.suggest("mark")["values"] == [{"value": "A", "count": 1}]
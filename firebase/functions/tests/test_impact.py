@@ -0,0 +1,122 @@
+import pytest
+from src.evaluation import impact, results, store
+from src.evaluation.columns import ColumnTable
+from src.evaluation.engine import evaluate_ruleset
+from src.utils.jinja_env import render_template
+
+RECORDS = [
+    {"category": "Walls", "Fire Rating": "EI 60"},
+    {"category": "Walls", "Fire Rating": "EI 30"},
+    {"category": "Walls"},
+    {"category": "Doors", "Fire Rating": "EI 60"},
+]
+
+
+def make_rule(rule_id, category, rating="EI 60"):
+    return {
+        "id": rule_id,
+        "severity": "Error",
+        "message": f"{category} must be {rating}",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": category,
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "equal to",
+                "value": rating,
+            },
+        ],
+    }
+
+
+@pytest.fixture
+def evaluations(tmp_path, monkeypatch):
+    """Isolate the caches and record which rules get evaluated"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    monkeypatch.setattr(results, "_results", results.OrderedDict())
+    monkeypatch.setattr(results, "_result_bytes", 0)
+    evaluated = []
+    original = results.evaluate_rule
+
+    def evaluate_rule(table, rule, number=0):
+        evaluated.append(rule["id"])
+        return original(table, rule, number)
+
+    monkeypatch.setattr(results, "evaluate_rule", evaluate_rule)
+    table = ColumnTable.from_records(RECORDS)
+    store._remember(store._loaded, "version1", table)
+    return table, evaluated
+
+
+def test_ruleset_impact_counts_selected_and_passed(evaluations):
+    """Test each rule gets its WHERE and CHECK counts"""
+    table, _ = evaluations
+    rules = [make_rule("walls", "Walls"), make_rule("doors", "Doors"), {"id": "x"}]
+
+    counts = impact.ruleset_impact("version1", table, rules)
+
+    assert counts == {
+        "walls": {"selected": 3, "passed": 1, "failed": 2},
+        "doors": {"selected": 1, "passed": 1, "failed": 0},
+    }
+
+
+def test_editing_a_rule_only_reevaluates_that_rule(evaluations):
+    """Test cached counts are reused and only the changed rule is evaluated"""
+    table, evaluated = evaluations
+    rules = [make_rule("walls", "Walls"), make_rule("doors", "Doors")]
+    impact.ruleset_impact("version1", table, rules)
+    evaluated.clear()
+
+    rules[0] = make_rule("walls", "Walls", rating="EI 30")
+    counts = impact.ruleset_impact("version1", table, rules)
+
+    assert evaluated == ["walls"]
+    assert counts["walls"] == {"selected": 3, "passed": 1, "failed": 2}
+    assert counts["doors"]["passed"] == 1
+
+
+def test_counts_share_the_preview_results_cache(evaluations, monkeypatch):
+    """Test rules already previewed are counted without evaluating them"""
+    table, evaluated = evaluations
+    rules = [make_rule("walls", "Walls"), make_rule("doors", "Doors")]
+    monkeypatch.setattr(results, "evaluate_ruleset_parallel", evaluate_ruleset)
+    preview = results.evaluate_ruleset_cached("version1", table, rules[:1])
+
+    counts = impact.ruleset_impact("version1", table, rules)
+
+    assert evaluated == ["doors"]
+    walls = preview[0].to_dict()
+    assert counts["walls"] == {
+        name: walls[name] for name in ("selected", "passed", "failed")
+    }
+
+
+def test_rules_list_shows_counts_and_marks_missing_ones():
+    """Test rows render known counts and the table asks for the rest"""
+    rules = [make_rule("walls", "Walls"), make_rule("doors", "Doors")]
+    counts = {"walls": {"selected": 3, "passed": 1, "failed": 2}}
+
+    html = render_template(
+        "rules_list.html", ruleset_id="rs1", rules=rules, impact=counts
+    )
+    # The edit handlers render without counts, leaving all of them to the page
+    uncounted = render_template("rules_list.html", ruleset_id="rs1", rules=rules)
+    complete = render_template(
+        "rules_list.html",
+        ruleset_id="rs1",
+        rules=rules[:1],
+        impact=counts,
+    )
+
+    assert "3 selected" in html
+    assert "2 fail" in html
+    assert "data-impact-pending" in html
+    assert "data-impact-pending" not in complete
+    assert "data-impact-pending" in uncounted and "selected" not in uncounted
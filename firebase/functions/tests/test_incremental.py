@@ -0,0 +1,136 @@
+import gc
+import weakref
+
+import numpy as np
+import pytest
+from src.evaluation import incremental, results, store
+from src.evaluation.columns import ColumnTable
+from src.evaluation.engine import evaluate_ruleset
+
+
+def wall(number, rating, revision=0, **extra):
+    return {
+        "id": f"wall{number}-{revision}",
+        "applicationId": f"app{number}",
+        "category": "Walls",
+        "parameters.Fire Rating": rating,
+        **extra,
+    }
+
+
+BEFORE = [wall(i, "EI 60" if i % 3 else "EI 30") for i in range(30)]
+# Wall 3 is fixed, wall 6 removed and a failing wall 30 added; the rest are
+# the same objects in a different order
+AFTER = (
+    [wall(3, "EI 60", revision=1)]
+    + [w for w in reversed(BEFORE) if w["id"] not in ("wall3-0", "wall6-0")]
+    + [wall(30, "EI 30")]
+)
+
+RULE = {
+    "id": "rated",
+    "conditions": [
+        {
+            "logic": "WHERE",
+            "propertyName": "category",
+            "predicate": "equal to",
+            "value": "Walls",
+        },
+        {
+            "logic": "CHECK",
+            "propertyName": "Fire Rating",
+            "predicate": "equal to",
+            "value": "EI 60",
+        },
+    ],
+}
+
+
+@pytest.fixture
+def versions(tmp_path, monkeypatch):
+    """Store both versions and record the size of every evaluated table"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    monkeypatch.setattr(results, "_results", results.OrderedDict())
+    monkeypatch.setattr(incremental, "_diffs", incremental.OrderedDict())
+    evaluated = []
+    original = incremental.evaluate_rule
+
+    def evaluate_rule(table, rule, number=0):
+        evaluated.append(len(table))
+        return original(table, rule, number)
+
+    monkeypatch.setattr(incremental, "evaluate_rule", evaluate_rule)
+    tables = []
+    for object_id, records in (("before", BEFORE), ("after", AFTER)):
+        table = ColumnTable.from_records(records)
+        store.save_table(object_id, table)
+        tables.append(table)
+    return tables, evaluated
+
+
+def test_rows_match_by_object_id(versions):
+    """Test unchanged elements map to their earlier rows, whatever the order"""
+    (before, after), _ = versions
+
+    rows = incremental.match_rows(before, after)
+
+    assert rows[0] == -1 and rows[-1] == -1
+    assert (rows[1:-1] >= 0).all()
+    ids = incremental.row_strings(before, "id")
+    assert (ids[rows[1:-1]] == incremental.row_strings(after, "id")[1:-1]).all()
+
+
+def test_patched_results_match_a_full_evaluation(versions):
+    """Test only new elements are evaluated and failures are compared"""
+    (before, after), evaluated = versions
+    results.evaluate_ruleset_cached("before", before, [RULE])
+
+    patched = results.evaluate_ruleset_cached("after", after, [RULE], "before")
+    expected = evaluate_ruleset(after, [RULE])
+
+    assert evaluated == [2]
+    assert np.array_equal(patched[0].passed, expected[0].passed)
+    assert np.array_equal(patched[0].selected, expected[0].selected)
+    # Wall 3 was fixed and wall 6 removed; wall 30 is new and fails
+    assert patched[0].to_dict()["delta"] == {"newFailures": 1, "resolved": 2}
+
+
+def test_rules_whose_properties_moved_are_evaluated_in_full(versions):
+    """Test a property that names another column now is not patched"""
+    (before, _), evaluated = versions
+    moved = ColumnTable.from_records(AFTER + [{"id": "x", "Fire Rating": "EI 60"}])
+    store.save_table("moved", moved)
+    results.evaluate_ruleset_cached("before", before, [RULE])
+
+    patched = results.evaluate_ruleset_cached("moved", moved, [RULE], "before")
+
+    expected = evaluate_ruleset(moved, [RULE])
+
+    assert evaluated == []
+    assert patched[0].to_dict()["passed"] == expected[0].to_dict()["passed"]
+
+
+def test_matched_rows_in_order_are_copied_in_runs(monkeypatch):
+    """Test runs cover the matched rows and scattered rows are gathered"""
+    monkeypatch.setattr(incremental, "MIN_RUN_LENGTH", 2)
+    rows = np.array([-1, 0, 1, 2, 7, 8, -1, 3])
+
+    assert incremental.matched_runs(rows) == [(1, 4, 0), (4, 6, 7), (7, 8, 3)]
+    assert incremental.matched_runs(np.array([3, 1, 2, 0, 5, 4])) is None
+
+
+def test_cached_diffs_do_not_keep_tables_alive(versions):
+    """Test only the row matching is cached, and reused for other copies"""
+    (before, after), _ = versions
+    diff = incremental.version_diff("before", before, "after", after)
+    dropped = weakref.ref(before)
+    del before, diff
+    versions[0][0] = None
+    gc.collect()
+
+    assert dropped() is None
+    reloaded = store.find_table("before")
+    again = incremental.version_diff("before", reloaded, "after", after)
+    assert again.previous is reloaded
+    assert again.match is incremental._diffs[("before", "after")]
@@ -0,0 +1,52 @@
+import threading
+
+from src.utils import object_cache
+from src.utils.object_cache import ObjectCache
+
+
+def objects(prefix, count, size=100):
+    return [{"id": f"{prefix}{i}", "blob": "x" * size} for i in range(count)]
+
+
+def test_round_trip_and_shared_between_handles(tmp_path):
+    """Test objects written through one handle are read through another"""
+    path = str(tmp_path / "objects.sqlite3")
+    writer = ObjectCache(path)
+    reader = ObjectCache(path)
+
+    writer.put_many(objects("a", 3))
+    found = reader.get_many(["a0", "a2", "missing"])
+
+    assert sorted(found) == ["a0", "a2"]
+    assert found["a0"] == {"id": "a0", "blob": "x" * 100}
+    assert (reader.hits, reader.misses) == (2, 1)
+
+
+def test_concurrent_writers(tmp_path):
+    """Test several threads can fill the cache at once"""
+    cache = ObjectCache(str(tmp_path / "objects.sqlite3"))
+    threads = [
+        threading.Thread(target=cache.put_many, args=(objects(f"t{n}-", 200),))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache.get_many(f"t{n}-{i}" for n in range(4) for i in range(200))) == 800
+
+
+def test_least_recently_used_objects_are_evicted(tmp_path, monkeypatch):
+    """Test eviction keeps the cache within budget, dropping the oldest first"""
+    monkeypatch.setattr(object_cache, "EVICT_CHECK_BYTES", 1)
+    cache = ObjectCache(str(tmp_path / "objects.sqlite3"), max_bytes=3_000)
+
+    cache.put_many(objects("old", 20))
+    cache.get_many(["old0"])
+    cache.put_many(objects("new", 20))
+
+    assert cache.size() <= 3_000
+    assert cache.get("old0") is not None
+    assert cache.get("old1") is None
+    assert len(cache.get_many(f"new{i}" for i in range(20))) == 20
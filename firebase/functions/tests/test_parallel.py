@@ -0,0 +1,151 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+from src.evaluation import parallel
+from src.evaluation.columns import ColumnTable
+from src.evaluation.engine import evaluate_ruleset
+
+RULES = [
+    {
+        "id": "wide-walls",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Width",
+                "predicate": "greater than",
+                "value": "150",
+            },
+        ],
+    },
+    {
+        "id": "rated",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "Fire Rating",
+                "predicate": "is like",
+                "value": r"^EI \d+$",
+            }
+        ],
+    },
+    {"id": "empty", "conditions": []},
+    {
+        "id": "broken",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "x",
+                "predicate": "sounds like",
+                "value": "y",
+            }
+        ],
+    },
+]
+
+
+def make_table(count):
+    records = []
+    for i in range(count):
+        record = {"category": "Walls" if i % 3 else "Doors", "Width": i % 300}
+        if i % 5:
+            record["Fire Rating"] = f"EI {30 * (i % 4)}"
+        records.append(record)
+    return ColumnTable.from_records(records)
+
+
+def test_shard_ranges_cover_rows_on_byte_boundaries():
+    """Test shards start on whole bitmap bytes and cover every row once"""
+    ranges = parallel.shard_ranges(1001, 4)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1001
+    assert all(start % 8 == 0 for start, _ in ranges)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_slicing_a_loaded_column_reads_only_its_bitmap_bytes(tmp_path):
+    """Test an aligned slice of a stored column keeps its packed validity"""
+    table = make_table(100)
+    table.save(str(tmp_path))
+    loaded = ColumnTable.load(str(tmp_path))
+
+    shard = loaded.slice(16, 40).columns["Fire Rating"]
+    expected = table.columns["Fire Rating"].present[16:40]
+
+    assert len(shard.validity) == 3
+    assert shard.present.tolist() == expected.tolist()
+
+
+def test_sharded_evaluation_matches_in_process(tmp_path, monkeypatch):
+    """Test merged shard bitmaps equal evaluating the whole table at once"""
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_ROWS", 0)
+    make_table(5003).save(str(tmp_path))
+    table = ColumnTable.load(str(tmp_path))
+
+    try:
+        sharded = parallel.evaluate_ruleset_parallel(table, RULES, workers=2)
+    finally:
+        parallel._reset_executor()
+    expected = evaluate_ruleset(table, RULES)
+
+    assert [r.to_dict() for r in sharded] == [r.to_dict() for r in expected]
+    for ours, theirs in zip(sharded, expected):
+        if not ours.error:
+            assert np.array_equal(ours.selected, theirs.selected)
+            assert np.array_equal(ours.passed, theirs.passed)
+
+
+@pytest.mark.parametrize("directory", [False, True])
+def test_small_or_unsaved_tables_stay_in_process(tmp_path, directory, monkeypatch):
+    """Test tables below the threshold or only in memory skip the pool"""
+    monkeypatch.setattr(parallel, "_get_executor", None)
+    table = make_table(100)
+    if directory:
+        table.save(str(tmp_path))
+        table = ColumnTable.load(str(tmp_path))
+
+    results = parallel.evaluate_ruleset_parallel(table, RULES, workers=4)
+
+    assert [r.rule_id for r in results] == ["wide-walls", "rated", "broken"]
+
+
+def test_worker_count_follows_the_cpus_this_process_may_use(monkeypatch):
+    """Test affinity, not the host's core count, capped by configuration"""
+    monkeypatch.delenv("EVALUATION_WORKERS", raising=False)
+    monkeypatch.delenv("EVALUATION_MAX_WORKERS", raising=False)
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 64)
+    monkeypatch.setattr(parallel.os, "sched_getaffinity", lambda pid: {0, 1})
+    assert parallel.evaluation_workers() == 2
+
+    monkeypatch.setattr(parallel.os, "sched_getaffinity", lambda pid: set(range(32)))
+    assert parallel.evaluation_workers() == parallel.DEFAULT_MAX_WORKERS
+    monkeypatch.setenv("EVALUATION_MAX_WORKERS", "16")
+    assert parallel.evaluation_workers() == 16
+    monkeypatch.setenv("EVALUATION_WORKERS", "3")
+    assert parallel.evaluation_workers() == 3
+
+
+def test_evicted_table_is_evaluated_in_process(tmp_path, monkeypatch):
+    """Test a worker that cannot open the table's files falls back"""
+
+    class EvictedExecutor:
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(FileNotFoundError("validity.npy"))
+            return future
+
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_ROWS", 0)
+    monkeypatch.setattr(parallel, "_get_executor", lambda workers: EvictedExecutor())
+    make_table(1000).save(str(tmp_path))
+    table = ColumnTable.load(str(tmp_path))
+
+    results = parallel.evaluate_ruleset_parallel(table, RULES, workers=2)
+
+    expected = evaluate_ruleset(table, RULES)
+    assert [r.to_dict() for r in results] == [r.to_dict() for r in expected]
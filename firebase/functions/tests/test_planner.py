@@ -0,0 +1,109 @@
+import random
+
+import numpy as np
+from src.evaluation import engine, planner
+from src.evaluation.columns import ColumnTable
+from src.evaluation.engine import CompiledCondition, combine
+
+CATEGORIES = ["Walls", "Doors", "Windows", "Floors", "Rooms"]
+
+
+def make_table(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        record = {
+            "category": rng.choice(CATEGORIES),
+            "Width": rng.choice((100, 200, 300, 400)),
+            "Is External": bool(i % 2),
+        }
+        if i % 4:
+            record["Fire Rating"] = rng.choice(("EI 30", "EI 60", "EI 90"))
+        records.append(record)
+    return ColumnTable.from_records(records)
+
+
+def condition(logic, prop, predicate, value=""):
+    return CompiledCondition(logic, prop, predicate, value)
+
+
+def fold(conditions, table):
+    """Evaluate a chain as typed, without planning or caching"""
+    mask = conditions[0].evaluate(table)
+    for c in conditions[1:]:
+        result = c.evaluate(table)
+        mask = mask | result if c.logic == "OR" else mask & result
+    return mask
+
+
+def test_stats_are_kept_with_stored_tables(tmp_path):
+    """Test a loaded table plans from its manifest instead of its columns"""
+    table = make_table(100)
+    table.save(str(tmp_path))
+    loaded = ColumnTable.load(str(tmp_path))
+
+    stats = loaded.columns["Fire Rating"]._stats
+    assert stats == table.columns["Fire Rating"].stats
+    assert stats["nulls"] == 0.25 and stats["distinct"] == 3
+    assert loaded.columns["Width"].stats["min"] == 100
+    assert loaded.columns["Width"].stats["max"] == 400
+
+
+def test_selective_and_missing_conditions_go_first():
+    """Test conditions are ordered by estimated selectivity and cost"""
+    table = make_table(1000)
+    exists = condition("WHERE", "category", "exists")
+    wide = condition("AND", "Width", "greater than", "390")
+    walls = condition("AND", "category", "equal to", "Walls")
+    missing = condition("AND", "Acoustic Rating", "exists")
+
+    ordered = planner.order([exists, walls, wide, missing], table)
+
+    assert ordered == [missing, wide, walls, exists]
+    assert planner.estimate(missing, table) == (0.0, 0.0)
+
+
+def test_planned_chains_match_evaluation_as_typed():
+    """Test reordering AND runs never changes which elements are selected"""
+    table = make_table(500)
+    rng = random.Random(1)
+    choices = [
+        ("category", "equal to", "Walls"),
+        ("category", "in list", "Doors, Rooms"),
+        ("Width", "greater than", "150"),
+        ("Width", "in range", "100,300"),
+        ("Fire Rating", "exists", ""),
+        ("Fire Rating", "not equal to", "EI 60"),
+        ("Is External", "is true", ""),
+        ("Missing", "exists", ""),
+    ]
+    for _ in range(200):
+        chain = [
+            condition(rng.choice(("WHERE", "AND", "OR")), *rng.choice(choices))
+            for _ in range(rng.randint(1, 5))
+        ]
+        assert np.array_equal(combine(chain, table), fold(chain, table))
+
+
+def test_empty_runs_skip_their_remaining_conditions(monkeypatch):
+    """Test nothing more is evaluated once an AND run selects no element"""
+    evaluated = []
+    original = engine.CompiledCondition.evaluate
+
+    def evaluate(c, table):
+        evaluated.append(c.property_name)
+        return original(c, table)
+
+    monkeypatch.setattr(engine.CompiledCondition, "evaluate", evaluate)
+    table = make_table(100)
+    chain = [
+        condition("WHERE", "category", "equal to", "Walls"),
+        condition("AND", "Width", "greater than", "1000"),
+        condition("AND", "Fire Rating", "equal to", "EI 60"),
+        condition("OR", "category", "equal to", "Doors"),
+    ]
+
+    mask = combine(chain, table)
+
+    assert "Fire Rating" not in evaluated
+    assert np.array_equal(mask, fold(chain, table))
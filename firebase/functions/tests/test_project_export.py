@@ -0,0 +1,100 @@
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+from src.projects import project_export
+from src.utils.tsv_utils import generate_ruleset_tsv
+from werkzeug.test import EnvironBuilder
+
+RULE = {
+    "severity": "Warning",
+    "message": "Doors are at least 800 wide",
+    "conditions": [
+        {
+            "logic": "WHERE",
+            "propertyName": "category",
+            "predicate": "equal to",
+            "value": "Doors",
+        },
+        {
+            "logic": "CHECK",
+            "propertyName": "Width",
+            "predicate": "greater than",
+            "value": "799",
+        },
+    ],
+}
+RULESETS = [
+    {"id": "a", "name": "Doors", "description": "Door sizes"},
+    {"id": "b", "name": "Doors", "isShared": True},
+    {"id": "c", "name": "Empty"},
+]
+EMPTY_RULE = {"severity": "Info", "message": "Not written yet", "conditions": []}
+RULES = {"a": [RULE], "b": [RULE, EMPTY_RULE, RULE], "c": [EMPTY_RULE]}
+
+
+def request(token="token"):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return EnvironBuilder(path="/api/projects/p1/export", headers=headers).get_request()
+
+
+@pytest.fixture
+def firestore(monkeypatch):
+    """Serve the caller's rulesets and their rules without Firestore"""
+    listed = []
+
+    def get_rulesets_for_project(user_id, project_id):
+        listed.append((user_id, project_id))
+        return RULESETS
+
+    monkeypatch.setattr(
+        project_export, "safe_verify_id_token", lambda token: {"uid": "u1"}
+    )
+    monkeypatch.setattr(
+        project_export, "get_rulesets_for_project", get_rulesets_for_project
+    )
+    monkeypatch.setattr(
+        project_export, "get_rules_for_ruleset", lambda ruleset_id: RULES[ruleset_id]
+    )
+    return listed
+
+
+def test_export_zips_each_ruleset_with_a_manifest(firestore):
+    """Test one TSV per ruleset, unique names and checksums in the manifest"""
+    response = project_export.export_project_as_zip(request(), "p1")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert 'filename="p1_rulesets.zip"' in response.headers["Content-Disposition"]
+    assert firestore == [("u1", "p1")]
+
+    archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert archive.namelist() == [
+        "rulesets/doors.tsv",
+        "rulesets/doors_b.tsv",
+        "rulesets/empty.tsv",
+        "manifest.json",
+    ]
+
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["projectId"] == "p1"
+    assert manifest["rulesetCount"] == 3
+    for ruleset, entry in zip(RULESETS, manifest["rulesets"]):
+        data = archive.read(entry["file"])
+        tsv, _ = generate_ruleset_tsv(ruleset, RULES[ruleset["id"]])
+        assert data == tsv.encode("utf-8")
+        assert entry["sha256"] == hashlib.sha256(data).hexdigest()
+        # Counts the rules in the TSV, which skips rules without conditions
+        assert entry["ruleCount"] == data.decode("utf-8").count("CHECK")
+        assert entry["isShared"] == ruleset.get("isShared", False)
+    assert [entry["ruleCount"] for entry in manifest["rulesets"]] == [1, 2, 0]
+
+
+def test_export_requires_a_token(firestore):
+    """Test the export refuses anonymous requests before listing anything"""
+    response = project_export.export_project_as_zip(request(token=None), "p1")
+
+    assert response.status_code == 401
+    assert firestore == []
@@ -0,0 +1,131 @@
+import hashlib
+
+import pytest
+from src.rulesets import ruleset_publish, ruleset_routes, ruleset_sharing
+from src.rulesets.ruleset_publish import (
+    IMMUTABLE_CACHE_CONTROL,
+    LocalPublishStore,
+    publish_ruleset,
+    republish_ruleset,
+)
+from src.utils.tsv_utils import generate_ruleset_tsv
+from werkzeug.test import EnvironBuilder
+
+RULESET = {"id": "rs1", "name": "Fire Safety", "isShared": True}
+RULES = [
+    {
+        "severity": "Error",
+        "message": "Walls need a fire rating",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "exists",
+                "value": "",
+            },
+        ],
+    }
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A local publish store used by every publishing call"""
+    local = LocalPublishStore(tmp_path / "published")
+    monkeypatch.setattr(ruleset_publish, "_store", local)
+    return local
+
+
+def test_publish_writes_a_content_addressed_object(store):
+    """Test the path carries the SHA-256 of the published TSV"""
+    publication = publish_ruleset(RULESET, RULES)
+
+    tsv, filename = generate_ruleset_tsv(RULESET, RULES)
+    content_hash = hashlib.sha256(tsv.encode("utf-8")).hexdigest()
+    assert publication["hash"] == content_hash
+    assert publication["path"] == f"shared/rs1/{content_hash}/{filename}"
+    assert store.read(publication["path"]) == tsv.encode("utf-8")
+    assert publication["url"] is None
+
+
+def test_publish_is_idempotent_and_versions_changes(store, monkeypatch):
+    """Test unchanged content is not rewritten and edits get a new path"""
+    first = publish_ruleset(RULESET, RULES)
+
+    writes = []
+    monkeypatch.setattr(store, "put", lambda *args: writes.append(args))
+    assert publish_ruleset(RULESET, RULES) == first
+    assert writes == []
+
+    edited = [{**RULES[0], "message": "Walls must be rated"}]
+    second = publish_ruleset(RULESET, edited)
+    assert second["path"] != first["path"]
+    assert len(writes) == 1
+
+
+def test_unsharing_deletes_published_objects(store, monkeypatch):
+    """Test republishing an unshared ruleset removes every version"""
+    recorded = []
+    monkeypatch.setattr(
+        ruleset_publish,
+        "set_ruleset_publication",
+        lambda ruleset_id, publication: recorded.append(publication),
+    )
+    publication = republish_ruleset("rs1", RULESET, RULES)
+    assert store.exists(publication["path"])
+
+    unshared = {**RULESET, "isShared": False, "publishedPath": publication["path"]}
+    assert republish_ruleset("rs1", unshared, RULES) is None
+    assert not store.exists(publication["path"])
+    assert recorded == [publication, None]
+
+
+def test_deleting_a_ruleset_deletes_published_objects(store, monkeypatch):
+    """Test a deleted shared ruleset leaves nothing public behind"""
+    publication = publish_ruleset(RULESET, RULES)
+    owned = {**RULESET, "userId": "u1", "publishedPath": publication["path"]}
+    deleted = []
+    monkeypatch.setattr(
+        ruleset_routes, "safe_verify_id_token", lambda token: {"uid": "u1"}
+    )
+    monkeypatch.setattr(ruleset_routes, "get_ruleset", lambda ruleset_id: owned)
+    monkeypatch.setattr(ruleset_routes, "delete_ruleset", deleted.append)
+
+    request = EnvironBuilder(
+        path="/api/rulesets/rs1",
+        method="DELETE",
+        headers={"Authorization": "Bearer token"},
+    ).get_request()
+    response = ruleset_routes.delete_ruleset_handler(request, "rs1")
+
+    assert response.status_code == 204
+    assert deleted == ["rs1"]
+    assert not store.exists(publication["path"])
+
+
+def test_shared_link_redirects_to_the_published_object(tmp_path, monkeypatch):
+    """Test /shared redirects to the immutable object, or serves it locally"""
+    served = LocalPublishStore(tmp_path, "http://localhost:5000/static/")
+    monkeypatch.setattr(ruleset_publish, "_store", served)
+    publication = publish_ruleset(RULESET, RULES)
+    ruleset = {**RULESET, "publishedPath": publication["path"]}
+
+    response = ruleset_sharing._serve_published_ruleset(ruleset)
+    assert response.status_code == 302
+    assert response.headers["Location"] == (
+        f"http://localhost:5000/static/{publication['path']}"
+    )
+    assert response.headers["Cache-Control"] != IMMUTABLE_CACHE_CONTROL
+
+    monkeypatch.setattr(ruleset_publish, "_store", LocalPublishStore(tmp_path))
+    response = ruleset_sharing._serve_published_ruleset(ruleset)
+    assert response.status_code == 200
+    assert response.get_data() == served.read(publication["path"])
+
+    assert ruleset_sharing._serve_published_ruleset(RULESET) is None
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from src.evaluation import results, store
+from src.evaluation.columns import ColumnTable
+from src.evaluation.engine import evaluate_ruleset
+
+RECORDS = [
+    {"category": "Walls", "Fire Rating": "EI 60"},
+    {"category": "Walls", "Fire Rating": "EI 30"},
+    {"category": "Walls"},
+    {"category": "Doors", "Fire Rating": "EI 60"},
+]
+
+
+def make_rule(rule_id, category, rating="EI 60"):
+    return {
+        "id": rule_id,
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": category,
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "equal to",
+                "value": rating,
+            },
+        ],
+    }
+
+
+@pytest.fixture
+def evaluations(tmp_path, monkeypatch):
+    """Isolate the caches and record which rules get evaluated"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(results, "_results", results.OrderedDict())
+    monkeypatch.setattr(results, "_result_bytes", 0)
+    evaluated = []
+
+    def evaluate(table, rules):
+        evaluated.extend(rule["id"] for rule in rules)
+        return evaluate_ruleset(table, rules)
+
+    monkeypatch.setattr(results, "evaluate_ruleset_parallel", evaluate)
+    table = ColumnTable.from_records(RECORDS)
+    store.save_table("version1", table)
+    return table, evaluated
+
+
+def test_only_changed_rules_are_evaluated_again(evaluations):
+    """Test unchanged rules come from the cache, numbered where they are"""
+    table, evaluated = evaluations
+    rules = [make_rule("walls", "Walls"), {"id": "empty"}, make_rule("doors", "Doors")]
+    first = results.evaluate_ruleset_cached("version1", table, rules)
+    evaluated.clear()
+
+    rules[2] = make_rule("doors", "Doors", rating="EI 30")
+    second = results.evaluate_ruleset_cached("version1", table, rules)
+
+    assert evaluated == ["doors"]
+    assert second[0].to_dict() == first[0].to_dict()
+    assert [r.number for r in second] == [1, 2]
+    assert second[1].to_dict()["passed"] == 0
+    assert np.array_equal(second[0].passed, first[0].passed)
+
+
+def test_results_survive_a_restart(evaluations):
+    """Test a cleared memory tier is refilled from disk, not re-evaluated"""
+    table, evaluated = evaluations
+    rules = [make_rule("walls", "Walls")]
+    results.evaluate_ruleset_cached("version1", table, rules)
+    results._results.clear()
+    evaluated.clear()
+
+    cached = results.evaluate_ruleset_cached("version1", table, rules)
+
+    assert evaluated == []
+    assert cached[0].to_dict()["selected"] == 3
+    assert cached[0].to_dict()["passed"] == 1
+
+
+def test_errors_are_not_cached(evaluations):
+    """Test rules that do not compile are reported and tried again"""
+    table, evaluated = evaluations
+    broken = {"id": "broken", "conditions": [{"predicate": "sounds like"}]}
+
+    for _ in range(2):
+        reported = results.evaluate_ruleset_cached("version1", table, [broken])
+
+    assert evaluated == ["broken", "broken"]
+    assert "sounds like" in reported[0].to_dict()["error"]
@@ -0,0 +1,130 @@
+import pytest
+from src.rulesets import ruleset_snapshots
+from src.rulesets.ruleset_publish import IMMUTABLE_CACHE_CONTROL
+from src.rulesets.ruleset_snapshots import (
+    PRIVATE_CACHE_CONTROL,
+    canonical_ruleset_content,
+    get_snapshot_view,
+    snapshot_hash,
+)
+from werkzeug.test import EnvironBuilder
+
+RULESET = {"id": "rs1", "name": "Fire Safety", "description": "Walls"}
+RULES = [
+    {
+        "id": "r1",
+        "order": 0,
+        "severity": "Error",
+        "message": "Walls need a fire rating",
+        "conditions": [
+            {
+                "logic": "WHERE",
+                "propertyName": "category",
+                "predicate": "equal to",
+                "value": "Walls",
+            },
+            {
+                "logic": "CHECK",
+                "propertyName": "Fire Rating",
+                "predicate": "exists",
+                "value": "",
+            },
+        ],
+    },
+    {"id": "r2", "message": "Empty rules are skipped", "conditions": []},
+]
+CONTENT = canonical_ruleset_content(RULESET, RULES)
+HASH = snapshot_hash(CONTENT)
+
+
+def test_snapshot_hash_ignores_ids_timestamps_and_key_order():
+    """Test the same content always hashes the same"""
+    reordered = [
+        {
+            "conditions": [dict(reversed(list(c.items()))) for c in rule["conditions"]],
+            "message": rule["message"],
+            "severity": rule.get("severity"),
+            "id": "other",
+            "updatedAt": "2024-01-01",
+        }
+        for rule in RULES
+    ]
+    renamed = {**RULESET, "id": "rs2", "isShared": True, "snapshotHash": "x"}
+
+    assert CONTENT["rules"] == [
+        {
+            "severity": "Error",
+            "message": "Walls need a fire rating",
+            "conditions": [
+                {key: c[key] for key in ("logic", "propertyName", "predicate", "value")}
+                for c in RULES[0]["conditions"]
+            ],
+        }
+    ]
+    assert snapshot_hash(canonical_ruleset_content(renamed, reordered)) == HASH
+    assert snapshot_hash(CONTENT) == HASH
+
+    edited = [{**RULES[0], "message": "Walls must be rated"}]
+    assert snapshot_hash(canonical_ruleset_content(RULESET, edited)) != HASH
+
+
+def request(token=None, etag=None, query=""):
+    headers = {}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if etag:
+        headers["If-None-Match"] = etag
+    return EnvironBuilder(
+        path=f"/api/snapshots/{HASH}", query_string=query, headers=headers
+    ).get_request()
+
+
+@pytest.fixture
+def rulesets(monkeypatch):
+    """Serve one snapshot saved by one ruleset, private unless shared"""
+    saved = {"rs1": {**RULESET, "userId": "owner"}}
+    snapshot = {**CONTENT, "id": HASH, "rulesetIds": ["rs1", "deleted"]}
+    monkeypatch.setattr(
+        ruleset_snapshots,
+        "get_ruleset_snapshot",
+        lambda content_hash: snapshot if content_hash == HASH else None,
+    )
+    monkeypatch.setattr(
+        ruleset_snapshots, "stream_snapshot_rules", lambda h: iter(CONTENT["rules"])
+    )
+    monkeypatch.setattr(ruleset_snapshots, "get_ruleset", saved.get)
+    monkeypatch.setattr(
+        ruleset_snapshots, "safe_verify_id_token", lambda token: {"uid": token}
+    )
+    return saved
+
+
+def test_private_snapshots_are_only_served_to_their_owner(rulesets):
+    """Test anonymous and other users get a 404 and the owner private caching"""
+    assert get_snapshot_view(request(), HASH).status_code == 404
+    assert get_snapshot_view(request("someone"), HASH).status_code == 404
+
+    response = get_snapshot_view(request("owner"), HASH)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == PRIVATE_CACHE_CONTROL
+    assert response.headers["Vary"] == "Authorization"
+    assert b"Walls need a fire rating" in response.get_data()
+
+
+def test_shared_snapshots_are_public_and_revalidate(rulesets):
+    """Test a shared ruleset's snapshot is public, with a 304 for its ETag"""
+    rulesets["rs1"]["isShared"] = True
+
+    response = get_snapshot_view(request(query="format=json"), HASH)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["ETag"] == f'"{HASH}"'
+    assert response.mimetype == "application/json"
+
+    response = get_snapshot_view(request(etag=f'"{HASH}"'), HASH)
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == f'"{HASH}"'
+
+    assert get_snapshot_view(request(), "0" * 64).status_code == 404
+    assert get_snapshot_view(request(), "not-a-hash").status_code == 404
@@ -0,0 +1,274 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+from src.evaluation.engine import build_table
+from src.evaluation.flatten import iter_version_elements
+from src.utils import speckle_api
+from src.utils.object_cache import ObjectCache
+from src.utils.speckle_api import (
+    ClosureDownloader,
+    IncompleteClosureError,
+    ObjectTooLargeError,
+    SpeckleAPI,
+    iter_object_lines,
+)
+
+
+def element(i, category):
+    return {
+        "id": f"e{i}",
+        "speckle_type": "Objects.BuiltElements.Revit.FamilyInstance",
+        "category": category,
+        "name": f"Élément {i}",
+    }
+
+
+# A root collection with a detached layer whose elements are themselves
+# detached, as Speckle serves them: root first, then the closure
+OBJECTS = [
+    {
+        "id": "root",
+        "speckle_type": "Speckle.Core.Models.Collection",
+        "elements": [{"referencedId": "layer", "speckle_type": "reference"}],
+    },
+    {
+        "id": "layer",
+        "speckle_type": "Speckle.Core.Models.Collection",
+        "elements": [
+            {"referencedId": "e1", "speckle_type": "reference"},
+            {"referencedId": "e2", "speckle_type": "reference"},
+            element(3, "Doors"),
+        ],
+    },
+    element(1, "Walls"),
+    element(2, "Walls"),
+]
+
+
+def serve(objects):
+    return b"".join(
+        f"{obj['id']}\t{json.dumps(obj, ensure_ascii=False)}\n".encode("utf-8")
+        for obj in objects
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_object_lines_survive_any_chunking(chunk_size):
+    """Test objects decode the same however the body is split"""
+    body = serve(OBJECTS)
+    chunks = (body[i : i + chunk_size] for i in range(0, len(body), chunk_size))
+
+    assert list(iter_object_lines(chunks)) == OBJECTS
+
+
+def test_object_lines_are_yielded_as_they_arrive():
+    """Test the first object is available before the rest is read"""
+    body = serve(OBJECTS)
+    read = []
+
+    def chunks():
+        for i in range(0, len(body), 16):
+            read.append(i)
+            yield body[i : i + 16]
+
+    first = next(iter_object_lines(chunks()))
+
+    assert first["id"] == "root"
+    assert len(read) < len(body) // 16
+
+
+def test_oversized_object_is_rejected():
+    """Test a single object above the ceiling stops the stream"""
+    body = serve([{"id": "big", "blob": "x" * 10_000}])
+    chunks = (body[i : i + 100] for i in range(0, len(body), 100))
+
+    with pytest.raises(ObjectTooLargeError):
+        list(iter_object_lines(chunks, max_object_bytes=1_000))
+
+
+def test_streamed_elements_match_the_tree():
+    """Test streaming the closure finds each element once, references skipped"""
+    streamed = [e["id"] for e in iter_version_elements(iter(OBJECTS))]
+    table = build_table(iter_object_lines([serve(OBJECTS)]), root_id="root")
+
+    assert sorted(streamed) == ["e1", "e2", "e3"]
+    assert len(table) == 3
+    assert table.resolve("category").categories == ["Doors", "Walls"]
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is expected here
+        pass
+
+
+class MockObjectServer:
+    """Serves objects like a Speckle server, with optional failing batches."""
+
+    def __init__(self, objects):
+        self.objects = {obj["id"]: obj for obj in objects}
+        self.batches = []
+        self.fail_batches = 0
+        self.broken = False
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self.server = QuietServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                # /objects/{stream}/{id}/single
+                object_id = self.path.split("/")[3]
+                body = json.dumps(mock.objects[object_id]).encode()
+                self._send(200, body, "application/json")
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                form = parse_qs(self.rfile.read(length).decode())
+                ids = json.loads(form["objects"][0])
+                with mock._lock:
+                    mock._active += 1
+                    mock.max_concurrent = max(mock.max_concurrent, mock._active)
+                    fail = mock.broken or mock.fail_batches > 0
+                    if fail and not mock.broken:
+                        mock.fail_batches -= 1
+                    if not fail:
+                        mock.batches.append(ids)
+                time.sleep(0.01)
+                with mock._lock:
+                    mock._active -= 1
+                if fail:
+                    self._send(503, b"busy", "text/plain")
+                else:
+                    body = serve([mock.objects[i] for i in ids if i in mock.objects])
+                    self._send(200, body, "text/plain")
+
+        return Handler
+
+
+def make_version(count, root_id="root", changed=0):
+    children = [element(i, "Walls" if i % 2 else "Doors") for i in range(count)]
+    for child in children[:changed]:
+        child["id"] += "-v2"
+        child["category"] = "Windows"
+    root = {
+        "id": root_id,
+        "speckle_type": "Speckle.Core.Models.Collection",
+        "elements": [
+            {"referencedId": child["id"], "speckle_type": "reference"}
+            for child in children
+        ],
+        "__closure": {child["id"]: 1 for child in children},
+    }
+    return [root, *children]
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    monkeypatch.setattr(speckle_api, "CLOSURE_RETRY_DELAY", 0)
+    server = MockObjectServer(make_version(1000))
+    yield server
+    server.close()
+
+
+def test_closure_downloads_in_parallel_batches(mock_server):
+    """Test the closure is fetched in a few concurrent batch requests"""
+    api = SpeckleAPI(token="test", host=mock_server.url)
+    with ClosureDownloader(api, "stream", batch_size=100, workers=4) as downloader:
+        objects = list(downloader.iter_objects("root"))
+
+    assert [obj["id"] for obj in objects[:2]] == ["root", "e0"]
+    assert sorted(obj["id"] for obj in objects) == sorted(mock_server.objects)
+    assert len(mock_server.batches) == 10
+    assert mock_server.max_concurrent > 1
+    assert len(build_table(iter(objects))) == 1000
+
+
+def test_closure_download_retries_and_resumes(mock_server):
+    """Test transient failures are retried and a failed download resumes"""
+    api = SpeckleAPI(token="test", host=mock_server.url)
+    mock_server.fail_batches = 2
+    downloader = ClosureDownloader(api, "stream", batch_size=100, workers=2)
+
+    received = []
+    with pytest.raises(requests.HTTPError):
+        for obj in downloader.iter_objects("root"):
+            received.append(obj["id"])
+            if len(received) == 350:
+                mock_server.broken = True
+    yielded = len(received)
+    fetched = sum(len(batch) for batch in mock_server.batches)
+
+    mock_server.broken = False
+    received.extend(obj["id"] for obj in downloader.iter_objects("root"))
+    downloader.close()
+    refetched = sum(len(batch) for batch in mock_server.batches) - fetched
+
+    assert len(received) == len(set(received)) == 1001
+    # Only objects that had not been yielded are downloaded again
+    assert refetched == 1001 - yielded
+
+
+def test_objects_left_out_of_a_response_are_reported(mock_server):
+    """Test a closure the server cannot complete fails instead of shrinking"""
+    mock_server.objects["root"]["__closure"].update({"gone-1": 1, "gone-2": 1})
+    api = SpeckleAPI(token="test", host=mock_server.url)
+
+    received = []
+    with ClosureDownloader(api, "stream", batch_size=100, workers=1) as downloader:
+        with pytest.raises(IncompleteClosureError) as excinfo:
+            received.extend(obj["id"] for obj in downloader.iter_objects("root"))
+
+    assert excinfo.value.missing == ["gone-1", "gone-2"]
+    assert "gone-1, gone-2" in str(excinfo.value)
+    # Everything else arrived, and the missing IDs were asked for on every attempt
+    assert len(received) == 1001
+    retried = [batch for batch in mock_server.batches if "gone-1" in batch]
+    assert retried == [["gone-1", "gone-2"]] * speckle_api.CLOSURE_RETRIES
+
+
+def test_cached_objects_are_not_downloaded_again(mock_server, tmp_path):
+    """Test a new version only downloads the objects that changed"""
+    for obj in make_version(1000, root_id="root-v2", changed=10):
+        mock_server.objects[obj["id"]] = obj
+    api = SpeckleAPI(token="test", host=mock_server.url)
+    cache = ObjectCache(str(tmp_path / "objects.sqlite3"))
+
+    with ClosureDownloader(api, "stream", batch_size=100, cache=cache) as first:
+        list(first.iter_objects("root"))
+    with ClosureDownloader(api, "stream", batch_size=100, cache=cache) as second:
+        objects = list(second.iter_objects("root-v2"))
+
+    assert first.downloaded == 1001
+    assert second.downloaded == 11
+    assert len(objects) == 1001
+    table = build_table(iter(objects))
+    assert table.resolve("category").categories.count("Windows") == 1
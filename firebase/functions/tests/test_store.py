@@ -0,0 +1,32 @@
+import os
+
+from src.evaluation import store
+from src.evaluation.columns import ColumnTable
+
+RECORDS = [{"category": "Walls", "Width": n} for n in range(100)]
+
+
+def test_store_evicts_least_recently_used_versions(tmp_path, monkeypatch):
+    """Test whole version directories go, oldest first, until under budget"""
+    monkeypatch.setenv("MODEL_TABLE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "_loaded", store.OrderedDict())
+    table = ColumnTable.from_records(RECORDS)
+    versions = ["old", "used", "new"]
+    for object_id in versions:
+        store.save_table(object_id, table)
+    os.makedirs(tmp_path / "old" / "results")
+    (tmp_path / "old" / "results" / "key.rows").write_bytes(b"x" * 100)
+    for n, object_id in enumerate(versions):
+        os.utime(store.table_path(object_id), (n, n))
+    size = store._directory_bytes(store.table_path("used"))
+
+    # Using a version makes it the most recent
+    assert store.find_table("used") is not None
+    monkeypatch.setenv("MODEL_TABLE_STORE_MAX_BYTES", str(2 * size))
+    assert store.enforce_store_budget() == size + 100
+    assert sorted(os.listdir(tmp_path)) == ["new", "used"]
+
+    # The version just written is kept even when it alone is over budget
+    monkeypatch.setenv("MODEL_TABLE_STORE_MAX_BYTES", "0")
+    store.enforce_store_budget(keep="new")
+    assert os.listdir(tmp_path) == ["new"]
@@ -87,6 +87,41 @@ const Rulesets = {
     return false;
   },
 
+  // Import rules from a TSV file
+  importRules: async function (url, targetSelector, event) {
+    if (event) {
+      event.stopPropagation();
+      event.preventDefault();
+    }
+
+    const form = event.target;
+    const formData = new FormData(form);
+
+    try {
+      const token = await Auth.getIdToken();
+      const response = await fetch(url, {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` },
+        body: formData,
+      });
+      const text = await response.text();
+
+      // Validation errors come back as plain text listing the bad lines
+      if (!response.ok) {
+        UI.showToast(text || `Import failed: ${response.status}`, true);
+        return false;
+      }
+
+      document.querySelector(targetSelector).innerHTML = text;
+      UI.showToast('Rules imported successfully');
+    } catch (error) {
+      console.error('Import error:', error);
+      UI.showToast(`Error: ${error.message}`, true);
+    }
+
+    return false;
+  },
+
   // Edit rule
   editRule: function (url, targetSelector, event) {
     if (event) {
@@ -149,6 +184,129 @@ const Rulesets = {
       .catch((error) => console.error('Fetch error:', error));
   },
 
+  // Replace a datalist's options with suggestions fetched from the server,
+  // once typing pauses
+  fillSuggestions: function (datalist, params, toOptions) {
+    clearTimeout(this.suggestTimer);
+    this.suggestTimer = setTimeout(async () => {
+      try {
+        const token = await Auth.getIdToken();
+        const query = new URLSearchParams(params).toString();
+        const response = await fetch(`${datalist.dataset.url}?${query}`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        if (!response.ok) {
+          return;
+        }
+        const data = await response.json();
+
+        datalist.replaceChildren(
+          ...toOptions(data).map(([value, label]) => {
+            const option = document.createElement('option');
+            option.value = value;
+            option.label = label;
+            return option;
+          })
+        );
+      } catch (error) {
+        console.error('Suggestion error:', error);
+      }
+    }, 150);
+  },
+
+  // Fill the property suggestions for a condition's property input
+  suggestProperties: function (input) {
+    const datalist = document.querySelector('#property-suggestions');
+    if (!datalist) {
+      return;
+    }
+
+    this.fillSuggestions(datalist, { q: input.value.trim() }, (data) =>
+      data.suggestions.map((property) => {
+        const samples = property.samples.slice(0, 3).join(', ');
+        return [
+          property.path,
+          `${property.kind}, ${property.count} elements${
+            samples ? ` (e.g. ${samples})` : ''
+          }`,
+        ];
+      })
+    );
+  },
+
+  // Fill the value suggestions for a condition's value input from the values
+  // its property takes in the model
+  suggestValues: function (input) {
+    const datalist = document.querySelector('#value-suggestions');
+    const row = input.closest('.condition-row');
+    if (!datalist || !row) {
+      return;
+    }
+
+    const property = row.querySelector('[name$="[propertyName]"]').value.trim();
+    const predicate = row.querySelector('select[name$="[predicate]"]').value;
+    if (!property || ['exists', 'is true', 'is false'].includes(predicate)) {
+      datalist.replaceChildren();
+      return;
+    }
+
+    // Lists and ranges are comma separated; suggest for the last item
+    const separator = input.value.lastIndexOf(',');
+    const head = separator >= 0 ? input.value.slice(0, separator + 1) + ' ' : '';
+    const text = input.value.slice(separator + 1).trim();
+
+    this.fillSuggestions(datalist, { property, q: text }, (data) => {
+      if (data.quantiles && !text) {
+        const { min, max, quantiles } = data;
+        return [
+          [head + min, 'minimum'],
+          [head + quantiles.p25, '25th percentile'],
+          [head + quantiles.p50, 'median'],
+          [head + quantiles.p75, '75th percentile'],
+          [head + max, 'maximum'],
+        ];
+      }
+      return data.values.map(({ value, count }) => [
+        head + value,
+        `${count} elements`,
+      ]);
+    });
+  },
+
+  // Fill in the impact counts once the rules list has rendered; the first
+  // request for a model downloads it, so this runs late
+  loadImpact: async function () {
+    const table = document.querySelector('table[data-impact-pending]');
+    if (!table) {
+      return;
+    }
+    table.removeAttribute('data-impact-pending');
+
+    try {
+      const data = await API.fetchWithAuth(table.dataset.impactUrl);
+      table.querySelectorAll('[data-impact-rule]').forEach((cell) => {
+        const counts = data.rules[cell.dataset.impactRule];
+        if (!counts) {
+          cell.textContent = '';
+        } else if (counts.error) {
+          cell.innerHTML = '<span class="text-red-600">Invalid rule</span>';
+          cell.firstChild.title = counts.error;
+        } else {
+          const failedClass = counts.failed ? 'text-red-700' : 'text-gray-400';
+          cell.innerHTML =
+            `<div>${counts.selected} selected</div>` +
+            `<div class="text-green-700">${counts.passed} pass</div>` +
+            `<div class="${failedClass}">${counts.failed} fail</div>`;
+        }
+      });
+    } catch (error) {
+      console.error('Impact error:', error);
+      table.querySelectorAll('[data-impact-rule]').forEach((cell) => {
+        cell.textContent = '';
+      });
+    }
+  },
+
   deleteConditionRow: function (event) {
     if (event) {
       event.stopPropagation();
@@ -281,3 +439,11 @@ function setupRuleFormObserver() {
     );
   }
 }
+
+// Rules lists arrive as HTML fragments; load their counts once inserted
+document.addEventListener('DOMContentLoaded', () => {
+  new MutationObserver(() => Rulesets.loadImpact()).observe(document.body, {
+    childList: true,
+    subtree: true,
+  });
+});